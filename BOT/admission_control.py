@@ -0,0 +1,169 @@
+# BOT/admission_control.py - Token-bucket admission and daily usage accounting per tenant
+
+import datetime
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from bot_metrics import metrics
+
+
+class TokenBucket:
+    """Classic token bucket: refills at rate tokens/second up to capacity.
+
+    A charge larger than the capacity is admitted once the bucket is full and
+    leaves it in debt, so big batches are charged in full and repaid over time.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = float(rate)
+        self.capacity = max(1.0, float(capacity))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated = now
+
+    def try_take(self, cost: float, now: float) -> Tuple[bool, float]:
+        """Take cost tokens if available; otherwise return seconds until they would be"""
+        self._refill(now)
+        needed = min(float(cost), self.capacity)
+        if self.tokens >= needed:
+            self.tokens -= cost
+            return True, 0.0
+        if self.rate <= 0:
+            return False, float("inf")
+        return False, (needed - self.tokens) / self.rate
+
+    def idle(self, now: float) -> bool:
+        """True once the bucket has refilled completely (dropping it loses nothing)"""
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+    def refund(self, cost: float):
+        self.tokens = min(self.capacity, self.tokens + cost)
+
+
+class UsageTracker:
+    """Admitted and rejected request counts per tenant for the current UTC day"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._day = datetime.datetime.utcnow().date()
+        self._admitted: Dict[str, int] = {}
+        self._rejected: Dict[str, int] = {}
+
+    def _roll(self):
+        today = datetime.datetime.utcnow().date()
+        if today != self._day:
+            self._day = today
+            self._admitted.clear()
+            self._rejected.clear()
+
+    def record(self, tenant: str, admitted: bool, count: int = 1):
+        with self._lock:
+            self._roll()
+            target = self._admitted if admitted else self._rejected
+            target[tenant] = target.get(tenant, 0) + count
+            total = sum(self._admitted.values())
+        metrics.set_gauge("daily_requests_used", total)
+
+    def requests_today(self, tenant: Optional[str] = None) -> int:
+        with self._lock:
+            self._roll()
+            if tenant is None:
+                return sum(self._admitted.values())
+            return self._admitted.get(tenant, 0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            self._roll()
+            return {
+                "date": self._day.isoformat(),
+                "admitted": dict(self._admitted),
+                "rejected": dict(self._rejected),
+            }
+
+
+class AdmissionController:
+    """Per-tenant and global token buckets checked before any inference work.
+
+    A rate of zero or less disables that bucket. A request must obtain tokens
+    from both its tenant bucket and the global bucket; if the global bucket is
+    empty the tenant's tokens are refunded so a shared overload doesn't also
+    burn the tenant's allowance. Both buckets are disabled by default; tenant
+    buckets that have refilled completely are evicted every ``sweep_seconds``.
+    """
+
+    def __init__(
+        self,
+        tenant_rate: float = 0.0,
+        tenant_burst: float = 20.0,
+        global_rate: float = 0.0,
+        global_burst: float = 100.0,
+        usage: Optional[UsageTracker] = None,
+        sweep_seconds: float = 60.0
+    ):
+        self.tenant_rate = float(tenant_rate)
+        self.tenant_burst = float(tenant_burst)
+        self._lock = threading.Lock()
+        self._tenants: Dict[str, TokenBucket] = {}
+        self._global = TokenBucket(global_rate, global_burst) if global_rate > 0 else None
+        self.usage = usage or UsageTracker()
+        self.sweep_seconds = float(sweep_seconds)
+        self._next_sweep = time.monotonic() + self.sweep_seconds
+
+    def _evict_idle(self, now: float):
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + self.sweep_seconds
+        for tenant in [tenant for tenant, bucket in self._tenants.items() if bucket.idle(now)]:
+            del self._tenants[tenant]
+
+    def _tenant_bucket(self, tenant: str) -> Optional[TokenBucket]:
+        if self.tenant_rate <= 0:
+            return None
+        bucket = self._tenants.get(tenant)
+        if bucket is None:
+            bucket = self._tenants[tenant] = TokenBucket(self.tenant_rate, self.tenant_burst)
+        return bucket
+
+    def try_admit(self, tenant: str, cost: int = 1) -> Tuple[bool, Optional[str], float]:
+        """Return (admitted, limiting_scope, retry_after_seconds)"""
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle(now)
+            tenant_bucket = self._tenant_bucket(tenant)
+            if tenant_bucket is not None:
+                ok, wait = tenant_bucket.try_take(cost, now)
+                if not ok:
+                    return self._reject(tenant, cost, "tenant", wait)
+            if self._global is not None:
+                ok, wait = self._global.try_take(cost, now)
+                if not ok:
+                    if tenant_bucket is not None:
+                        tenant_bucket.refund(cost)
+                    return self._reject(tenant, cost, "global", wait)
+
+        metrics.increment("admission_admitted_total")
+        self.usage.record(tenant, admitted=True, count=cost)
+        return True, None, 0.0
+
+    def _reject(self, tenant: str, cost: int, scope: str, wait: float) -> Tuple[bool, str, float]:
+        metrics.increment("admission_rejected_total", scope=scope)
+        self.usage.record(tenant, admitted=False, count=cost)
+        return False, scope, wait
+
+
+def create_admission_controller() -> AdmissionController:
+    """Build a controller from the ADMISSION_* environment variables (rate limiting off unless set)"""
+    return AdmissionController(
+        tenant_rate=float(os.getenv("ADMISSION_TENANT_RATE", "0")),
+        tenant_burst=float(os.getenv("ADMISSION_TENANT_BURST", "20")),
+        global_rate=float(os.getenv("ADMISSION_GLOBAL_RATE", "0")),
+        global_burst=float(os.getenv("ADMISSION_GLOBAL_BURST", "100"))
+    )
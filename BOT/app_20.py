@@ -1,45 +1,72 @@
 # Enhanced RAG Chatbot with MongoDB Lead Storage and Contact Information Extraction - MONGODB VERSION
 
 import chromadb
-from sentence_transformers import SentenceTransformer, CrossEncoder
-import google.generativeai as genai
-from typing import Any, List, Dict, Tuple, Optional
+from typing import Any, Callable, List, Dict, Tuple, Optional
 import asyncio
 import os
+import threading
 from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException, Query, Request, Depends
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from contextlib import asynccontextmanager
 import uvicorn
 import datetime
 import hmac
+import json
+import math
 import uuid
 import re
 import numpy as np
+import sys
+import time
 from fastapi.middleware.cors import CORSMiddleware
 
-# MongoDB imports are optional; gracefully degrade when unavailable.
-try:
-    from pymongo import MongoClient  # type: ignore
-    from pymongo.uri_parser import parse_uri  # type: ignore
-    from pymongo.errors import DuplicateKeyError, ServerSelectionTimeoutError  # type: ignore
-    import pymongo  # type: ignore
-    PYMONGO_AVAILABLE = True
-except ImportError:
-    MongoClient = None  # type: ignore
-    parse_uri = None
-
-    class DuplicateKeyError(Exception):
-        """Fallback duplicate key error when pymongo is missing."""
-
-    class ServerSelectionTimeoutError(Exception):
-        """Fallback server timeout error when pymongo is missing."""
-
-    class _PyMongoFallback:
-        DESCENDING = -1
-
-    pymongo = _PyMongoFallback()  # type: ignore
-    PYMONGO_AVAILABLE = False
+# Ensure sibling helper modules (and the shared Scraping2 package) resolve regardless of the launch directory
+BOT_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BOT_DIR)
+for _path in (BOT_DIR, ROOT_DIR):
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
+
+from admission_control import AdmissionController, create_admission_controller  # noqa: E402
+from bot_metrics import ChatTrace, metrics  # noqa: E402
+from embedding_engine import get_embedding_engine  # noqa: E402
+from fair_scheduler import FairChatExecutor, create_chat_executor  # noqa: E402
+from lead_store import TenantLeadStore  # noqa: E402
+from model_registry import get_reranker  # noqa: E402
+from context_packer import ContextPacker  # noqa: E402
+from llm_gateway import LLMOverloadedError, get_llm_gateway, shutdown_llm_gateway  # noqa: E402
+from llm_providers import LLMProvider, get_llm_provider  # noqa: E402
+from quality_tiers import TIER_SETTINGS, get_load_monitor  # noqa: E402
+from query_log import get_query_log, shutdown_query_log  # noqa: E402
+from request_deadline import (  # noqa: E402
+    DEADLINE_GENERATION_RESERVE_SECONDS,
+    DEADLINE_HEADER,
+    DEADLINE_MIN_GENERATION_SECONDS,
+    RequestDeadline,
+    rerank_cost,
+)
+from request_coalescing import SingleFlight, WaitTimeout, normalize_query_key  # noqa: E402
+from rerank_cache import RerankScoreCache  # noqa: E402
+from shadow_eval import get_shadow_evaluator, shutdown_shadow_evaluator  # noqa: E402
+from retrieval_plan import (  # noqa: E402
+    RetrievalPlan,
+    expansion_terms,
+    fuse,
+    lexical_terms,
+    load_tenant_plan,
+    prefilter,
+    question_variations,
+)
+from Scraping2.vector_store import (  # noqa: E402
+    CURRENT_POINTER_FILENAME,
+    MANIFEST_FILENAME,
+    get_or_create_tenant_collection,
+    read_manifest,
+    resolve_read_path,
+)
 
 # Load environment variables from .env file
 load_dotenv()
@@ -49,6 +76,33 @@ ENFORCE_SERVICE_SECRET = bool(
     FASTAPI_SHARED_SECRET and FASTAPI_SHARED_SECRET.strip().lower() not in {"", "change-me"}
 )
 
+# Prompt context budget (estimated tokens) and passage cap for answer synthesis
+LLM_CONTEXT_TOKEN_BUDGET = int(os.getenv("LLM_CONTEXT_TOKEN_BUDGET", "3000"))
+LLM_CONTEXT_MAX_PASSAGES = int(os.getenv("LLM_CONTEXT_MAX_PASSAGES", "12"))
+
+# Batch chat limits: maximum queries per request and concurrent LLM calls per batch
+CHAT_BATCH_MAX_QUERIES = int(os.getenv("CHAT_BATCH_MAX_QUERIES", "500"))
+CHAT_BATCH_LLM_CONCURRENCY = int(os.getenv("CHAT_BATCH_LLM_CONCURRENCY", "4"))
+
+# Query embedding model; must match the model that embedded the tenant collections
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+RERANKER_MODEL = os.getenv("RERANKER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+
+# /leads page sizes and the Mongo cursor batch size used by /leads/export
+LEADS_PAGE_DEFAULT_LIMIT = int(os.getenv("LEADS_PAGE_DEFAULT_LIMIT", "100"))
+LEADS_PAGE_MAX_LIMIT = int(os.getenv("LEADS_PAGE_MAX_LIMIT", "1000"))
+LEADS_EXPORT_BATCH_SIZE = int(os.getenv("LEADS_EXPORT_BATCH_SIZE", "500"))
+
+# Follow-up turns reuse the previous turn's reranked chunk ids for this long (seconds)
+FOLLOW_UP_CONTEXT_TTL = float(os.getenv("FOLLOW_UP_CONTEXT_TTL_SECONDS", "600"))
+FOLLOW_UP_MAX_CHUNKS = int(os.getenv("FOLLOW_UP_MAX_CHUNKS", "40"))
+
+# Returned when a turn's deadline had already passed before retrieval started
+DEADLINE_EXPIRED_ANSWER = "Sorry, that took longer than expected. Please try asking again."
+
+# How often (seconds) each tenant checks its manifest/CURRENT files for new ingested data
+VECTOR_STORE_CHECK_INTERVAL = float(os.getenv("VECTOR_STORE_CHECK_INTERVAL_SECONDS", "2"))
+
 
 class ContactInformationExtractor:
     """Extract contact information from text content with improved email detection"""
@@ -183,6 +237,12 @@ class ContactInformationExtractor:
 # Tenant-aware chatbot manager placeholder
 chatbot_manager = None
 
+# Token-bucket admission control and daily usage accounting (created at startup)
+admission_controller: Optional[AdmissionController] = None
+
+# Weighted fair worker pool that runs blocking chat work (created at startup)
+chat_executor: Optional[FairChatExecutor] = None
+
 
 async def require_service_secret(request: Request):
     """Ensure inter-service calls provide the configured shared secret."""
@@ -208,6 +268,26 @@ class QuestionRequest(BaseModel):
     database_uri: Optional[str] = None
     vector_store_path: Optional[str] = None
 
+class BatchQuestionRequest(BaseModel):
+    queries: List[str]
+    user_id: Optional[str] = None
+    resource_id: Optional[str] = None
+    database_uri: Optional[str] = None
+    vector_store_path: Optional[str] = None
+    max_concurrency: Optional[int] = None
+
+class BatchAnswerItem(BaseModel):
+    query: str
+    answer: str
+    candidates: int
+    # Set when the LLM call failed or was shed and the answer is only the top passage
+    partial: bool = False
+    error: Optional[str] = None
+
+class BatchAnswerResponse(BaseModel):
+    answers: List[BatchAnswerItem]
+    metadata: Optional[Dict[str, Any]] = None
+
 class AnswerResponse(BaseModel):
     answer: str
     session_id: str
@@ -232,18 +312,23 @@ class SemanticIntelligentRAG:
         chroma_db_path: str,
         collection_name: str = "scraped_content",
         mongo_uri: Optional[str] = None,
-        resource_id: Optional[str] = None
+        resource_id: Optional[str] = None,
+        llm_provider: Optional[LLMProvider] = None,
+        lead_store: Optional[TenantLeadStore] = None
     ):
         self.vector_store_path = chroma_db_path
+        self.collection_name = collection_name
         self.resource_id = resource_id
 
-        # Initialize ChromaDB client for this tenant
-        self.chroma_client = chromadb.PersistentClient(path=chroma_db_path)
+        # Shared query embedding engine (one model per process, used by every query path)
+        self.embedding_engine = get_embedding_engine(EMBEDDING_MODEL)
+
+        # Initialize ChromaDB client on the tenant's published version
+        self._store_lock = threading.Lock()
+        self._retired_clients: List[Tuple[Any, float]] = []
+        self._cache_invalidators: List[Callable[[], None]] = []
+        self._open_vector_store()
         self.name_collection_states = {}
-        self.collection = self.chroma_client.get_or_create_collection(
-            name=collection_name,
-            metadata={"hnsw:space": "cosine"}
-        )
 
         # Get total documents count
         try:
@@ -252,41 +337,24 @@ class SemanticIntelligentRAG:
         except:
             print("❌ Could not get document count")
 
-        # Initialize embedding model
-        print("🔄 Loading semantic embedding model...")
-        self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-        print("✅ Semantic model loaded: all-MiniLM-L6-v2")
-
-        # Initialize cross-encoder reranker
-        print("🔄 Loading cross-encoder reranker...")
-        self.reranker = CrossEncoder("cross-encoder/ms-marco-MiniLM-L-6-v2")
-        print("✅ Cross-encoder reranker loaded")
-
         # Initialize Contact Information Extractor
         print("🔄 Initializing contact information extractor...")
         self.contact_extractor = ContactInformationExtractor()
         print("✅ Contact information extractor loaded")
 
         # Configuration constants
-        self.max_retrieval = 100
         self.max_passages = 10
 
-        # Initialize Gemini API client
-        print("🔄 Initializing Gemini API client...")
-        try:
-            api_key = os.getenv('GOOGLE_API_KEY')
-            if not api_key:
-                raise ValueError("GOOGLE_API_KEY not found in environment variables")
-            genai.configure(api_key=api_key)
-            self.model = genai.GenerativeModel('gemini-2.5-flash')
-            print("✅ Gemini API client initialized successfully!")
-        except Exception as e:
-            print(f"❌ Error initializing Gemini API: {e}")
-            raise
+        # Token-budgeted prompt context assembly
+        self.context_packer = ContextPacker(
+            token_budget=LLM_CONTEXT_TOKEN_BUDGET,
+            max_passages=LLM_CONTEXT_MAX_PASSAGES
+        )
 
-        # Usage tracking
-        self.daily_requests = 0
-        self.last_reset = datetime.date.today()
+        # LLM provider (Gemini by default, local stub when LLM_PROVIDER=stub) and the
+        # cross-encoder are resolved on first use so non-chat endpoints never load them
+        self._llm = llm_provider
+        self._models_lock = threading.Lock()
 
         # Conversation context memory
         self.conversation_contexts = {}
@@ -297,36 +365,72 @@ class SemanticIntelligentRAG:
         # Track last sources surfaced per session for downstream clients
         self.last_sources_by_session = {}
 
-        # Mongo configuration per tenant
-        self.mongo_client = None
-        self.leads_collection = None
-        self.mongo_enabled = PYMONGO_AVAILABLE and MongoClient is not None
+        # Coalesces identical concurrent questions into one retrieval + LLM call
+        self.inflight = SingleFlight(name="chat")
 
-        if self.mongo_enabled:
-            self.mongo_uri = mongo_uri or os.getenv("MONGODB_URI", "mongodb://localhost:27017")
-            self.mongo_database_name = None
+        # Cross-encoder scores by (question, chunk id); emptied when the collection changes
+        self.rerank_cache = RerankScoreCache()
+        self.register_cache_invalidator(self.rerank_cache.clear)
 
-            try:
-                if parse_uri:
-                    parsed_uri = parse_uri(self.mongo_uri)
-                    self.mongo_database_name = parsed_uri.get("database")
-            except Exception as uri_err:
-                print(f"⚠️ Unable to parse MongoDB URI for tenant {self.resource_id}: {uri_err}")
+        # Retrieval plan, chosen on first use and again after the collection changes
+        self._retrieval_plan: Optional[RetrievalPlan] = None
+        self.register_cache_invalidator(self._reset_retrieval_plan)
 
-            if not self.mongo_database_name:
-                self.mongo_database_name = os.getenv("MONGODB_DATABASE", "rag_chatbot")
+        # Opt-in anonymised capture of every turn for offline replay (QUERY_LOG_ENABLED)
+        self.query_log = get_query_log()
+
+        # Process-wide load signal that picks each turn's quality tier
+        self.load_monitor = get_load_monitor()
+
+        # Optional alternate retrieval plan re-run on sampled turns (SHADOW_PLAN); None when off
+        self.shadow = get_shadow_evaluator()
+
+        # Leads storage; usually shared per database URI by TenantChatbotManager
+        self.lead_store = lead_store or TenantLeadStore(mongo_uri, label=resource_id)
+
+    @property
+    def llm(self) -> LLMProvider:
+        if self._llm is None:
+            with self._models_lock:
+                if self._llm is None:
+                    print("🔄 Initializing LLM provider...")
+                    try:
+                        self._llm = get_llm_provider()
+                        print(f"✅ LLM provider initialized successfully: {self._llm.name}")
+                    except Exception as e:
+                        print(f"❌ Error initializing LLM provider: {e}")
+                        raise
+        return self._llm
+
+    @property
+    def llm_gateway(self):
+        # Shared admission control: global and per-tenant concurrency, queue bound, deadlines
+        return get_llm_gateway()
+
+    @property
+    def reranker(self):
+        # Shared cross-encoder reranker (one instance per process)
+        return get_reranker(RERANKER_MODEL)
+
+    @property
+    def retrieval_plan(self) -> RetrievalPlan:
+        plan = self._retrieval_plan
+        if plan is None:
+            plan = self._retrieval_plan = load_tenant_plan(self.vector_store_path, self.collection.count)
+            print(f"🧭 Retrieval plan for {self.resource_id or self.vector_store_path}: {plan.name}")
+        return plan
+
+    def _reset_retrieval_plan(self):
+        self._retrieval_plan = None
+
+    @property
+    def mongo_enabled(self) -> bool:
+        return self.lead_store.enabled
+
+    @property
+    def leads_collection(self):
+        return self.lead_store.collection
 
-            try:
-                self.init_mongodb_connection()
-                print("✅ MongoDB leads database initialized successfully!")
-            except Exception as e:
-                print(f"❌ MongoDB initialization failed: {e}")
-                self.mongo_client = None
-                self.leads_collection = None
-        else:
-            self.mongo_uri = None
-            self.mongo_database_name = None
-            print("ℹ️ pymongo not installed; lead storage features are disabled")
     def start_name_collection(self, session_id: str):
         """Start the name collection process for new sessions"""
         self.name_collection_states[session_id] = {
@@ -394,157 +498,6 @@ class SemanticIntelligentRAG:
         return True
 
 
-    def init_mongodb_connection(self):
-        """Initialize MongoDB connection and setup leads collection"""
-        if not self.mongo_enabled or MongoClient is None:
-            raise RuntimeError("MongoDB support unavailable; install pymongo to enable lead storage")
-
-        mongo_uri = self.mongo_uri or os.getenv("MONGODB_URI", "mongodb://localhost:27017")
-        database_name = self.mongo_database_name or os.getenv("MONGODB_DATABASE", "rag_chatbot")
-
-        try:
-            print(f"🔄 Connecting to MongoDB at {mongo_uri} for tenant {self.resource_id}...")
-            print(f"🎯 Target database: {database_name}")
-            self.mongo_client = MongoClient(
-                mongo_uri,
-                maxPoolSize=50,
-                minPoolSize=10,
-                maxIdleTimeMS=45000,
-                waitQueueTimeoutMS=5000,
-                serverSelectionTimeoutMS=5000,
-                connectTimeoutMS=10000,
-                socketTimeoutMS=20000,
-                retryWrites=True,
-                retryReads=True,
-                connect=False
-            )
-
-            # Test connection
-            self.mongo_client.admin.command('ping')
-            print("✅ MongoDB connection successful!")
-            print(f"📊 Pool config: maxPoolSize=50, minPoolSize=10")
-
-            # Get database and collection
-            self.mongo_db = self.mongo_client[database_name]
-            self.mongo_database_name = database_name
-            self.leads_collection = self.mongo_db['leads']
-
-            # Drop old problematic indexes if they exist
-            try:
-                self.leads_collection.drop_index("chatbot_session_email_idx")
-                print("✅ Dropped old session_email index")
-            except Exception as e:
-                print(f"ℹ️ No old index to drop: {e}")
-
-            # Drop the unique email index to allow duplicate emails
-            try:
-                self.leads_collection.drop_index("email_1")
-                print("✅ Dropped unique email_1 index - duplicate emails now allowed")
-            except Exception as e:
-                print(f"ℹ️ email_1 index not found or already dropped: {e}")
-
-            # Create indexes for better performance with unique names for chatbot
-            try:
-                self.leads_collection.create_index([("session_id", 1)], unique=True, name="chatbot_session_idx")
-                self.leads_collection.create_index("created_at", name="chatbot_created_at_idx")
-            except Exception as index_error:
-                print(f"⚠️ Index creation warning: {index_error}")
-                # Continue anyway as indexes might already exist
-
-            print(f"✅ MongoDB database '{database_name}' and 'leads' collection ready!")
-            print(f"📊 Current leads count: {self.leads_collection.count_documents({})}")
-
-        except ServerSelectionTimeoutError:
-            print("❌ Could not connect to MongoDB server. Make sure MongoDB is running.")
-            raise
-        except Exception as e:
-            print(f"❌ MongoDB setup error: {e}")
-            print(f"🔍 MongoDB URI used: {mongo_uri}")
-            print(f"🔍 Database name used: {database_name}")
-            print(f"❌ MongoDB initialization failed: {e}")
-            raise
-
-    def close_mongodb_connection(self):
-        """Properly close MongoDB connection pool"""
-        if self.mongo_client is not None:
-            try:
-                self.mongo_client.close()
-                print("✅ MongoDB connection pool closed successfully")
-            except Exception as e:
-                print(f"⚠️ Error closing MongoDB connection: {e}")
-
-    def save_lead_to_database(self, leaddata: Dict):
-        """Save lead data to MongoDB"""
-        if not self.mongo_enabled or self.leads_collection is None:
-            print("ℹ️ Lead storage skipped because MongoDB is not available")
-            return
-
-        print(f"🔍 DATABASE DEBUG - About to save leaddata: {leaddata}")
-
-        try:
-            # Prepare document for MongoDB
-            lead_document = {
-                "name": leaddata["name"],
-                "phone": leaddata["phone"], 
-                "email": leaddata["email"],
-                "original_question": leaddata["original_question"],
-                "session_id": leaddata.get("session_id"),
-                "created_at": datetime.datetime.utcnow(),
-                "source": "pricing_inquiry",
-                "status": "new",
-                "last_contact": datetime.datetime.utcnow()
-            }
-
-            # Insert the document
-            result = self.leads_collection.insert_one(lead_document)
-            print(f"✅ Lead saved to MongoDB with ID: {result.inserted_id}")
-
-        except DuplicateKeyError:
-            print(f"⚠️ Lead with email {leaddata['email']} already exists")
-            # Update existing lead instead
-            self.leads_collection.update_one(
-                {"email": leaddata["email"]},
-                {
-                    "$set": {
-                        "name": leaddata["name"],
-                        "phone": leaddata["phone"],
-                        "original_question": leaddata["original_question"],
-                        "session_id": leaddata.get("session_id"),
-                        "last_contact": datetime.datetime.utcnow(),
-                        "status": "updated"
-                    }
-                }
-            )
-            print(f"✅ Existing lead updated for email: {leaddata['email']}")
-        except Exception as e:
-            print(f"❌ Error saving lead to MongoDB: {e}")
-
-    def get_all_leads(self) -> List[Dict]:
-        """Get all leads from MongoDB"""
-        if not self.mongo_enabled or self.leads_collection is None:
-            return []
-
-        try:
-            leads = list(self.leads_collection.find().sort("created_at", pymongo.DESCENDING))
-            # Convert ObjectId to string for JSON serialization
-            for lead in leads:
-                lead['_id'] = str(lead['_id'])
-            return leads
-        except Exception as e:
-            print(f"❌ Error fetching leads from MongoDB: {e}")
-            return []
-
-    def get_leads_count(self) -> int:
-        """Get total count of leads in MongoDB"""
-        if not self.mongo_enabled or self.leads_collection is None:
-            return 0
-
-        try:
-            return self.leads_collection.count_documents({})
-        except Exception as e:
-            print(f"❌ Error getting leads count from MongoDB: {e}")
-            return 0
-
     def process_lead_data_step_by_step(self, session_id: str, response: str) -> Tuple[bool, str]:
         """Process lead collection step by step"""
         if session_id not in self.lead_collection_states:
@@ -624,21 +577,32 @@ class SemanticIntelligentRAG:
 
         return False, "Please try again."
 
-    def get_conversation_context(self, session_id: str):
+    def get_conversation_context(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """The previous retrieval (question, intent, chunk ids) if it is still fresh.
+
+        Only the retrieval entry expires; name and lead details stored in the
+        same session context are kept.
+        """
         context = self.conversation_contexts.get(session_id)
-        if context:
-            time_diff = datetime.datetime.now() - context['timestamp']
-            if time_diff.total_seconds() < 600:
-                return context
-            del self.conversation_contexts[session_id]
+        retrieval = context.get("retrieval") if context else None
+        if not retrieval:
+            return None
+        if time.monotonic() - retrieval["stored_at"] < FOLLOW_UP_CONTEXT_TTL:
+            return retrieval
+        context.pop("retrieval", None)
         return None
 
-    def store_conversation_context(self, session_id: str, question: str, docs: List[str], intent: str):
-        self.conversation_contexts[session_id] = {
-            "last_question": question,
-            "last_docs": docs,
-            "last_intent": intent,
-            "timestamp": datetime.datetime.now()
+    def store_conversation_context(self, session_id: str, question: str, chunk_ids: List[str], intent: str):
+        """Remember this turn's reranked candidates (as chunk ids) for follow-up questions"""
+        context = self.conversation_contexts.setdefault(session_id, {})
+        if not chunk_ids:
+            context.pop("retrieval", None)
+            return
+        context["retrieval"] = {
+            "question": question,
+            "intent": intent,
+            "chunk_ids": list(chunk_ids[:FOLLOW_UP_MAX_CHUNKS]),
+            "stored_at": time.monotonic()
         }
 
     def start_lead_collection(self, session_id: str, original_question: str):
@@ -672,169 +636,209 @@ class SemanticIntelligentRAG:
         return "Error: Lead collection not initialized."
 
 
-    def analyze_question_semantically(self, question: str) -> Dict:
+    def analyze_question_semantically(self, question: str, include_embedding: bool = True) -> Dict:
         words = question.split()
         entity_mentions = [word for word in words if len(word) > 2 and word[0].isupper()]
 
-        return {
+        analysis = {
             'intent': 'general_inquiry',
             'intent_confidence': 0.5,
             'key_concepts': question.split(),
-            'question_embedding': self.embedding_model.encode(question),
+            # Capitalised words; the "entities" dense stage of a retrieval plan searches with these
+            'entity_mentions': entity_mentions,
             'original_question': question
         }
+        if include_embedding:
+            analysis['question_embedding'] = self.embedding_engine.encode(question)
+        return analysis
 
-    def comprehensive_semantic_retrieval(self, question_analysis: Dict) -> Tuple[List[str], List[float]]:
-        try:
-            docs = []
-            distances = []
-
-            # Strategy 1: Primary embedding-based search
-            results = self.collection.query(
-                query_embeddings=[question_analysis['question_embedding'].tolist()],
-                n_results=50
-            )
-
-            if results['documents'] and results['documents'][0]:
-                docs.extend(results['documents'][0])
-                distances.extend(results['distances'][0])
+    @staticmethod
+    def _collect_ids(id_sink: Optional[Dict[str, str]], docs_rows, ids_rows):
+        """Remember the chunk id of every returned document (text -> id)"""
+        if id_sink is None:
+            return
+        for docs, ids in zip(docs_rows or [], ids_rows or []):
+            for doc, chunk_id in zip(docs or [], ids or []):
+                if doc:
+                    id_sink.setdefault(doc, chunk_id)
 
-            # Strategy 2: Text-based search using individual words from the question
-            question_words = [word.lower().strip() for word in question_analysis['original_question'].split() if len(word) > 2]
+    def _query_by_text(
+        self,
+        texts: List[str],
+        n_results: int,
+        id_sink: Optional[Dict[str, str]] = None
+    ) -> List[List[str]]:
+        """Embed texts with the shared engine and run them as a single Chroma query"""
+        response = self.collection.query(
+            query_embeddings=self.embedding_engine.as_query_embeddings(self.embedding_engine.encode(texts)),
+            n_results=n_results
+        )
+        self._collect_ids(id_sink, response.get('documents'), response.get('ids'))
+        return [docs or [] for docs in (response.get('documents') or [])]
 
-            for word in question_words:
+    def _run_text_queries(
+        self,
+        query_specs: List[Tuple[str, int]],
+        chunk_size: int = 256,
+        id_sink: Optional[Dict[str, str]] = None,
+        deadline: Optional[RequestDeadline] = None
+    ) -> Dict[Tuple[str, int], List[str]]:
+        """Execute many text queries with one encode pass and one Chroma call per n_results group.
+
+        Once the deadline has passed no further Chroma calls are issued; the
+        queries that were not sent are counted as avoided work.
+        """
+        grouped: Dict[int, List[str]] = {}
+        for query_text, n_results in query_specs:
+            grouped.setdefault(n_results, []).append(query_text)
+
+        if deadline is not None and deadline.expired():
+            deadline.cut("retrieval_subqueries", len(query_specs))
+            return {}
+
+        # Each distinct text is embedded once even when it appears under several n_results
+        unique_all = list(dict.fromkeys(text for text, _ in query_specs))
+        try:
+            vectors = self.embedding_engine.encode(unique_all)
+        except Exception as e:
+            print(f"⚠️ Embedding {len(unique_all)} text queries failed: {e}")
+            return {}
+        row_of = {text: row for row, text in enumerate(unique_all)}
+
+        results: Dict[Tuple[str, int], List[str]] = {}
+        total_queries = sum(len(set(texts)) for texts in grouped.values())
+        issued = 0
+        for n_results, texts in grouped.items():
+            unique_texts = list(dict.fromkeys(texts))
+            for start in range(0, len(unique_texts), chunk_size):
+                chunk = unique_texts[start:start + chunk_size]
+                if deadline is not None and deadline.expired():
+                    deadline.cut("retrieval_subqueries", total_queries - issued)
+                    return results
+                issued += len(chunk)
                 try:
-                    word_results = self.collection.query(
-                        query_texts=[word],
-                        n_results=25
+                    response = self.collection.query(
+                        query_embeddings=self.embedding_engine.as_query_embeddings(
+                            vectors[[row_of[text] for text in chunk]]
+                        ),
+                        n_results=n_results
                     )
-                    if word_results['documents'] and word_results['documents'][0]:
-                        docs.extend(word_results['documents'][0])
-                        distances.extend([0.7] * len(word_results['documents'][0]))
                 except Exception as e:
-                    print(f"Word search error for '{word}': {e}")
+                    print(f"⚠️ Batched text search failed ({len(chunk)} queries, n={n_results}): {e}")
                     continue
+                self._collect_ids(id_sink, response.get('documents'), response.get('ids'))
+                for query_text, docs in zip(chunk, response.get('documents') or []):
+                    results[(query_text, n_results)] = docs or []
+        return results
 
-            # Strategy 3: Context-aware expanded search
-            original_question = question_analysis['original_question'].lower()
-            expanded_searches = []
-
-            # Dynamically generate related terms based on question content
-            if any(word in original_question for word in ['founded', 'establish', 'start', 'began', 'create']):
-                expanded_searches.extend(['founded', 'established', 'started', 'began', 'created', 'inception', 'formation'])
-
-            if any(word in original_question for word in ['year', 'when', 'date', 'time']):
-                # Search for common years in business contexts
-                current_year = datetime.date.today().year
-                year_range = list(range(current_year - 20, current_year + 1))
-                expanded_searches.extend([str(year) for year in year_range])
-
-            if any(word in original_question for word in ['company', 'business', 'organization']):
-                expanded_searches.extend(['company', 'business', 'organization', 'corporation', 'firm'])
-
-            if any(word in original_question for word in ['head', 'ceo', 'leader', 'manager', 'director']):
-                expanded_searches.extend(['CEO', 'head', 'director', 'manager', 'leader', 'president', 'founder'])
-
-            # Add the question's key concepts
-            expanded_searches.extend(question_analysis['key_concepts'])
-
-            # Search with expanded terms
-            for term in expanded_searches:
-                if len(str(term)) > 1:  # Skip very short terms
-                    try:
-                        term_results = self.collection.query(
-                            query_texts=[str(term)],
-                            n_results=20
-                        )
-                        if term_results['documents'] and term_results['documents'][0]:
-                            docs.extend(term_results['documents'][0])
-                            distances.extend([0.8] * len(term_results['documents'][0]))
-                    except Exception as e:
-                        print(f"Expanded search error for '{term}': {e}")
-                        continue
-
-            # Strategy 4: Fuzzy/partial matching with question variations
-            question_variations = [
-                question_analysis['original_question'],
-                question_analysis['original_question'].replace('was', '').replace('is', '').strip(),
-                ' '.join(question_words),  # Just the key words
-            ]
-
-            for variation in question_variations:
-                if variation and len(variation) > 3:
-                    try:
-                        var_results = self.collection.query(
-                            query_texts=[variation],
-                            n_results=40
-                        )
-                        if var_results['documents'] and var_results['documents'][0]:
-                            docs.extend(var_results['documents'][0])
-                            distances.extend([0.9] * len(var_results['documents'][0]))
-                    except Exception as e:
-                        print(f"Variation search error for '{variation}': {e}")
-                        continue
-
-            # Remove duplicates while preserving order and combining distances
-            unique_docs = []
-            unique_distances = []
-            seen = set()
-
-            for doc, dist in zip(docs, distances):
-                if doc and doc.strip() and doc not in seen:
-                    unique_docs.append(doc)
-                    unique_distances.append(dist)
-                    seen.add(doc)
-
-            print(f"🔍 Retrieved {len(unique_docs)} unique documents for: '{question_analysis['original_question']}'")
-
-            return unique_docs[:100], unique_distances[:100]  # Return more documents for better coverage
-
-        except Exception as e:
-            print(f"❌ Error in comprehensive semantic retrieval: {e}")
-            return [], []
-
-    def smart_rerank_candidates(self, question: str, docs: List[str], topn: Optional[int] = None) -> List[str]:
-        """Hybrid reranking: CrossEncoder semantic scoring + keyword match boosting"""
-        if not docs:
-            return []
-
+    @staticmethod
+    def _keyword_bonus(question: str, doc: str) -> float:
         # Extract meaningful keywords from question (ignore short words)
         keywords = [word.lower() for word in question.split() if len(word) > 3]
+        doc_lower = doc.lower()
+        keyword_matches = sum(1 for keyword in keywords if keyword in doc_lower)
+        return keyword_matches * 0.3  # Boost score by 0.3 per matched keyword
 
-        # Score each document
-        doc_scores = []
-        for doc in docs:
-            # Get semantic relevance score from CrossEncoder
-            semantic_score = self.reranker.predict([(question, doc)])[0]
-
-            # Calculate keyword match bonus
-            doc_lower = doc.lower()
-            keyword_matches = sum(1 for keyword in keywords if keyword in doc_lower)
-            keyword_bonus = keyword_matches * 0.3  # Boost score by 0.3 per matched keyword
-
-            # Combine scores: semantic + keyword boost
-            final_score = semantic_score + keyword_bonus
-            doc_scores.append((doc, final_score))
-
-        # Sort documents by combined score (highest first)
-        doc_scores.sort(key=lambda x: x[1], reverse=True)
-
+    def score_candidates(
+        self,
+        question: str,
+        docs: List[str],
+        doc_ids: Optional[Dict[str, str]] = None,
+        observe_cost: bool = True
+    ) -> List[Tuple[str, float]]:
+        """Hybrid scoring: CrossEncoder semantic relevance + keyword match boosting, best first"""
+        ids = [doc_ids.get(doc) for doc in docs] if doc_ids else None
+        return self.batch_score_candidates([question], [docs], [ids] if ids else None, observe_cost=observe_cost)[0]
+
+    def batch_score_candidates(
+        self,
+        questions: List[str],
+        docs_per_question: List[List[str]],
+        ids_per_question: Optional[List[List[Optional[str]]]] = None,
+        observe_cost: bool = True
+    ) -> List[List[Tuple[str, float]]]:
+        """Score every (question, doc) pair in a single cross-encoder pass.
+
+        Pairs with a known chunk id are looked up in the tenant's rerank score
+        cache first; only the misses reach the cross-encoder. With observe_cost
+        the cross-encoder's time per pair feeds the deadline's rerank_cost estimate.
+        """
+        generation = self.rerank_cache.generation
+        semantic_scores: List[List[Optional[float]]] = []
+        pairs: List[Tuple[str, str]] = []
+        slots: List[Tuple[int, int]] = []
+        for index, (question, docs) in enumerate(zip(questions, docs_per_question)):
+            ids = ids_per_question[index] if ids_per_question else [None] * len(docs)
+            cached = self.rerank_cache.get_many(question, ids)
+            row = [cached.get(chunk_id) if chunk_id else None for chunk_id in ids]
+            for position, doc in enumerate(docs):
+                if row[position] is None:
+                    pairs.append((question, doc))
+                    slots.append((index, position))
+            semantic_scores.append(row)
+
+        started = time.perf_counter()
+        predicted = self.reranker.predict(pairs, batch_size=64) if pairs else []
+        if observe_cost and pairs:
+            # Only misses cost cross-encoder time; cache hits would make pairs look free
+            rerank_cost.observe(len(pairs), time.perf_counter() - started)
+        metrics.increment("rerank_pairs_total", len(pairs))
+        fresh: Dict[int, Dict[str, float]] = {}
+        for (index, position), value in zip(slots, predicted):
+            semantic_scores[index][position] = float(value)
+            chunk_id = ids_per_question[index][position] if ids_per_question else None
+            if chunk_id:
+                fresh.setdefault(index, {})[chunk_id] = float(value)
+        for index, scores in fresh.items():
+            self.rerank_cache.put_many(questions[index], scores, generation)
+
+        scored: List[List[Tuple[str, float]]] = []
+        for index, (question, docs) in enumerate(zip(questions, docs_per_question)):
+            doc_scores = []
+            for position, doc in enumerate(docs):
+                # Combine scores: semantic + keyword boost
+                final_score = float(semantic_scores[index][position] + self._keyword_bonus(question, doc))
+                doc_scores.append((doc, final_score))
+            # Sort documents by combined score (highest first)
+            doc_scores.sort(key=lambda x: x[1], reverse=True)
+            scored.append(doc_scores)
+        return scored
+
+    def smart_rerank_candidates(
+        self,
+        question: str,
+        docs: List[str],
+        topn: Optional[int] = None,
+        doc_ids: Optional[Dict[str, str]] = None
+    ) -> List[str]:
+        """Hybrid reranking: CrossEncoder semantic scoring + keyword match boosting"""
         # Return top K documents
         k = topn or self.max_passages
-        return [doc for doc, score in doc_scores[:k]]
+        return [doc for doc, score in self.score_candidates(question, docs, doc_ids)[:k]]
 
     def detect_pricing_inquiry(self, question: str, intent: str) -> bool:
         pricing_keywords = ['price', 'cost', 'pricing', 'quote', 'rates', 'how much']
         return any(keyword in question.lower() for keyword in pricing_keywords)
 
-    def synthesize_comprehensive_answer(self, question_analysis: Dict, docs: List[str], is_follow_up: bool = False) -> str:
+    def synthesize_comprehensive_answer(
+        self,
+        question_analysis: Dict,
+        docs: List[str],
+        is_follow_up: bool = False,
+        doc_scores: Optional[List[float]] = None,
+        deadline: Optional[float] = None
+    ) -> str:
         if not docs:
             return "I couldn't find relevant information to answer your question."
 
         try:
-            # Use top 12 documents for better context
-            combined_context = "\n".join(docs[:12])
-
+            # Pack the best non-redundant passages into the token budget
+            packed = self.context_packer.pack(docs, doc_scores)
+            combined_context = packed.text
+            metrics.increment("context_packer_runs_total")
+            for reason, count in packed.dropped.items():
+                metrics.increment("context_packer_dropped_total", count, reason=reason)
+            metrics.observe("llm_context_passages", len(packed.passages))
 
             # Improved universal prompt
             prompt = f"""You are a helpful assistant that answers questions accurately using the provided context.
@@ -855,26 +859,30 @@ QUESTION: {question_analysis['original_question']}
 
 ANSWER (be concise and factual):"""
 
+            metrics.observe("llm_prompt_chars", len(prompt))
+            metrics.observe("llm_prompt_tokens_estimated", self.context_packer.estimate_tokens(prompt))
+            print(f"📦 Packed {len(packed.passages)}/{len(docs)} passages (~{packed.estimated_tokens} tokens, dropped: {packed.dropped or 'none'})")
 
             # Use low temperature for consistency
-            generation_config = genai.types.GenerationConfig(
+            response_text = self.llm_gateway.generate(
+                self.llm,
+                prompt,
+                tenant_id=self.resource_id or self.vector_store_path,
+                deadline=deadline,
                 temperature=0.3,  # Balanced for natural conversation while maintaining accuracy
                 top_p=0.8,
                 top_k=50
             )
 
-            response = self.model.generate_content(
-                prompt,
-                generation_config=generation_config
-            )
-
-            answer = response.text.strip() if response and response.text else \
-                    "I found some information but couldn't generate a proper response."
+            answer = response_text or "I found some information but couldn't generate a proper response."
 
             print(f"✅ Generated answer (length: {len(answer)} characters)")
 
             return answer
 
+        except LLMOverloadedError:
+            # Shedding decisions surface to the API as 429/503 rather than a canned answer
+            raise
         except Exception as e:
             print(f"❌ Error in answer synthesis: {e}")
             return "I found relevant information but encountered an error while generating the response."
@@ -956,14 +964,11 @@ ANSWER (be concise and factual):"""
 
         print(f"🔍 Searching with terms: {contact_search_terms[:3]}...")
         contact_docs = []
-        for term in contact_search_terms:
-            try:
-                results = self.collection.query(query_texts=[term], n_results=40)
-                if results['documents'] and results['documents'][0]:
-                    contact_docs.extend(results['documents'][0])
-            except Exception as e:
-                print(f"❌ Error searching for term '{term}': {e}")
-                continue
+        try:
+            for docs in self._query_by_text(contact_search_terms, 40):
+                contact_docs.extend(docs)
+        except Exception as e:
+            print(f"❌ Error searching contact terms: {e}")
 
         unique_docs = []
         seen = set()
@@ -975,8 +980,21 @@ ANSWER (be concise and factual):"""
         print(f"📄 Found {len(unique_docs)} unique contact documents")
         return unique_docs[:25]
 
-    def is_follow_up_question(self, question: str) -> bool:
-        """Enhanced follow-up detection with better no handling"""
+    # Whole-message continuations; anything else ("How do I continue my subscription?") is a new question
+    FOLLOW_UP_PHRASES = {
+        "tell me more", "more details", "more", "elaborate", "go ahead", "go on", "continue", "keep going",
+    }
+    # Politeness and assent that may wrap a continuation ("yes please, go on")
+    FOLLOW_UP_FILLER = {"yes", "yeah", "yep", "sure", "ok", "okay", "please", "pls", "can", "could", "you"}
+    FOLLOW_UP_MAX_WORDS = 6
+
+    @classmethod
+    def is_follow_up_question(cls, question: str) -> bool:
+        """Enhanced follow-up detection with better no handling.
+
+        True only for short messages made up entirely of assent and a
+        continuation phrase; "negative" for a plain no.
+        """
         question_lower = question.lower().strip()
         simple_responses = ["yes", "yeah", "yep", "sure", "ok", "okay"]
         if question_lower in simple_responses:
@@ -984,9 +1002,11 @@ ANSWER (be concise and factual):"""
         negative_responses = ["no", "nope", "nah", "not really", "no thanks", "that's enough"]
         if question_lower in negative_responses:
             return "negative"
-        continuation_patterns = ["tell me more", "more details", "elaborate", "go ahead", "continue"]
-        has_continuation_pattern = any(pattern in question_lower for pattern in continuation_patterns)
-        return has_continuation_pattern
+        words = re.findall(r"[a-z']+", question_lower)
+        if not words or len(words) > cls.FOLLOW_UP_MAX_WORDS:
+            return False
+        remainder = " ".join(word for word in words if word not in cls.FOLLOW_UP_FILLER)
+        return remainder in cls.FOLLOW_UP_PHRASES
 
     def _store_source_snippets(
         self,
@@ -1011,7 +1031,490 @@ ANSWER (be concise and factual):"""
         stored = self.last_sources_by_session.get(session_id, [])
         return stored[:limit]
 
-    def chat(self, question: str, session_id: str = "default") -> str:
+    def _store_stamp(self) -> Tuple[Optional[int], Optional[int]]:
+        """mtimes of the CURRENT pointer and change manifest (two stat() calls)"""
+        stamps = []
+        for name in (CURRENT_POINTER_FILENAME, MANIFEST_FILENAME):
+            try:
+                stamps.append(os.stat(os.path.join(self.vector_store_path, name)).st_mtime_ns)
+            except FileNotFoundError:
+                stamps.append(None)
+        return stamps[0], stamps[1]
+
+    @staticmethod
+    def _close_client(client) -> bool:
+        """Release a Chroma client's files and memory; False on chromadb < 1.0, which has no public close()"""
+        close = getattr(client, "close", None)
+        if close is None:
+            return False
+        close()
+        return True
+
+    def _open_vector_store(self, reload_legacy: bool = False):
+        """(Re)open the Chroma client and collection for the published version"""
+        stamp = self._store_stamp()
+        manifest = read_manifest(self.vector_store_path)
+        read_path, version = resolve_read_path(self.vector_store_path)
+        previous = getattr(self, "chroma_client", None)
+        if reload_legacy and version is None and previous is not None:
+            # Same directory rewritten in place: Chroma shares one System per path, which holds the
+            # stale HNSW index. Close it (queries still running on the old handle may fail; the
+            # versioned layout avoids this), or on older chromadb make the next client build a new one.
+            if not self._close_client(previous):
+                previous.clear_system_cache()
+        client = chromadb.PersistentClient(path=read_path)
+        # No embedding_function: every query passes query_embeddings from the shared engine, and
+        # chromadb >= 0.5 rejects functions that don't implement its name()/get_config() protocol
+        collection = get_or_create_tenant_collection(client, self.collection_name, self.vector_store_path)
+        # Compare against the model the writer stamped; the bot never stamps it itself
+        self.embedding_engine.verify_collection(collection)
+        # Single assignments so concurrent readers see either the old or the new pair
+        self.chroma_client, self.collection = client, collection
+        self.vector_store_version = version
+        self.collection_version = int(manifest.get("collection_version", 0))
+        self._store_seen = stamp
+        self._next_store_check = time.monotonic() + VECTOR_STORE_CHECK_INTERVAL
+        print(f"📂 Vector store for {self.resource_id or self.vector_store_path}: "
+              f"{version or 'legacy layout'} (collection_version {self.collection_version})")
+
+    def register_cache_invalidator(self, callback: Callable[[], None]):
+        """Register a tenant-scoped cache to clear whenever the tenant's data changes"""
+        self._cache_invalidators.append(callback)
+
+    def _invalidate_caches(self):
+        for callback in self._cache_invalidators:
+            try:
+                callback()
+            except Exception as e:
+                print(f"⚠️ Cache invalidation failed: {e}")
+        metrics.increment("tenant_cache_invalidations_total")
+
+    def refresh_vector_store(self):
+        """Reload the tenant handle after an ingestion run; at most two stat() calls per interval"""
+        if self._retired_clients and self._store_lock.acquire(blocking=False):
+            try:
+                self._release_retired_clients()
+            finally:
+                self._store_lock.release()
+        now = time.monotonic()
+        if now < self._next_store_check:
+            return
+        self._next_store_check = now + VECTOR_STORE_CHECK_INTERVAL
+        if self._store_stamp() == self._store_seen:
+            return
+
+        with self._store_lock:
+            if self._store_stamp() == self._store_seen:
+                return
+            previous_client = self.chroma_client
+            previous_versions = (self.vector_store_version, self.collection_version)
+            try:
+                self._open_vector_store(reload_legacy=True)
+            except Exception as e:
+                print(f"⚠️ Keeping vector store version {previous_versions[0]}: {e}")
+                return
+            if previous_client is not self.chroma_client:
+                self._retired_clients.append((previous_client, time.monotonic()))
+            if (self.vector_store_version, self.collection_version) == previous_versions:
+                return
+            metrics.increment("vector_store_reloads_total")
+            self._invalidate_caches()
+
+    def _release_retired_clients(self, grace_seconds: float = 60.0):
+        """Close handles to superseded versions once in-flight queries have had time to finish.
+
+        Runs at the start of every turn (refresh_vector_store), under _store_lock.
+        """
+        now = time.monotonic()
+        keep = []
+        for client, retired_at in self._retired_clients:
+            if now - retired_at < grace_seconds:
+                keep.append((client, retired_at))
+                continue
+            try:
+                # Older chromadb has no public close(); dropping our reference is all we can do
+                self._close_client(client)
+            except Exception as e:
+                print(f"⚠️ Could not release retired vector store client: {e}")
+        self._retired_clients = keep
+
+    def retrieve_batch(self, questions: List[str], trace: ChatTrace) -> List[Dict[str, Any]]:
+        """Retrieval half of /chat/batch: the tenant's retrieval plan for every question.
+
+        Returns one item per question for answer_batch_item.
+        """
+        self.refresh_vector_store()
+        tier = trace.tier = self.load_monitor.current_tier()
+        plan = self.retrieval_plan.for_tier(TIER_SETTINGS[tier])
+        items: List[Dict[str, Any]] = []
+        with trace.stage("batch_retrieval"):
+            # One encode pass for every question; each then runs the same plan as a chat turn
+            analyses = [self.analyze_question_semantically(question, include_embedding=False) for question in questions]
+            for analysis, embedding in zip(analyses, self.embedding_engine.encode(questions)):
+                analysis['question_embedding'] = embedding
+            for analysis in analyses:
+                scored_docs, _ = self.retrieve_and_rank(analysis, trace, plan)
+                items.append({"analysis": analysis, "scored": scored_docs, "candidates": len(trace.retrieved_ids)})
+        return items
+
+    def answer_batch_item(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        """Generation half of /chat/batch for one question.
+
+        A shed or failed LLM call answers with the top passage and reports the
+        error on the item instead of failing the rest of the batch.
+        """
+        docs = [doc for doc, _ in item["scored"]]
+        result = {"query": item["analysis"]["original_question"], "candidates": item["candidates"]}
+        try:
+            result["answer"] = self.synthesize_comprehensive_answer(
+                item["analysis"],
+                docs,
+                doc_scores=[score for _, score in item["scored"]]
+            )
+        except LLMOverloadedError as e:
+            metrics.increment("chat_batch_item_errors_total", reason=e.reason)
+            result.update(answer=self.partial_answer(docs), partial=True, error=f"{e.reason}: {e}")
+        except Exception as e:
+            metrics.increment("chat_batch_item_errors_total", reason="error")
+            print(f"❌ Batch answer failed: {e}")
+            result.update(answer=self.partial_answer(docs), partial=True, error=str(e))
+        return result
+
+    @staticmethod
+    def partial_answer(docs: List[str], max_chars: int = 500) -> str:
+        """Best-effort reply when there is no time left for the LLM: the top passage, trimmed"""
+        if not docs:
+            return "I couldn't find relevant information to answer your question."
+        passage = " ".join(docs[0].split())
+        if len(passage) > max_chars:
+            cut = passage.rfind(". ", 0, max_chars)
+            passage = passage[:cut + 1] if cut > 0 else passage[:max_chars].rstrip() + "..."
+        return f"Here's the most relevant information I found:\n\n{passage}"
+
+    def rerank_within_deadline(
+        self,
+        question: str,
+        docs: List[str],
+        trace: ChatTrace,
+        deadline: Optional[RequestDeadline] = None,
+        fallback_scores: Optional[Dict[str, float]] = None,
+        doc_ids: Optional[Dict[str, str]] = None
+    ) -> List[Tuple[str, float]]:
+        """Cross-encoder scoring of as many candidates as fit before the deadline.
+
+        Time for generation is held back; candidates beyond what fits are
+        dropped. With no time at all the retrieval order is kept, scored from
+        fallback_scores.
+        """
+        keep = len(docs)
+        if deadline is not None:
+            keep = min(keep, rerank_cost.affordable(deadline.remaining() - DEADLINE_GENERATION_RESERVE_SECONDS))
+            if keep < len(docs):
+                deadline.cut("rerank", len(docs) - keep)
+                print(f"⏱️ Deadline: reranking {keep}/{len(docs)} candidates")
+        if keep <= 0:
+            fallback_scores = fallback_scores or {}
+            return [(doc, fallback_scores.get(doc, -1.0)) for doc in docs]
+
+        with trace.stage("rerank"):
+            # Shadow runs (traces without metrics) must not skew the production cost estimate
+            return self.score_candidates(question, docs[:keep], doc_ids, observe_cost=trace.emit_metrics)
+
+    def generate_within_deadline(
+        self,
+        question_analysis: Dict,
+        scored_docs: List[Tuple[str, float]],
+        trace: ChatTrace,
+        is_follow_up: bool = False,
+        deadline: Optional[RequestDeadline] = None
+    ) -> str:
+        """LLM synthesis bounded by the deadline; falls back to partial_answer when it is spent"""
+        docs = [doc for doc, _ in scored_docs]
+        if deadline is not None and deadline.expired(DEADLINE_MIN_GENERATION_SECONDS):
+            deadline.cut("generation")
+            print("⏱️ Deadline: skipping generation, returning the top passage")
+            return self.partial_answer(docs)
+
+        with trace.stage("generation"):
+            try:
+                return self.synthesize_comprehensive_answer(
+                    question_analysis,
+                    docs,
+                    is_follow_up=is_follow_up,
+                    doc_scores=[score for _, score in scored_docs],
+                    deadline=deadline.at if deadline is not None else None
+                )
+            except LLMOverloadedError:
+                if deadline is None or not deadline.expired():
+                    raise
+        # The gateway abandoned the call at the request deadline
+        deadline.cut("generation")
+        print("⏱️ Deadline: generation aborted, returning the top passage")
+        return self.partial_answer(docs)
+
+    def _dense_stage(self, query_embedding, n_results: int, doc_ids: Dict[str, str], scores: Dict[str, float]) -> List[str]:
+        results = self.collection.query(
+            query_embeddings=self.embedding_engine.as_query_embeddings(query_embedding),
+            n_results=n_results
+        )
+        docs = (results.get('documents') or [[]])[0] or []
+        distances = (results.get('distances') or [[]])[0] or []
+        self._collect_ids(doc_ids, results.get('documents'), results.get('ids'))
+        for doc, distance in zip(docs, distances):
+            scores.setdefault(doc, -distance)
+        return [doc for doc in docs if doc and doc.strip()]
+
+    def _text_query_stage(
+        self,
+        specs: List[Tuple[str, int]],
+        score: float,
+        doc_ids: Dict[str, str],
+        scores: Dict[str, float],
+        deadline: Optional[RequestDeadline]
+    ) -> List[str]:
+        results = self._run_text_queries(specs, id_sink=doc_ids, deadline=deadline)
+        docs = []
+        for spec in specs:
+            for doc in results.get(spec, []):
+                if doc and doc.strip():
+                    docs.append(doc)
+                    scores.setdefault(doc, score)
+        return docs
+
+    def run_retrieval_stage(
+        self,
+        stage: Dict[str, Any],
+        question_analysis: Dict,
+        doc_ids: Dict[str, str],
+        scores: Dict[str, float],
+        deadline: Optional[RequestDeadline] = None
+    ) -> List[str]:
+        """One dense / lexical / expansion stage of a retrieval plan; returns its ranked documents"""
+        question = question_analysis['original_question']
+        kind = stage["stage"]
+        if kind == "dense":
+            if stage["query"] == "question":
+                embedding = question_analysis['question_embedding']
+            else:
+                if stage["query"] == "normalized":
+                    text = question.rstrip('?.!,;')
+                else:
+                    text = ' '.join(question_analysis.get('entity_mentions', [])[:stage["max_terms"]])
+                if not text:
+                    return []
+                embedding = self.embedding_engine.encode(text)
+            return self._dense_stage(embedding, stage["n_results"], doc_ids, scores)
+
+        if kind == "lexical":
+            terms = lexical_terms(question, stage["min_word_length"], stage["max_terms"])
+            specs = [(term, stage["n_results"]) for term in terms]
+        else:
+            specs = [
+                (term, stage["terms_n_results"])
+                for term in expansion_terms(question_analysis, stage["year_span"], stage["max_terms"])
+            ]
+            specs.extend(
+                (variation, stage["variations_n_results"])
+                for variation in question_variations(question, lexical_terms(question))
+            )
+        return self._text_query_stage(specs, stage["score"], doc_ids, scores, deadline)
+
+    def retrieve_and_rank(
+        self,
+        question_analysis: Dict,
+        trace: ChatTrace,
+        plan: RetrievalPlan,
+        deadline: Optional[RequestDeadline] = None,
+        use_rerank_cache: bool = True
+    ) -> Tuple[List[Tuple[str, float]], Dict[str, str]]:
+        """Run a retrieval plan for one question, without generation.
+
+        Every stage is timed as "plan.<stage name>" on the trace, and every
+        retrieved chunk id lands in trace.retrieved_ids. Returns the top
+        (doc, score) pairs best first and a doc -> chunk id map.
+        use_rerank_cache=False scores every candidate with the cross-encoder.
+        """
+        # Normalize query by removing trailing punctuation for better retrieval
+        normalized_query = question_analysis['original_question'].rstrip('?.!,;')
+        trace.plan = plan.name
+        doc_ids: Dict[str, str] = {}
+        # First retrieval score seen per doc (-distance); orders candidates when the cross-encoder is off
+        retrieval_scores: Dict[str, float] = {}
+        candidates: List[str] = []
+        seen_docs = set()
+        pending: List[List[str]] = []
+
+        def flush(method: str = "concat", limit: Optional[int] = None, rrf_k: int = 60):
+            """Fuse the lists retrieved since the last fusion onto the candidate list"""
+            new_docs = [doc for doc in fuse(pending, method, rrf_k) if doc not in seen_docs]
+            pending.clear()
+            if limit:
+                new_docs = new_docs[:limit]
+            candidates.extend(new_docs)
+            seen_docs.update(new_docs)
+
+        with trace.stage("retrieval"):
+            if 'question_embedding' not in question_analysis:
+                with trace.stage("question_embedding"):
+                    question_analysis['question_embedding'] = self.embedding_engine.encode(question_analysis['original_question'])
+            searched = False
+            for stage in plan.retrieval_stages:
+                kind = stage["stage"]
+                if kind in ("dense", "lexical", "expansion") and searched and deadline is not None and deadline.expired():
+                    deadline.cut("retrieval_stages")
+                    continue
+                with trace.stage(f"plan.{stage['name']}"):
+                    if kind == "fusion":
+                        flush(stage["method"], stage["limit"], stage["rrf_k"])
+                    elif kind == "prefilter":
+                        flush()
+                        candidates[:] = prefilter(candidates, stage["min_chars"], stage["dedupe_prefix_chars"], stage["limit"])
+                    else:
+                        try:
+                            pending.append(self.run_retrieval_stage(stage, question_analysis, doc_ids, retrieval_scores, deadline))
+                        except Exception as e:
+                            print(f"⚠️ Retrieval stage '{stage['name']}' failed: {e}")
+                        searched = True
+            flush()
+
+        print(f"✅ Retrieved {len(candidates)} unique documents with plan '{plan.name}'")
+        trace.retrieved_ids = [doc_ids[doc] for doc in candidates if doc in doc_ids]
+
+        rerank = plan.rerank_stage
+        if rerank["limit"]:
+            candidates = candidates[:rerank["limit"]]
+        with trace.stage(f"plan.{rerank['name']}"):
+            if rerank["cross_encoder"]:
+                print(f"🎯 Reranking {len(candidates)} aggregated documents...")
+                scored_docs = self.rerank_within_deadline(
+                    normalized_query, candidates, trace, deadline, fallback_scores=retrieval_scores,
+                    doc_ids=doc_ids if use_rerank_cache else None
+                )
+            else:
+                # Keep retrieval order and skip the cross-encoder entirely
+                scored_docs = [(doc, retrieval_scores.get(doc, -1.0)) for doc in candidates]
+        return scored_docs[:rerank["top_n"]], doc_ids
+
+    def retrieve_and_answer(
+        self,
+        question_analysis: Dict,
+        trace: ChatTrace,
+        tier: str = "full",
+        deadline: Optional[RequestDeadline] = None
+    ) -> Tuple[str, List[str], List[str]]:
+        """Multi-pass retrieval, rerank and answer synthesis for one question.
+
+        Runs the tenant's retrieval plan trimmed to the quality tier (see
+        quality_tiers.TIER_SETTINGS); deadline stops optional work once the
+        request's budget is spent.
+        Returns (answer, reranked_docs, chunk ids of reranked_docs).
+        """
+        if deadline is not None and deadline.expired():
+            # Nobody is waiting for this answer any more (e.g. it sat in the queue too long)
+            deadline.cut("retrieval")
+            return DEADLINE_EXPIRED_ANSWER, [], []
+
+        plan = self.retrieval_plan.for_tier(TIER_SETTINGS[tier])
+        scored_docs, doc_ids = self.retrieve_and_rank(question_analysis, trace, plan, deadline)
+        reranked_docs = [doc for doc, _ in scored_docs]
+        print(f"\n{'='*80}")
+        print(f"DEBUG - DOCUMENTS BEING SENT TO LLM:")
+        print(f"{'='*80}")
+        for i, doc in enumerate(reranked_docs[:5]):  
+            print(f"\nDOC {i+1} (length: {len(doc)} chars):")
+            print(f"{doc[:300]}...")  # First 300 characters
+        print(f"{'='*80}\n")
+
+        # Generate answer with improved configuration
+        print("🔍 DEBUG - Synthesizing comprehensive answer...")
+        answer = self.generate_within_deadline(question_analysis, scored_docs, trace, deadline=deadline)
+        print(f"🔍 DEBUG - Answer generated successfully")
+
+        return answer, reranked_docs, [doc_ids[doc] for doc in reranked_docs if doc in doc_ids]
+
+    def answer_follow_up(
+        self,
+        question: str,
+        follow_up: Dict[str, Any],
+        trace: ChatTrace,
+        tier: str = "full",
+        deadline: Optional[RequestDeadline] = None
+    ) -> Optional[Tuple[str, List[str], List[str]]]:
+        """Answer a follow-up from the previous turn's candidates without searching again.
+
+        Only the stored chunks are fetched by id and reranked against the previous
+        question plus the follow-up. Returns None when none of the stored chunks
+        exist any more (e.g. the tenant was re-ingested), so the caller can fall
+        back to full retrieval.
+        """
+        chunk_ids = follow_up["chunk_ids"]
+        with trace.stage("follow_up_fetch"):
+            try:
+                stored = self.collection.get(ids=chunk_ids, include=["documents"])
+            except Exception as e:
+                print(f"⚠️ Could not load previous candidates: {e}")
+                return None
+            by_id = dict(zip(stored.get("ids") or [], stored.get("documents") or []))
+            # Keep the previous rerank order; Chroma returns ids in storage order
+            kept_ids = [chunk_id for chunk_id in chunk_ids if by_id.get(chunk_id)]
+        if not kept_ids:
+            return None
+        docs = [by_id[chunk_id] for chunk_id in kept_ids]
+        doc_to_id = dict(zip(docs, kept_ids))
+
+        # The follow-up alone ("yes", "tell me more") carries no topic; rerank against both turns
+        combined_question = f"{follow_up['question']} {question}".rstrip('?.!,;')
+        # Stored order is already the previous rerank order
+        stored_scores = {doc: -float(rank) for rank, doc in enumerate(docs)}
+        if TIER_SETTINGS[tier]["cross_encoder"]:
+            scored_docs = self.rerank_within_deadline(
+                combined_question, docs, trace, deadline, fallback_scores=stored_scores, doc_ids=doc_to_id
+            )
+        else:
+            scored_docs = [(doc, stored_scores[doc]) for doc in docs]
+        reranked_docs = [doc for doc, _ in scored_docs]
+        print(f"♻️ Follow-up reused {len(docs)}/{len(chunk_ids)} previous candidates")
+
+        question_analysis = {
+            'intent': follow_up.get('intent') or 'general_inquiry',
+            'original_question': f"{follow_up['question']}\nFollow-up: {question}",
+        }
+        answer = self.generate_within_deadline(
+            question_analysis, scored_docs, trace, is_follow_up=True, deadline=deadline
+        )
+        return answer, reranked_docs, [doc_to_id[doc] for doc in reranked_docs]
+
+    def chat(
+        self,
+        question: str,
+        session_id: str = "default",
+        deadline: Optional[RequestDeadline] = None,
+        trace_out: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """Answer one turn; if trace_out is given it receives this turn's trace summary, even on error"""
+        trace = ChatTrace()
+        deadline = deadline or RequestDeadline.from_header(None)
+        self.refresh_vector_store()
+        try:
+            return self._run_chat(question, session_id, trace, deadline)
+        finally:
+            trace.deadline_cuts = deadline.cuts
+            summary = trace.finish().to_dict()
+            if trace_out is not None:
+                trace_out.update(summary)
+            if trace.route.startswith("rag"):
+                self.load_monitor.observe_latency(trace.total_seconds)
+            if self.query_log is not None:
+                self.query_log.record(
+                    tenant=self.resource_id or os.path.basename(self.vector_store_path),
+                    session_id=session_id,
+                    question=question,
+                    trace=summary,
+                    candidate_ids=trace.candidate_ids,
+                    vector_store_path=self.vector_store_path
+                )
+
+    def _run_chat(self, question: str, session_id: str, trace: ChatTrace, deadline: RequestDeadline) -> str:
         print(f"\n{'='*90}")
         print(f"CHAT: {question[:50]}... | Session: {session_id}")
         print(f"{'='*90}")
@@ -1025,11 +1528,14 @@ ANSWER (be concise and factual):"""
                 if self.name_collection_states[session_id].get("waiting_for_name"):
                     success, response = self.process_name_collection(session_id, question)
                     if success:
+                        trace.route = "name_collection"
                         return response
 
             # Analyze question semantically (needed for pricing detection)
             print("🔍 DEBUG - Analyzing question semantically...")
-            question_analysis = self.analyze_question_semantically(question)
+            with trace.stage("analysis"):
+                # The embedding is computed later, only if the turn reaches retrieval
+                question_analysis = self.analyze_question_semantically(question, include_embedding=False)
             print(f"🔍 DEBUG - Question analysis completed")
 
             # Store the original pricing question if this is a pricing inquiry
@@ -1071,6 +1577,7 @@ ANSWER (be concise and factual):"""
                     if session_id not in self.conversation_contexts:
                         self.conversation_contexts[session_id] = {}
                     self.conversation_contexts[session_id]["phone"] = phone
+                    trace.route = "lead_capture"
                     return "Great! I've saved your phone number. Could you please provide your email address?"
 
                 # Check if we have an email
@@ -1099,6 +1606,7 @@ ANSWER (be concise and factual):"""
                     self.conversation_contexts[session_id]['lead_collected'] = True
                     # Store email in session
                     self.conversation_contexts[session_id]["email"] = email
+                    trace.route = "lead_capture"
                     return "Perfect! I've saved your email address. We will contact you soon regarding your queries"
 
             # Check if we should ask for name
@@ -1109,13 +1617,9 @@ ANSWER (be concise and factual):"""
                         "name_collected": False,
                         "question_count": 0
                     }
+                    trace.route = "name_prompt"
                     return "Before we continue, may I have your name please?"
 
-            # Analyze question semantically (needed for pricing detection)
-            print("🔍 DEBUG - Analyzing question semantically...")
-            question_analysis = self.analyze_question_semantically(question)
-            print(f"🔍 DEBUG - Question analysis completed")
-
             # Check for pricing inquiry and start lead collection if needed
             if self.detect_pricing_inquiry(question, question_analysis.get('intent', '')):
                 # Check if lead is already collected for this session
@@ -1127,84 +1631,67 @@ ANSWER (be concise and factual):"""
                     # If lead collection already in progress, continue it
                     if session_id in self.lead_collection_states:
                         is_complete, response = self.process_lead_data_step_by_step(session_id, question)
+                        trace.route = "lead_collection"
                         return response
                     else:
                         # Start new lead collection for pricing inquiry
                         self.start_lead_collection(session_id, question)
+                        trace.route = "lead_collection"
                         return self.get_lead_collection_request(session_id)
 
             # ============================================================================
             # IMPROVED RETRIEVAL: Multi-pass aggregation for consistency
             # ============================================================================
 
-            # Normalize query by removing trailing punctuation for better retrieval
-            normalized_query = question_analysis['original_question'].rstrip('?.!,;')
-
-            all_docs = []
-            seen_docs = set()
-
-            # Pass 1: Primary semantic search with embeddings
-            print("🔍 Pass 1: Semantic embedding search...")
-            docs1, dist1 = self.comprehensive_semantic_retrieval(question_analysis)
-            for doc in docs1[:60]:
-                if doc not in seen_docs:
-                    all_docs.append(doc)
-                    seen_docs.add(doc)
-
-            # Pass 2: Direct text query (different retrieval path)
-            print("🔍 Pass 2: Direct text query...")
-            try:
-                results2 = self.collection.query(
-                    query_texts=[normalized_query],
-                    n_results=60
-                )
-                if results2['documents'] and results2['documents'][0]:
-                    for doc in results2['documents'][0]:
-                        if doc not in seen_docs:
-                            all_docs.append(doc)
-                            seen_docs.add(doc)
-            except Exception as e:
-                print(f"⚠️ Pass 2 failed: {e}")
-
-            # Pass 3: Entity-based search
-            print("🔍 Pass 3: Entity-based search...")
-            entities = question_analysis.get('entity_mentions', [])
-            if entities:
-                entity_query = ' '.join(entities[:5])
+            # Shed optional retrieval/rerank work when the box is saturated
+            tier = trace.tier = self.load_monitor.current_tier()
+            metrics.increment("quality_tier_total", tier=tier)
+
+            # Follow-ups ("yes", "tell me more") reuse the previous turn's candidates
+            result = None
+            route = "rag"
+            follow_up = self.get_conversation_context(session_id) if self.is_follow_up_question(question) is True else None
+            if follow_up:
+                result = self.answer_follow_up(question, follow_up, trace, tier=tier, deadline=deadline)
+                if result is None:
+                    metrics.increment("follow_up_fallback_total")
+                    print("⚠️ Previous candidates no longer available; running full retrieval")
+                    # Search for the previous topic rather than the literal "yes"
+                    question_analysis = self.analyze_question_semantically(
+                        f"{follow_up['question']} {question}", include_embedding=False
+                    )
+                else:
+                    metrics.increment("follow_up_reuse_total")
+                    route = "rag_follow_up"
+                    # Later follow-ups keep referring to the question that was actually retrieved for
+                    retrieval_question = follow_up["question"]
+
+            if result is None:
+                # Identical questions already in flight for this tenant at the same tier share one
+                # computation, unless the leader's deadline cut it short; waiting stops at our deadline
+                flight_started = time.perf_counter()
+                cuts_before = len(deadline.cuts)
                 try:
-                    results3 = self.collection.query(
-                        query_texts=[entity_query],
-                        n_results=40
+                    result, shared = self.inflight.do(
+                        (tier, normalize_query_key(question_analysis['original_question'])),
+                        lambda: self.retrieve_and_answer(question_analysis, trace, tier=tier, deadline=deadline),
+                        timeout=deadline.remaining(),
+                        shareable=lambda _result: len(deadline.cuts) == cuts_before
                     )
-                    if results3['documents'] and results3['documents'][0]:
-                        for doc in results3['documents'][0]:
-                            if doc not in seen_docs:
-                                all_docs.append(doc)
-                                seen_docs.add(doc)
-                except Exception as e:
-                    print(f"⚠️ Pass 3 failed: {e}")
-
-            print(f"✅ Retrieved {len(all_docs)} unique documents from all passes")
-
-            # Rerank the aggregated results
-            print("🎯 Reranking aggregated documents...")
-            reranked_docs = self.smart_rerank_candidates(normalized_query, all_docs, topn=40) 
-            print(f"\n{'='*80}")
-            print(f"DEBUG - DOCUMENTS BEING SENT TO LLM:")
-            print(f"{'='*80}")
-            for i, doc in enumerate(reranked_docs[:5]):  
-                print(f"\nDOC {i+1} (length: {len(doc)} chars):")
-                print(f"{doc[:300]}...")  # First 300 characters
-            print(f"{'='*80}\n")
-
-            # Generate answer with improved configuration
-            print("🔍 DEBUG - Synthesizing comprehensive answer...")
-            answer = self.synthesize_comprehensive_answer(
-                question_analysis,
-                reranked_docs,
-                is_follow_up=False
-            )
-            print(f"🔍 DEBUG - Answer generated successfully")
+                except WaitTimeout:
+                    deadline.cut("retrieval")
+                    result, shared = (DEADLINE_EXPIRED_ANSWER, [], []), True
+                if shared:
+                    trace.record("coalesced_wait", time.perf_counter() - flight_started)
+                    print("🔗 Served by an identical in-flight request")
+                    route = "rag_coalesced"
+                retrieval_question = question_analysis['original_question']
+
+            answer, reranked_docs, chunk_ids = result
+            trace.candidate_ids = chunk_ids
+            if self.shadow is not None and route == "rag":
+                self.shadow.maybe_submit(self, question_analysis, trace, tier, self.resource_id or self.vector_store_path)
+            self.store_conversation_context(session_id, retrieval_question, chunk_ids, question_analysis.get('intent', ''))
 
             # Store source snippets for downstream consumers
             self._store_source_snippets(session_id, reranked_docs)
@@ -1223,9 +1710,15 @@ ANSWER (be concise and factual):"""
             print(f"COMPREHENSIVE RESPONSE: {answer[:60]}...")
             print(f"{'='*90}\n")
 
+            trace.route = route
             return answer
 
+        except LLMOverloadedError as e:
+            trace.route = "shed"
+            print(f"⏳ LLM call shed ({e.reason}): {e}")
+            raise
         except Exception as e:
+            trace.route = "error"
             print(f"❌ ERROR in chat method: {str(e)}")
             print(f"❌ ERROR type: {type(e).__name__}")
             import traceback
@@ -1238,6 +1731,7 @@ class TenantChatbotManager:
     def __init__(self, collection_name: str = "scraped_content"):
         self.collection_name = collection_name
         self._instances: Dict[str, SemanticIntelligentRAG] = {}
+        self._lead_stores: Dict[str, TenantLeadStore] = {}
         self._lock = asyncio.Lock()
 
     @staticmethod
@@ -1246,6 +1740,15 @@ class TenantChatbotManager:
         os.makedirs(resolved, exist_ok=True)
         return resolved
 
+    def get_lead_store(self, *, database_uri: Optional[str], resource_id: Optional[str]) -> TenantLeadStore:
+        """Leads storage for a database URI; cheap to create, connects on first use"""
+        resolved_db_uri = database_uri or os.getenv("MONGODB_URI", "mongodb://localhost:27017")
+        store = self._lead_stores.get(resolved_db_uri)
+        if store is None:
+            store = self._lead_stores[resolved_db_uri] = TenantLeadStore(resolved_db_uri, label=resource_id)
+            metrics.set_gauge("tenant_lead_stores_loaded", len(self._lead_stores))
+        return store
+
     async def get_chatbot(
         self,
         *,
@@ -1269,21 +1772,29 @@ class TenantChatbotManager:
             if instance:
                 return instance
 
+            started = time.perf_counter()
             bot_instance = SemanticIntelligentRAG(
                 chroma_db_path=resolved_path,
                 collection_name=self.collection_name,
                 mongo_uri=resolved_db_uri,
-                resource_id=resource_id
+                resource_id=resource_id,
+                lead_store=self.get_lead_store(database_uri=resolved_db_uri, resource_id=resource_id)
             )
-            print(f"🆕 Initialized chatbot instance for {resource_id or resolved_path}")
+            cold_start = time.perf_counter() - started
+            metrics.observe("tenant_cold_start_seconds", cold_start)
+            print(f"🆕 Initialized chatbot instance for {resource_id or resolved_path} in {cold_start:.2f}s")
             self._instances[cache_key] = bot_instance
+            metrics.set_gauge("tenant_instances_loaded", len(self._instances))
             return bot_instance
 
+    def rerank_cache_snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {key: instance.rerank_cache.snapshot() for key, instance in list(self._instances.items())}
+
     async def close_all(self):
         async with self._lock:
-            for instance in self._instances.values():
-                if instance.mongo_client:
-                    instance.close_mongodb_connection()
+            for store in self._lead_stores.values():
+                store.close()
+            self._lead_stores.clear()
             self._instances.clear()
 
 
@@ -1321,12 +1832,37 @@ async def get_tenant_chatbot_or_error(
         raise HTTPException(status_code=500, detail=f"Failed to load tenant chatbot: {exc}") from exc
 
 
+def get_tenant_lead_store_or_error(
+    *,
+    database_uri: Optional[str],
+    resource_id: Optional[str],
+    user_id: Optional[str] = None
+) -> TenantLeadStore:
+    """Leads storage only: never opens the vector store or loads models"""
+    if chatbot_manager is None:
+        raise HTTPException(status_code=503, detail="Chat manager not initialized")
+
+    resolved_database_uri = database_uri or os.getenv("MONGODB_URI")
+    if not resolved_database_uri:
+        raise HTTPException(status_code=400, detail="database_uri is required")
+
+    return chatbot_manager.get_lead_store(
+        database_uri=resolved_database_uri,
+        resource_id=resource_id or user_id
+    )
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global chatbot_manager
+    global chatbot_manager, admission_controller, chat_executor
     print("🚀 Initializing tenant chatbot manager...")
     chatbot_manager = TenantChatbotManager()
     app.state.tenant_manager = chatbot_manager
+    admission_controller = create_admission_controller()
+    app.state.admission_controller = admission_controller
+    chat_executor = create_chat_executor()
+    app.state.chat_executor = chat_executor
+    get_load_monitor().attach_queue(chat_executor.queue_per_worker)
 
     if not ENFORCE_SERVICE_SECRET:
         if FASTAPI_SHARED_SECRET:
@@ -1342,6 +1878,13 @@ async def lifespan(app: FastAPI):
     if chatbot_manager:
         await chatbot_manager.close_all()
         chatbot_manager = None
+    if chat_executor:
+        get_load_monitor().attach_queue(None)
+        chat_executor.shutdown()
+        chat_executor = None
+    shutdown_shadow_evaluator()
+    shutdown_llm_gateway()
+    shutdown_query_log()
 
 app = FastAPI(
     title="RAG Chatbot with MongoDB Contact Extraction",
@@ -1369,10 +1912,65 @@ async def health_check():
         status="healthy" if is_ready else "unhealthy",
         chatbot_ready=is_ready,
         message="RAG ready" if is_ready else "Failed",
-        daily_requests_used=0
+        daily_requests_used=admission_controller.usage.requests_today() if admission_controller else 0
     )
 
-async def _handle_chat_request(request: QuestionRequest) -> AnswerResponse:
+@app.get("/metrics", dependencies=[Depends(require_service_secret)])
+async def metrics_endpoint():
+    """Expose in-process service metrics as JSON"""
+    snapshot = metrics.snapshot()
+    if admission_controller:
+        snapshot["usage"] = admission_controller.usage.snapshot()
+    if chat_executor:
+        snapshot["chat_executor"] = chat_executor.snapshot()
+    snapshot["quality"] = get_load_monitor().snapshot()
+    if chatbot_manager:
+        snapshot["rerank_cache"] = chatbot_manager.rerank_cache_snapshot()
+    shadow = get_shadow_evaluator()
+    if shadow is not None:
+        snapshot["shadow"] = shadow.snapshot()
+    return snapshot
+
+def _tenant_key(resource_id: Optional[str], user_id: Optional[str], vector_store_path: Optional[str]) -> str:
+    return resource_id or user_id or vector_store_path or "anonymous"
+
+async def _run_tenant_work(tenant: str, fn: Callable, *args, cost: int = 1):
+    """Run blocking chat work on the fair executor (plain threadpool before startup).
+
+    The tenant's fair-share weight comes from its server-side plan (TENANT_PLANS).
+    """
+    if chat_executor is None:
+        return await run_in_threadpool(fn, *args)
+    return await chat_executor.run(tenant, fn, *args, cost=cost)
+
+def _admit_or_reject(
+    *,
+    resource_id: Optional[str],
+    user_id: Optional[str],
+    vector_store_path: Optional[str],
+    cost: int = 1
+):
+    """Cheap token-bucket check that runs before any tenant loading or inference"""
+    if admission_controller is None:
+        return
+    tenant = _tenant_key(resource_id, user_id, vector_store_path)
+    admitted, scope, wait = admission_controller.try_admit(tenant, cost)
+    if not admitted:
+        retry_after = max(1, math.ceil(wait)) if math.isfinite(wait) else 60
+        raise HTTPException(
+            status_code=429,
+            detail=f"Rate limit exceeded ({scope}); retry later",
+            headers={"Retry-After": str(retry_after)}
+        )
+
+def _overloaded_http_error(error: LLMOverloadedError) -> HTTPException:
+    return HTTPException(
+        status_code=error.status_code,
+        detail=str(error),
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
+async def _handle_chat_request(request: QuestionRequest, deadline: RequestDeadline) -> AnswerResponse:
     print(f"🔍 DEBUG - Received session_id: '{request.session_id}'")
     print(f"🔍 DEBUG - Query: '{request.query}'")
     query_text = (request.query or "").strip()
@@ -1387,6 +1985,12 @@ async def _handle_chat_request(request: QuestionRequest) -> AnswerResponse:
     else:
         session_identifier = incoming_session
 
+    _admit_or_reject(
+        resource_id=request.resource_id,
+        user_id=request.user_id,
+        vector_store_path=request.vector_store_path
+    )
+
     chatbot_instance = await get_tenant_chatbot_or_error(
         vector_store_path=request.vector_store_path,
         database_uri=request.database_uri,
@@ -1394,7 +1998,16 @@ async def _handle_chat_request(request: QuestionRequest) -> AnswerResponse:
         user_id=request.user_id
     )
     try:
-        answer = chatbot_instance.chat(query_text, session_identifier)
+        # Run the blocking pipeline off the event loop, fairly shared between tenants
+        trace: Dict[str, Any] = {}
+        answer = await _run_tenant_work(
+            _tenant_key(request.resource_id, request.user_id, request.vector_store_path),
+            chatbot_instance.chat,
+            query_text,
+            session_identifier,
+            deadline,
+            trace
+        )
 
         # Intentionally do not return source snippets in the API response.
         # The assistant should only return the main answer block.
@@ -1404,25 +2017,116 @@ async def _handle_chat_request(request: QuestionRequest) -> AnswerResponse:
         if request.user_id:
             metadata["user_id"] = request.user_id
 
+        if trace:
+            metadata["route"] = trace["route"]
+            metadata["timings_ms"] = trace["timings_ms"]
+            if "tier" in trace:
+                metadata["quality_tier"] = trace["tier"]
+            if "deadline_cuts" in trace:
+                metadata["deadline_cuts"] = trace["deadline_cuts"]
+                # The answer did not come from the LLM (top passage or timeout message)
+                metadata["partial"] = bool({"generation", "retrieval"} & set(trace["deadline_cuts"]))
+
         return AnswerResponse(
             answer=answer,
             session_id=session_identifier,
             metadata=metadata or None
         )
+    except LLMOverloadedError as e:
+        raise _overloaded_http_error(e) from e
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
 
 @app.post("/chat", response_model=AnswerResponse, dependencies=[Depends(require_service_secret)])
-async def chat_endpoint(request: QuestionRequest):
-    return await _handle_chat_request(request)
+async def chat_endpoint(request: QuestionRequest, http_request: Request):
+    # The budget starts on arrival, so time spent queued for a worker counts against it
+    deadline = RequestDeadline.from_header(http_request.headers.get(DEADLINE_HEADER))
+    return await _handle_chat_request(request, deadline)
 
 
 @app.post("/api/bots/{resource_id}/chat", response_model=AnswerResponse, dependencies=[Depends(require_service_secret)])
-async def chat_endpoint_with_resource(resource_id: str, request: QuestionRequest):
+async def chat_endpoint_with_resource(resource_id: str, request: QuestionRequest, http_request: Request):
+    deadline = RequestDeadline.from_header(http_request.headers.get(DEADLINE_HEADER))
+    if not request.resource_id:
+        request.resource_id = resource_id
+    return await _handle_chat_request(request, deadline)
+
+async def _handle_batch_chat_request(request: BatchQuestionRequest) -> BatchAnswerResponse:
+    queries = [(query or "").strip() for query in request.queries]
+    if not queries:
+        raise HTTPException(status_code=400, detail="At least one query is required")
+    if any(not query for query in queries):
+        raise HTTPException(status_code=400, detail="Every query must be non-empty")
+    if len(queries) > CHAT_BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=413, detail=f"At most {CHAT_BATCH_MAX_QUERIES} queries per batch")
+
+    # A batch is charged one token per query (capped at the bucket size)
+    _admit_or_reject(
+        resource_id=request.resource_id,
+        user_id=request.user_id,
+        vector_store_path=request.vector_store_path,
+        cost=len(queries)
+    )
+
+    chatbot_instance = await get_tenant_chatbot_or_error(
+        vector_store_path=request.vector_store_path,
+        database_uri=request.database_uri,
+        resource_id=request.resource_id,
+        user_id=request.user_id
+    )
+    concurrency = min(max(1, request.max_concurrency or CHAT_BATCH_LLM_CONCURRENCY), CHAT_BATCH_LLM_CONCURRENCY)
+    tenant = _tenant_key(request.resource_id, request.user_id, request.vector_store_path)
+    trace = ChatTrace()
+    trace.route = "batch"
+    started = time.perf_counter()
+    try:
+        # Retrieval for the whole batch weighs as much as its queries in the tenant's fair share
+        items = await _run_tenant_work(
+            tenant,
+            chatbot_instance.retrieve_batch,
+            queries,
+            trace,
+            cost=len(queries)
+        )
+
+        # Each answer is its own task on the fair executor, so a batch never runs more
+        # generations at once than the tenant's worker cap (nor more than `concurrency`)
+        slots = asyncio.Semaphore(concurrency)
+
+        async def answer(item: Dict[str, Any]) -> Dict[str, Any]:
+            async with slots:
+                return await _run_tenant_work(tenant, chatbot_instance.answer_batch_item, item)
+
+        with trace.stage("batch_generation"):
+            results = await asyncio.gather(*(answer(item) for item in items))
+    except Exception as e:
+        trace.route = "error"
+        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
+    finally:
+        trace.finish()
+    metrics.observe("chat_batch_size", len(queries))
+
+    metadata: Dict[str, Any] = {
+        "count": len(results),
+        "failed": sum(1 for item in results if item.get("error")),
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 3)
+    }
+    if request.resource_id:
+        metadata["resource_id"] = request.resource_id
+    return BatchAnswerResponse(answers=[BatchAnswerItem(**item) for item in results], metadata=metadata)
+
+
+@app.post("/chat/batch", response_model=BatchAnswerResponse, dependencies=[Depends(require_service_secret)])
+async def chat_batch_endpoint(request: BatchQuestionRequest):
+    return await _handle_batch_chat_request(request)
+
+
+@app.post("/api/bots/{resource_id}/chat/batch", response_model=BatchAnswerResponse, dependencies=[Depends(require_service_secret)])
+async def chat_batch_endpoint_with_resource(resource_id: str, request: BatchQuestionRequest):
     if not request.resource_id:
         request.resource_id = resource_id
-    return await _handle_chat_request(request)
+    return await _handle_batch_chat_request(request)
 
 @app.get("/contact-info", response_model=ContactInfoResponse, dependencies=[Depends(require_service_secret)])
 async def get_contact_info(
@@ -1455,20 +2159,70 @@ async def get_all_leads(
     resource_id: Optional[str] = Query(None),
     vector_store_path: Optional[str] = Query(None),
     database_uri: Optional[str] = Query(None),
-    user_id: Optional[str] = Query(None)
+    user_id: Optional[str] = Query(None),
+    limit: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+    status: Optional[str] = Query(None, description="Status or comma-separated statuses"),
+    created_after: Optional[str] = Query(None, description="ISO-8601, inclusive"),
+    created_before: Optional[str] = Query(None, description="ISO-8601, exclusive")
 ):
-    """Get all leads from MongoDB"""
-    chatbot_instance = await get_tenant_chatbot_or_error(
-        vector_store_path=vector_store_path,
+    """Get one page of leads from MongoDB (newest first); follow next_cursor for more"""
+    lead_store = get_tenant_lead_store_or_error(
         database_uri=database_uri,
         resource_id=resource_id,
         user_id=user_id
     )
+    page_size = min(limit or LEADS_PAGE_DEFAULT_LIMIT, LEADS_PAGE_MAX_LIMIT)
     try:
-        leads = chatbot_instance.get_all_leads()
-        return {"leads": leads, "count": len(leads)}
+        page = await run_in_threadpool(
+            lead_store.get_leads_page,
+            page_size, cursor, fields, status, created_after, created_before
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
+        print(f"❌ Error fetching leads from MongoDB: {e}")
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
+    return {"leads": page["leads"], "count": len(page["leads"]), "next_cursor": page["next_cursor"]}
+
+@app.get("/leads/export", dependencies=[Depends(require_service_secret)])
+async def export_leads(
+    resource_id: Optional[str] = Query(None),
+    vector_store_path: Optional[str] = Query(None),
+    database_uri: Optional[str] = Query(None),
+    user_id: Optional[str] = Query(None),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+    status: Optional[str] = Query(None, description="Status or comma-separated statuses"),
+    created_after: Optional[str] = Query(None, description="ISO-8601, inclusive"),
+    created_before: Optional[str] = Query(None, description="ISO-8601, exclusive")
+):
+    """Stream every matching lead as NDJSON (one JSON object per line) with constant memory"""
+    lead_store = get_tenant_lead_store_or_error(
+        database_uri=database_uri,
+        resource_id=resource_id,
+        user_id=user_id
+    )
+    try:
+        leads = lead_store.iter_leads(
+            fields, status, created_after, created_before, batch_size=max(1, LEADS_EXPORT_BATCH_SIZE)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    def ndjson_lines():
+        exported = 0
+        for lead in leads:
+            exported += 1
+            yield json.dumps(lead, default=str) + "\n"
+        metrics.increment("leads_exported_total", exported)
+
+    # A sync iterator: Starlette pulls it in the threadpool, so Mongo batches never block the event loop
+    return StreamingResponse(
+        ndjson_lines(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="leads.ndjson"'}
+    )
 
 @app.get("/leads/count", dependencies=[Depends(require_service_secret)])
 async def get_leads_count(
@@ -1478,14 +2232,13 @@ async def get_leads_count(
     user_id: Optional[str] = Query(None)
 ):
     """Get total leads count from MongoDB"""
-    chatbot_instance = await get_tenant_chatbot_or_error(
-        vector_store_path=vector_store_path,
+    lead_store = get_tenant_lead_store_or_error(
         database_uri=database_uri,
         resource_id=resource_id,
         user_id=user_id
     )
     try:
-        count = chatbot_instance.get_leads_count()
+        count = await run_in_threadpool(lead_store.count)
         return {"count": count}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
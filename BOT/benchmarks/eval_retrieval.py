@@ -0,0 +1,305 @@
+"""Offline retrieval quality vs. latency evaluation for one tenant.
+
+Runs the retrieval + rerank half of ``SemanticIntelligentRAG`` (no LLM call)
+over a labelled question set under several retrieval configurations and
+reports recall@k, MRR, latency and cost for each, so the cheapest
+configuration that meets a quality target can be picked with evidence.
+
+The question set is JSON (a list) or JSONL, one item per question:
+
+    {"question": "Do you offer cloud migration in Berlin?",
+     "expected_urls": ["https://acme.example.com/services/3"],
+     "expected_passages": ["cloud migration projects"]}
+
+A result counts as relevant when its source URL is one of ``expected_urls``
+or its text contains one of ``expected_passages`` (case and whitespace
+insensitive). Each expected URL or passage is one target for recall.
+
+A configuration is a retrieval plan (``retrieval_plan.py``: a preset name, a
+stage list or ``{"name": ..., "stages": [...]}``; default: the tenant's own
+plan) run at a quality tier, optionally with tier settings overridden (see
+``quality_tiers.TIER_SETTINGS``). ``--configs`` takes a JSON object of
+``name -> {"plan": "lean", "base": "full", "rerank_limit": 40}``. Without it
+a small built-in grid is evaluated.
+
+Examples:
+    python BOT/benchmarks/eval_retrieval.py --questions acme_eval.jsonl \
+        --vector-store-path /data/tenants/acme --output eval.json
+    python BOT/benchmarks/eval_retrieval.py --questions acme_eval.jsonl \
+        --vector-store-path /data/tenants/acme --configs configs.json --min-recall 0.8 --recall-k 10
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BOT_DIR = os.path.dirname(BENCH_DIR)
+for path in (BENCH_DIR, BOT_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from load_test import _git_revision, _percentiles  # noqa: E402
+
+DEFAULT_CONFIGS: Dict[str, Dict[str, Any]] = {
+    "tenant-full": {"base": "full"},
+    "tenant-rerank-40": {"base": "full", "rerank_limit": 40},
+    "tenant-reduced": {"base": "reduced"},
+    "tenant-minimal": {"base": "minimal"},
+    "rich": {"plan": "rich"},
+    "standard": {"plan": "standard"},
+    "lean": {"plan": "lean"},
+}
+
+
+def _parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Evaluate retrieval quality vs. latency across configurations")
+    parser.add_argument("--questions", required=True, help="Labelled question set (JSON list or JSONL)")
+    parser.add_argument("--vector-store-path", required=True, help="Tenant vector store to evaluate against")
+    parser.add_argument("--resource-id", default="retrieval-eval", help="Tenant label used for the bot instance")
+    parser.add_argument("--configs", help="JSON file of name -> {plan, base tier, tier overrides} (default: built-in grid)")
+    parser.add_argument("--only", nargs="+", help="Evaluate only these configuration names")
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5, 10, 20], help="Cut-offs for recall@k")
+    parser.add_argument("--limit", type=int, default=0, help="Use at most this many questions (0 = all)")
+    parser.add_argument("--min-recall", type=float, help="Quality target: mean recall@--recall-k")
+    parser.add_argument("--recall-k", type=int, default=10, help="k used for --min-recall")
+    parser.add_argument("--min-mrr", type=float, help="Quality target: mean reciprocal rank")
+    parser.add_argument("--output", help="Write the JSON report to this path")
+    return parser.parse_args(argv)
+
+
+def load_questions(path: str) -> List[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as handle:
+        text = handle.read()
+    stripped = text.lstrip()
+    if stripped.startswith("["):
+        items = json.loads(stripped)
+    else:
+        items = [json.loads(line) for line in text.splitlines() if line.strip()]
+    return [item for item in items if (item.get("question") or "").strip()]
+
+
+def load_configs(path: Optional[str]) -> Dict[str, Tuple[Any, Dict[str, Any]]]:
+    """name -> (plan config or None for the tenant's plan, tier settings with overrides applied)"""
+    from quality_tiers import TIER_SETTINGS
+    from retrieval_plan import RetrievalPlan
+
+    raw = DEFAULT_CONFIGS
+    if path:
+        with open(path, "r", encoding="utf-8") as handle:
+            raw = json.load(handle)
+    resolved = {}
+    for name, overrides in raw.items():
+        overrides = dict(overrides)
+        base = overrides.pop("base", "full")
+        plan = overrides.pop("plan", None)
+        if base not in TIER_SETTINGS:
+            raise ValueError(f"Config '{name}': unknown base tier '{base}'")
+        unknown = set(overrides) - set(TIER_SETTINGS[base])
+        if unknown:
+            raise ValueError(f"Config '{name}': unknown settings {sorted(unknown)}")
+        if plan is not None:
+            # Validate up front rather than after earlier configurations have run
+            RetrievalPlan.from_config(plan, name=name)
+        resolved[name] = (plan, {**TIER_SETTINGS[base], **overrides})
+    return resolved
+
+
+def _normalize_url(url: str) -> str:
+    return (url or "").split("#", 1)[0].strip().rstrip("/").lower()
+
+
+def _normalize_text(text: str) -> str:
+    return " ".join((text or "").lower().split())
+
+
+def score_ranking(
+    ranked: List[Tuple[str, Optional[str]]],
+    expected_urls: List[str],
+    expected_passages: List[str],
+    ks: List[int]
+) -> Optional[Dict[str, Any]]:
+    """recall@k and reciprocal rank for (doc text, source url) results, best first"""
+    targets = [("url", _normalize_url(url)) for url in expected_urls if url]
+    targets += [("passage", _normalize_text(passage)) for passage in expected_passages if passage]
+    if not targets:
+        return None
+
+    found_at: Dict[Tuple[str, str], int] = {}
+    first_relevant = None
+    for rank, (doc, url) in enumerate(ranked, start=1):
+        doc_text = _normalize_text(doc)
+        doc_url = _normalize_url(url or "")
+        for kind, value in targets:
+            if (kind, value) in found_at:
+                continue
+            if (kind == "url" and doc_url == value) or (kind == "passage" and value in doc_text):
+                found_at[(kind, value)] = rank
+                if first_relevant is None:
+                    first_relevant = rank
+
+    return {
+        "recall": {k: sum(1 for rank in found_at.values() if rank <= k) / len(targets) for k in ks},
+        "reciprocal_rank": 1.0 / first_relevant if first_relevant else 0.0,
+        "first_relevant_rank": first_relevant,
+    }
+
+
+def _counter_total(name: str) -> float:
+    from bot_metrics import metrics
+    return sum(item["value"] for item in metrics.snapshot()["counters"].get(name, []))
+
+
+def _build_bot(args: argparse.Namespace):
+    """Real bot over the tenant store; Mongo is disabled and no LLM is ever called"""
+    import lead_store
+    lead_store.MongoClient = None
+    import app_20
+    return app_20.SemanticIntelligentRAG(chroma_db_path=args.vector_store_path, resource_id=args.resource_id)
+
+
+def _source_urls(bot, chunk_ids: List[str]) -> Dict[str, Optional[str]]:
+    if not chunk_ids:
+        return {}
+    stored = bot.collection.get(ids=chunk_ids, include=["metadatas"])
+    return {
+        chunk_id: (metadata or {}).get("url")
+        for chunk_id, metadata in zip(stored.get("ids") or [], stored.get("metadatas") or [])
+    }
+
+
+def evaluate_config(bot, questions: List[Dict[str, Any]], plan, ks: List[int]) -> Dict[str, Any]:
+    from bot_metrics import ChatTrace
+
+    # Warm-up outside the measurements (model load, Chroma caches); the rerank cache would
+    # hide cross-encoder cost, so it is emptied before every configuration
+    bot.retrieve_and_rank(bot.analyze_question_semantically(questions[0]["question"]), ChatTrace(), plan)
+    bot.rerank_cache.clear()
+
+    latencies, stage_latencies = [], {}
+    recall_sums = {k: 0.0 for k in ks}
+    rr_sum, scored, unlabelled = 0.0, 0, 0
+    embedded_before = _counter_total("embedding_texts_total")
+    pairs_before = _counter_total("rerank_pairs_total")
+    per_question = []
+
+    for item in questions:
+        trace = ChatTrace()
+        started = time.perf_counter()
+        with trace.stage("analysis"):
+            analysis = bot.analyze_question_semantically(item["question"])
+        scored_docs, doc_ids = bot.retrieve_and_rank(analysis, trace, plan)
+        latency_ms = (time.perf_counter() - started) * 1000
+        latencies.append(latency_ms)
+        for stage, seconds in trace.timings.items():
+            stage_latencies.setdefault(stage, []).append(seconds * 1000)
+
+        urls = _source_urls(bot, [doc_ids[doc] for doc, _ in scored_docs if doc in doc_ids])
+        ranked = [(doc, urls.get(doc_ids.get(doc))) for doc, _ in scored_docs]
+        result = score_ranking(ranked, item.get("expected_urls") or [], item.get("expected_passages") or [], ks)
+        if result is None:
+            unlabelled += 1
+            continue
+        scored += 1
+        rr_sum += result["reciprocal_rank"]
+        for k in ks:
+            recall_sums[k] += result["recall"][k]
+        per_question.append({
+            "question": item["question"],
+            "first_relevant_rank": result["first_relevant_rank"],
+            "latency_ms": round(latency_ms, 3),
+        })
+
+    count = len(questions)
+    return {
+        "plan": plan.to_dict(),
+        "questions": count,
+        "labelled": scored,
+        "unlabelled": unlabelled,
+        "recall_at_k": {str(k): round(recall_sums[k] / scored, 4) if scored else None for k in ks},
+        "mrr": round(rr_sum / scored, 4) if scored else None,
+        "latency_ms": _percentiles(latencies),
+        "stage_latency_ms": {stage: _percentiles(values) for stage, values in stage_latencies.items()},
+        "cost_per_question": {
+            "embedded_texts": round((_counter_total("embedding_texts_total") - embedded_before) / count, 2),
+            "rerank_pairs": round((_counter_total("rerank_pairs_total") - pairs_before) / count, 2),
+        },
+        "per_question": per_question,
+    }
+
+
+def cheapest_meeting_targets(results: Dict[str, Dict[str, Any]], args: argparse.Namespace) -> Optional[str]:
+    """Lowest p50 latency among configurations meeting --min-recall / --min-mrr"""
+    if args.min_recall is None and args.min_mrr is None:
+        return None
+    eligible = []
+    for name, result in results.items():
+        recall = result["recall_at_k"].get(str(args.recall_k))
+        if args.min_recall is not None and (recall is None or recall < args.min_recall):
+            continue
+        if args.min_mrr is not None and (result["mrr"] is None or result["mrr"] < args.min_mrr):
+            continue
+        eligible.append((result["latency_ms"].get("p50", float("inf")), name))
+    return min(eligible)[1] if eligible else None
+
+
+def main(argv: List[str]) -> int:
+    args = _parse_args(argv)
+    if args.min_recall is not None and args.recall_k not in args.k:
+        args.k = sorted(set(args.k) | {args.recall_k})
+    questions = load_questions(args.questions)
+    if args.limit > 0:
+        questions = questions[:args.limit]
+    if not questions:
+        print(json.dumps({"status": "failed", "error": "No questions found"}))
+        return 2
+    try:
+        configs = load_configs(args.configs)
+    except (OSError, ValueError) as exc:
+        print(json.dumps({"status": "failed", "error": str(exc)}))
+        return 2
+    if args.only:
+        configs = {name: settings for name, settings in configs.items() if name in args.only}
+
+    from retrieval_plan import RetrievalPlan
+
+    bot = _build_bot(args)
+    results = {}
+    for name, (plan_config, settings) in configs.items():
+        base_plan = RetrievalPlan.from_config(plan_config, name=name) if plan_config is not None else bot.retrieval_plan
+        plan = base_plan.for_tier(settings)
+        print(f"▶️ Evaluating '{name}' (plan '{plan.name}') on {len(questions)} questions...")
+        results[name] = evaluate_config(bot, questions, plan, args.k)
+        results[name]["tier_settings"] = settings
+        summary = results[name]
+        print(
+            f"   recall@{args.k[-1]}={summary['recall_at_k'][str(args.k[-1])]} mrr={summary['mrr']} "
+            f"p50={summary['latency_ms'].get('p50')}ms rerank_pairs/q={summary['cost_per_question']['rerank_pairs']}"
+        )
+
+    report = {
+        "benchmark": "retrieval_eval",
+        "timestamp": datetime.utcnow().isoformat(),
+        "git_revision": _git_revision(),
+        "config": {k: v for k, v in vars(args).items() if k != "output"},
+        "results": results,
+        "cheapest_meeting_targets": cheapest_meeting_targets(results, args),
+    }
+    rendered = json.dumps(report, indent=2, default=str)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            handle.write(rendered)
+        print(f"📝 Results written to {args.output}")
+    if report["cheapest_meeting_targets"]:
+        print(f"✅ Cheapest configuration meeting targets: {report['cheapest_meeting_targets']}")
+    elif args.min_recall is not None or args.min_mrr is not None:
+        print("⚠️ No configuration met the quality targets")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
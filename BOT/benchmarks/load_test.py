@@ -0,0 +1,330 @@
+"""End-to-end /chat load test against synthetic tenants.
+
+Builds synthetic tenant Chroma stores, starts the FastAPI ``app`` in-process
+with the stub LLM provider and an in-memory Mongo stand-in, then drives /chat
+at a fixed concurrency across many tenants and sessions. Results are written
+as JSON so runs from different builds can be compared before deploying.
+
+Example:
+    python BOT/benchmarks/load_test.py --chunks 10000 --tenants 8 --requests 500 \
+        --concurrency 16 --output load_results.json
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import resource
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BOT_DIR = os.path.dirname(BENCH_DIR)
+for path in (BENCH_DIR, BOT_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from synthetic_corpus import SyntheticCorpus, build_tenant_store  # noqa: E402
+
+
+def _parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Load test the RAG bot /chat endpoint with synthetic tenants")
+    parser.add_argument("--chunks", type=int, default=1000, help="Chunks per synthetic tenant store (1k-1M)")
+    parser.add_argument("--stores", type=int, default=1, help="Distinct synthetic stores to build")
+    parser.add_argument("--tenants", type=int, default=4, help="Tenants to simulate (spread across stores)")
+    parser.add_argument("--sessions-per-tenant", type=int, default=8, help="Chat sessions per tenant")
+    parser.add_argument("--requests", type=int, default=200, help="Measured /chat requests")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent client workers")
+    parser.add_argument("--store-dir", default=os.path.join(BENCH_DIR, ".synthetic-stores"), help="Where synthetic stores are cached")
+    parser.add_argument("--embedder", choices=["hash", "model"], default="hash", help="Embeddings for synthetic documents")
+    parser.add_argument("--llm-distribution", default="lognormal", help="Stub LLM latency distribution")
+    parser.add_argument("--llm-latency-ms", type=float, default=600.0, help="Stub LLM median latency")
+    parser.add_argument("--llm-jitter-ms", type=float, default=200.0, help="Stub LLM latency spread")
+    parser.add_argument("--llm-response-chars", type=int, default=320, help="Stub LLM answer size")
+    parser.add_argument("--mongo", choices=["mock", "none"], default="mock", help="Mongo stand-in (mongomock) or disable lead storage")
+    parser.add_argument("--port", type=int, default=0, help="Port for the in-process server (0 picks a free port)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for stores, questions and scheduling")
+    parser.add_argument("--output", help="Write JSON results to this path")
+    return parser.parse_args(argv)
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/status", "r", encoding="utf-8") as handle:
+            for line in handle:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def _peak_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+
+    def pick(fraction: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))], 3)
+
+    return {
+        "count": len(ordered),
+        "mean": round(sum(ordered) / len(ordered), 3),
+        "p50": pick(0.50),
+        "p95": pick(0.95),
+        "p99": pick(0.99),
+        "max": round(ordered[-1], 3),
+    }
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BOT_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+class _ChatClient:
+    """Keep-alive HTTP client, one connection per worker thread"""
+
+    def __init__(self, port: int):
+        self.port = port
+        self._local = threading.local()
+        self.headers = {"Content-Type": "application/json"}
+        secret = os.getenv("FASTAPI_SHARED_SECRET")
+        if secret:
+            self.headers["X-Service-Secret"] = secret
+
+    def post(self, path: str, payload: Dict) -> Dict:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=300)
+        body = json.dumps(payload)
+        started = time.perf_counter()
+        try:
+            conn.request("POST", path, body=body, headers=self.headers)
+            response = conn.getresponse()
+            data = response.read()
+        except (http.client.HTTPException, OSError):
+            conn.close()
+            self._local.conn = None
+            raise
+        latency_ms = (time.perf_counter() - started) * 1000
+        try:
+            parsed = json.loads(data or b"{}")
+        except ValueError:
+            parsed = {}
+        return {"status": response.status, "latency_ms": latency_ms, "body": parsed}
+
+    def get(self, path: str) -> Dict:
+        conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=60)
+        conn.request("GET", path, headers=self.headers)
+        response = conn.getresponse()
+        return json.loads(response.read() or b"{}")
+
+
+def _configure_bot(args: argparse.Namespace):
+    # Measure raw capacity: admission control stays off unless rates are exported explicitly
+    os.environ.setdefault("ADMISSION_TENANT_RATE", "0")
+    os.environ.setdefault("ADMISSION_GLOBAL_RATE", "0")
+
+    import app_20
+    import lead_store
+    from llm_providers import StubLLMProvider, set_llm_provider
+
+    set_llm_provider(StubLLMProvider(
+        latency_distribution=args.llm_distribution,
+        latency_ms=args.llm_latency_ms,
+        latency_jitter_ms=args.llm_jitter_ms,
+        response_chars=args.llm_response_chars,
+        seed=args.seed
+    ))
+
+    if args.mongo == "mock":
+        try:
+            import mongomock
+        except ImportError:
+            print("⚠️ mongomock not installed; running with lead storage disabled")
+            lead_store.MongoClient = None
+        else:
+            lead_store.MongoClient = mongomock.MongoClient
+            lead_store.PYMONGO_AVAILABLE = True
+    else:
+        lead_store.MongoClient = None
+    return app_20
+
+
+def _start_server(app, port: int):
+    import uvicorn
+
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="on")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, name="bench-uvicorn", daemon=True)
+    thread.start()
+    deadline = time.time() + 60
+    while not server.started:
+        if time.time() > deadline:
+            raise RuntimeError("Bot server did not start within 60s")
+        time.sleep(0.05)
+    return server, thread
+
+
+def main(argv: List[str]) -> int:
+    args = _parse_args(argv)
+    rng = random.Random(args.seed)
+
+    # 1. Synthetic stores
+    store_build = []
+    store_paths = []
+    for index in range(max(1, args.stores)):
+        path = os.path.abspath(os.path.join(args.store_dir, f"{args.embedder}-{args.chunks}-s{args.seed + index}"))
+        started = time.perf_counter()
+        marker = build_tenant_store(path, args.chunks, seed=args.seed + index, embedder=args.embedder)
+        store_build.append({"path": path, "seconds": round(time.perf_counter() - started, 3), **marker})
+        store_paths.append(path)
+        print(f"📦 Store {index}: {args.chunks} chunks ready at {path}")
+
+    tenants = []
+    for index in range(max(1, args.tenants)):
+        store_index = index % len(store_paths)
+        corpus = SyntheticCorpus(args.seed + store_index)
+        tenants.append({
+            "resource_id": f"bench-tenant-{index}",
+            "vector_store_path": store_paths[store_index],
+            # Distinct database URIs give each tenant its own bot instance even when stores are shared
+            "database_uri": f"mongodb://localhost:27017/bench_tenant_{index}",
+            "questions": corpus.questions(64, seed=index),
+        })
+
+    # 2. Server with stub LLM and Mongo stand-in
+    app_module = _configure_bot(args)
+    port = args.port or _free_port()
+    rss_before_server = _rss_bytes()
+    server, thread = _start_server(app_module.app, port)
+    client = _ChatClient(port)
+
+    def payload(tenant: Dict, session_id: str, query: str) -> Dict:
+        return {
+            "query": query,
+            "session_id": session_id,
+            "resource_id": tenant["resource_id"],
+            "vector_store_path": tenant["vector_store_path"],
+            "database_uri": tenant["database_uri"],
+        }
+
+    # 3. Tenant cold starts (first request loads models, store and Mongo)
+    cold_starts = []
+    for tenant in tenants:
+        rss_start = _rss_bytes()
+        result = client.post("/chat", payload(tenant, f"{tenant['resource_id']}-warmup", "hello"))
+        cold_starts.append({
+            "resource_id": tenant["resource_id"],
+            "latency_ms": round(result["latency_ms"], 3),
+            "status": result["status"],
+            "rss_delta_bytes": _rss_bytes() - rss_start,
+        })
+        print(f"🧊 Cold start {tenant['resource_id']}: {result['latency_ms']:.0f} ms")
+
+    # 4. Session onboarding (name prompt + name) outside the measured window
+    sessions = []
+    for tenant in tenants:
+        for index in range(args.sessions_per_tenant):
+            session_id = f"{tenant['resource_id']}-session-{index}"
+            client.post("/chat", payload(tenant, session_id, "hello"))
+            client.post("/chat", payload(tenant, session_id, f"Bench User {index}"))
+            sessions.append((tenant, session_id))
+
+    # 5. Measured load
+    work = []
+    for _ in range(args.requests):
+        tenant, session_id = rng.choice(sessions)
+        work.append((tenant, session_id, rng.choice(tenant["questions"])))
+
+    def run_one(item):
+        tenant, session_id, question = item
+        try:
+            return client.post("/chat", payload(tenant, session_id, question))
+        except Exception as exc:
+            return {"status": 0, "latency_ms": 0.0, "body": {}, "error": str(exc)}
+
+    rss_before_load = _rss_bytes()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as pool:
+        results = list(pool.map(run_one, work))
+    wall_seconds = time.perf_counter() - started
+
+    ok = [r for r in results if r["status"] == 200]
+    stage_latencies: Dict[str, List[float]] = {}
+    route_latencies: Dict[str, List[float]] = {}
+    for result in ok:
+        metadata = result["body"].get("metadata") or {}
+        for stage, value in (metadata.get("timings_ms") or {}).items():
+            stage_latencies.setdefault(stage, []).append(value)
+        route_latencies.setdefault(metadata.get("route", "unknown"), []).append(result["latency_ms"])
+
+    status_counts: Dict[str, int] = {}
+    for result in results:
+        status_counts[str(result["status"])] = status_counts.get(str(result["status"]), 0) + 1
+
+    server_metrics = client.get("/metrics")
+    server.should_exit = True
+    thread.join(timeout=30)
+
+    report = {
+        "benchmark": "chat_load",
+        "timestamp": datetime.utcnow().isoformat(),
+        "git_revision": _git_revision(),
+        "config": {k: v for k, v in vars(args).items() if k != "output"},
+        "stores": store_build,
+        "results": {
+            "requests": len(results),
+            "succeeded": len(ok),
+            "status_counts": status_counts,
+            "wall_seconds": round(wall_seconds, 3),
+            "throughput_rps": round(len(ok) / wall_seconds, 3) if wall_seconds else 0.0,
+            "latency_ms": _percentiles([r["latency_ms"] for r in ok]),
+            "latency_ms_by_route": {route: _percentiles(values) for route, values in route_latencies.items()},
+            "stage_latency_ms": {stage: _percentiles(values) for stage, values in stage_latencies.items()},
+            "cold_starts": cold_starts,
+            "cold_start_ms": _percentiles([c["latency_ms"] for c in cold_starts]),
+            "rss_bytes": {
+                "before_server": rss_before_server,
+                "before_load": rss_before_load,
+                "after_load": _rss_bytes(),
+                "peak": _peak_rss_bytes(),
+            },
+        },
+        "server_metrics": server_metrics,
+    }
+
+    rendered = json.dumps(report, indent=2, default=str)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            handle.write(rendered)
+        print(f"📝 Results written to {args.output}")
+    print(json.dumps(report["results"], default=str))
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
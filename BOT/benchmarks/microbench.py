@@ -0,0 +1,402 @@
+"""Microbenchmarks for retrieval, reranking, extraction and ingestion primitives.
+
+Every benchmark runs against deterministic fixtures at several input sizes, so
+numbers are comparable between builds. Save a run as a baseline and compare
+later runs against it to prove a speed-up or catch a regression.
+
+Examples:
+    python BOT/benchmarks/microbench.py run --save-baseline main
+    python BOT/benchmarks/microbench.py run --filter spider --output current.json
+    python BOT/benchmarks/microbench.py compare baselines/main.json current.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BOT_DIR = os.path.dirname(BENCH_DIR)
+ROOT_DIR = os.path.dirname(BOT_DIR)
+BASELINE_DIR = os.path.join(BENCH_DIR, "baselines")
+for path in (BENCH_DIR, BOT_DIR, ROOT_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from synthetic_corpus import SyntheticCorpus, build_tenant_store  # noqa: E402
+
+FIXTURE_SEED = 1234
+
+
+class Benchmark:
+    """A named primitive measured at several input sizes"""
+
+    def __init__(self, name: str, group: str, sizes: List[int], setup: Callable[[int], Callable[[], object]]):
+        self.name = name
+        self.group = group
+        self.sizes = sizes
+        self.setup = setup
+
+
+def _measure(func: Callable[[], object], repeat: int, min_time: float) -> Dict[str, float]:
+    """Time func with auto-scaled loop counts, timeit style; returns per-call seconds"""
+    func()  # warm-up (caches, lazy imports, model graph)
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time or number >= 1_000_000:
+            break
+        number *= 10 if elapsed < min_time / 10 else 2
+
+    samples = [elapsed / number]
+    for _ in range(max(0, repeat - 1)):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - started) / number)
+
+    return {
+        "loops": number,
+        "repeat": len(samples),
+        "min_s": min(samples),
+        "median_s": statistics.median(samples),
+        "mean_s": statistics.fmean(samples),
+        "stdev_s": statistics.pstdev(samples) if len(samples) > 1 else 0.0,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Fixtures
+# ---------------------------------------------------------------------------
+
+_fixture_cache: Dict[Tuple, object] = {}
+
+
+def _cached(key: Tuple, factory: Callable[[], object]):
+    if key not in _fixture_cache:
+        _fixture_cache[key] = factory()
+    return _fixture_cache[key]
+
+
+def _chunks(count: int) -> List[str]:
+    return _cached(("chunks", count), lambda: [text for _, text, _ in SyntheticCorpus(FIXTURE_SEED).chunks(count)])
+
+
+def _page_html(sections: int) -> str:
+    def build():
+        corpus = SyntheticCorpus(FIXTURE_SEED)
+        pages = corpus.pages()
+        body = []
+        while len(body) < sections:
+            _, page_type, elements = next(pages)
+            body.append(
+                f"<section class='content'><h2>{page_type.title()}</h2>"
+                + "".join(f"<p>{text}</p>" for text in elements)
+                + "<ul><li>Home</li><li>About</li><li>Contact</li></ul></section>"
+            )
+        return (
+            "<html><head><title>Benchmark Page</title>"
+            "<meta name='description' content='Synthetic page used for spider microbenchmarks.'>"
+            "<script>var tracking = {id: 42};</script><style>p {color: red}</style>"
+            "<script type='application/ld+json'>{\"@type\": \"Organization\", \"name\": \"Bench Co\", "
+            "\"description\": \"A synthetic organisation with a long enough description.\"}</script>"
+            "</head><body><nav>Home About Services Contact</nav><main>"
+            + "".join(body[:sections])
+            + "</main><footer>Copyright 2024 Bench Co. All rights reserved. Privacy Policy</footer>"
+            "<img alt='Team photo from the annual planning offsite'></body></html>"
+        )
+    return _cached(("html", sections), build)
+
+
+def _urls(count: int) -> List[str]:
+    def build():
+        rng = random.Random(FIXTURE_SEED)
+        params = ["utm_source=news", "utm_medium=email", "gclid=abc", "page=2", "q=rockets", "hsa_cam=7", "ref=home"]
+        return [
+            f"https://bench.example.com//section/{rng.randint(1, 500)}//item-{i}"
+            f"?{'&'.join(rng.sample(params, rng.randint(0, 4)))}#frag{i}"
+            for i in range(count)
+        ]
+    return _cached(("urls", count), build)
+
+
+def _sentences(count: int) -> List[str]:
+    def build():
+        rng = random.Random(FIXTURE_SEED)
+        pool = [sentence.strip() + "." for text in _chunks(200) for sentence in text.split(".") if sentence.strip()]
+        pool += ["Follow us on Facebook Twitter Instagram", "Copyright 2024 All rights reserved", "Read more", "Skip to main content"]
+        return [rng.choice(pool) for _ in range(count)]
+    return _cached(("sentences", count), build)
+
+
+def _bench_bot(n_chunks: int):
+    """Real SemanticIntelligentRAG over a synthetic store, with Mongo and the LLM stubbed out"""
+    def build():
+        import app_20
+        import lead_store
+        from llm_providers import StubLLMProvider
+
+        store_path = os.path.join(BENCH_DIR, ".synthetic-stores", f"hash-{n_chunks}-s{FIXTURE_SEED}")
+        build_tenant_store(store_path, n_chunks, seed=FIXTURE_SEED, embedder="hash")
+        lead_store.MongoClient = None
+        return app_20.SemanticIntelligentRAG(
+            chroma_db_path=store_path,
+            resource_id=f"microbench-{n_chunks}",
+            llm_provider=StubLLMProvider()
+        )
+    return _cached(("bot", n_chunks), build)
+
+
+def _spider():
+    def build():
+        from Scraping2.spiders.spider import FixedUniversalSpider
+        return FixedUniversalSpider(domain="bench.example.com", start_url="https://bench.example.com/")
+    return _cached(("spider",), build)
+
+
+def _html_response(sections: int):
+    from scrapy.http import HtmlResponse
+    return HtmlResponse(
+        url="https://bench.example.com/page",
+        body=_page_html(sections).encode("utf-8"),
+        encoding="utf-8"
+    )
+
+
+# ---------------------------------------------------------------------------
+# Benchmarks
+# ---------------------------------------------------------------------------
+
+def _setup_retrieval(n_chunks: int):
+    from bot_metrics import ChatTrace
+    from quality_tiers import TIER_SETTINGS
+
+    bot = _bench_bot(n_chunks)
+    question = SyntheticCorpus(FIXTURE_SEED).questions(1)[0]
+    analysis = bot.analyze_question_semantically(question)
+    plan = bot.retrieval_plan.for_tier(TIER_SETTINGS["full"])
+    return lambda: bot.retrieve_and_rank(dict(analysis), ChatTrace(emit_metrics=False), plan)
+
+
+def _setup_rerank(n_docs: int):
+    bot = _bench_bot(1000)
+    docs = _chunks(n_docs)
+    question = SyntheticCorpus(FIXTURE_SEED).questions(1)[0]
+    return lambda: bot.smart_rerank_candidates(question, docs, topn=40)
+
+
+def _setup_extract_contact_docs(n_docs: int):
+    bot = _bench_bot(1000)
+    docs = _chunks(n_docs)
+    return lambda: bot.extract_contact_from_docs(docs)
+
+
+def _setup_contact_extractor(n_chars: int):
+    from app_20 import ContactInformationExtractor
+
+    extractor = ContactInformationExtractor()
+    text = " ".join(_chunks(2000))[:n_chars]
+    return lambda: extractor.extract_all_contact_info(text)
+
+
+def _setup_clean_text(sections: int):
+    spider = _spider()
+    html_text = _page_html(sections)
+    return lambda: spider._clean_webpage_text(html_text)
+
+
+def _setup_boilerplate(count: int):
+    spider = _spider()
+    sentences = _sentences(count)
+    return lambda: [spider._is_boilerplate_text(sentence) for sentence in sentences]
+
+
+def _setup_canonicalize(count: int):
+    spider = _spider()
+    urls = _urls(count)
+    return lambda: [spider._canonicalize_url(url) for url in urls]
+
+
+def _setup_extract_page(sections: int):
+    spider = _spider()
+    response = _html_response(sections)
+    return lambda: spider._extract_content_from_page(response)
+
+
+def _setup_chunking(n_chars: int):
+    from Scraping2.pipelines import ChunkingPipeline
+
+    pipeline = ChunkingPipeline()
+    text = " ".join(_chunks(2000))[:n_chars]
+    return lambda: pipeline.process_item({"text": text, "url": "https://bench.example.com/"}, None)
+
+
+BENCHMARKS = [
+    Benchmark("bot.retrieve_and_rank", "bot", [1000, 10000], _setup_retrieval),
+    Benchmark("bot.smart_rerank_candidates", "bot", [10, 40, 160], _setup_rerank),
+    Benchmark("bot.extract_contact_from_docs", "bot", [10, 100, 1000], _setup_extract_contact_docs),
+    Benchmark("bot.ContactInformationExtractor.extract_all_contact_info", "bot", [1000, 10000, 100000], _setup_contact_extractor),
+    Benchmark("spider._clean_webpage_text", "spider", [5, 50, 200], _setup_clean_text),
+    Benchmark("spider._is_boilerplate_text", "spider", [100, 1000], _setup_boilerplate),
+    Benchmark("spider._canonicalize_url", "spider", [100, 1000], _setup_canonicalize),
+    Benchmark("spider._extract_content_from_page", "spider", [5, 50, 200], _setup_extract_page),
+    Benchmark("pipeline.ChunkingPipeline.process_item", "pipeline", [1000, 10000, 100000], _setup_chunking),
+]
+
+
+# ---------------------------------------------------------------------------
+# Commands
+# ---------------------------------------------------------------------------
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BOT_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+def run_benchmarks(name_filter: Optional[str], repeat: int, min_time: float) -> Dict:
+    results = []
+    skipped = []
+    for bench in BENCHMARKS:
+        if name_filter and name_filter not in bench.name:
+            continue
+        for size in bench.sizes:
+            key = f"{bench.name}[{size}]"
+            try:
+                func = bench.setup(size)
+            except ImportError as exc:
+                skipped.append({"benchmark": key, "reason": f"missing dependency: {exc}"})
+                print(f"⏭️  {key}: skipped ({exc})")
+                continue
+            stats = _measure(func, repeat=repeat, min_time=min_time)
+            results.append({"benchmark": key, "name": bench.name, "group": bench.group, "size": size, **stats})
+            print(f"⏱️  {key}: median {stats['median_s'] * 1000:.4f} ms ({stats['loops']} loops x {stats['repeat']})")
+
+    return {
+        "suite": "microbench",
+        "timestamp": datetime.utcnow().isoformat(),
+        "git_revision": _git_revision(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+        "skipped": skipped,
+    }
+
+
+def compare_runs(baseline: Dict, current: Dict, threshold: float) -> Tuple[List[Dict], bool]:
+    """Compare median timings; a ratio above 1 + threshold is a regression"""
+    baseline_by_key = {row["benchmark"]: row for row in baseline.get("results", [])}
+    rows = []
+    regressed = False
+    for row in current.get("results", []):
+        base = baseline_by_key.get(row["benchmark"])
+        if not base or not base.get("median_s"):
+            rows.append({"benchmark": row["benchmark"], "status": "new", "current_ms": row["median_s"] * 1000})
+            continue
+        ratio = row["median_s"] / base["median_s"]
+        if ratio > 1 + threshold:
+            status = "REGRESSION"
+            regressed = True
+        elif ratio < 1 - threshold:
+            status = "faster"
+        else:
+            status = "same"
+        rows.append({
+            "benchmark": row["benchmark"],
+            "status": status,
+            "baseline_ms": base["median_s"] * 1000,
+            "current_ms": row["median_s"] * 1000,
+            "ratio": ratio,
+        })
+    return rows, regressed
+
+
+def _print_comparison(rows: List[Dict]) -> None:
+    width = max([len(row["benchmark"]) for row in rows] + [9])
+    print(f"{'benchmark'.ljust(width)}  {'baseline ms':>12}  {'current ms':>12}  {'ratio':>7}  status")
+    for row in rows:
+        baseline_ms = f"{row['baseline_ms']:.4f}" if "baseline_ms" in row else "-"
+        ratio = f"{row['ratio']:.3f}" if "ratio" in row else "-"
+        print(f"{row['benchmark'].ljust(width)}  {baseline_ms:>12}  {row['current_ms']:>12.4f}  {ratio:>7}  {row['status']}")
+
+
+def _parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Microbenchmarks for bot, spider and pipeline hot paths")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="Run benchmarks")
+    run.add_argument("--filter", help="Only run benchmarks whose name contains this text")
+    run.add_argument("--repeat", type=int, default=5, help="Timed repetitions per benchmark")
+    run.add_argument("--min-time", type=float, default=0.2, help="Minimum seconds per repetition")
+    run.add_argument("--threads", type=int, help="Pin torch intra-op threads for stable numbers")
+    run.add_argument("--output", help="Write results JSON to this path")
+    run.add_argument("--save-baseline", metavar="NAME", help=f"Also save results as {BASELINE_DIR}/NAME.json")
+    run.add_argument("--compare", metavar="BASELINE", help="Compare against a baseline file after running")
+    run.add_argument("--threshold", type=float, default=0.10, help="Relative change treated as significant")
+
+    compare = sub.add_parser("compare", help="Compare two result files")
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    compare.add_argument("--threshold", type=float, default=0.10, help="Relative change treated as significant")
+    compare.add_argument("--output", help="Write comparison JSON to this path")
+    return parser.parse_args(argv)
+
+
+def _load(path: str) -> Dict:
+    with open(path, "r", encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+def _write(path: str, payload: Dict) -> None:
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as handle:
+        json.dump(payload, handle, indent=2)
+
+
+def main(argv: List[str]) -> int:
+    args = _parse_args(argv)
+
+    if args.command == "compare":
+        rows, regressed = compare_runs(_load(args.baseline), _load(args.current), args.threshold)
+        _print_comparison(rows)
+        if args.output:
+            _write(args.output, {"threshold": args.threshold, "rows": rows, "regressed": regressed})
+        return 1 if regressed else 0
+
+    if args.threads:
+        try:
+            import torch
+            torch.set_num_threads(args.threads)
+        except ImportError:
+            pass
+
+    report = run_benchmarks(args.filter, args.repeat, args.min_time)
+    if args.output:
+        _write(args.output, report)
+    if args.save_baseline:
+        baseline_path = os.path.join(BASELINE_DIR, f"{args.save_baseline}.json")
+        _write(baseline_path, report)
+        print(f"💾 Baseline saved to {baseline_path}")
+    if args.compare:
+        rows, regressed = compare_runs(_load(args.compare), report, args.threshold)
+        _print_comparison(rows)
+        return 1 if regressed else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,288 @@
+"""Replay a captured query log (see ``query_log.py``) against the bot.
+
+Records are replayed in timestamp order. They keep their original gaps by
+default; ``--speed 2`` halves the gaps and ``--speed 0`` sends as fast as
+``--concurrency`` allows. Turns run either in-process through
+``SemanticIntelligentRAG.chat`` or over HTTP against a running ``/chat``.
+Sessions are preserved, so follow-up turns see the same conversation state
+they had in production. Turns whose text was redacted at capture time (name
+and contact details) are skipped. The JSON report compares replay latency and
+routes with the captured ones, so two builds can be compared on the same
+traffic.
+
+Examples:
+    python BOT/benchmarks/replay_queries.py --log BOT/query_logs/acme-1234 --speed 4 --llm stub
+    python BOT/benchmarks/replay_queries.py --log captured.jsonl --target http \
+        --url http://127.0.0.1:8000 --database-uri mongodb://localhost:27017/replay
+"""
+
+import argparse
+import glob
+import http.client
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlparse
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BOT_DIR = os.path.dirname(BENCH_DIR)
+for path in (BENCH_DIR, BOT_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from load_test import _git_revision, _percentiles  # noqa: E402
+
+
+def _parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Replay a captured query log against the chatbot")
+    parser.add_argument("--log", nargs="+", required=True, help="Log files or tenant log directories (rotated files included)")
+    parser.add_argument("--target", choices=["inprocess", "http"], default="inprocess", help="Where to send the turns")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="Bot base URL for --target http")
+    parser.add_argument("--database-uri", default=os.getenv("MONGODB_URI"), help="database_uri sent with HTTP turns")
+    parser.add_argument("--vector-store-path", help="Override the store path recorded in the log")
+    parser.add_argument("--tenant", help="Only replay this tenant")
+    parser.add_argument("--limit", type=int, default=0, help="Replay at most this many turns (0 = all)")
+    parser.add_argument("--speed", type=float, default=1.0, help="Pacing multiplier: 1 = original, 2 = twice as fast, 0 = unpaced")
+    parser.add_argument("--concurrency", type=int, default=32, help="Maximum turns in flight")
+    parser.add_argument("--llm", choices=["stub", "configured"], default="stub", help="In-process LLM: deterministic stub or LLM_PROVIDER")
+    parser.add_argument("--llm-latency-ms", type=float, default=600.0, help="Stub LLM median latency")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the stub LLM")
+    parser.add_argument("--output", help="Write the JSON report to this path")
+    return parser.parse_args(argv)
+
+
+def _log_files(paths: List[str]) -> List[str]:
+    """Expand directories to their rotated files (every writer process), oldest first"""
+    files: List[str] = []
+    for path in paths:
+        if os.path.isdir(path):
+            found = glob.glob(os.path.join(path, "**", "queries*.jsonl*"), recursive=True)
+
+            def age(name: str):
+                suffix = name.rsplit(".jsonl", 1)[1].lstrip(".")
+                return (os.path.dirname(name), -int(suffix) if suffix.isdigit() else 0)
+
+            files.extend(sorted(found, key=age))
+        else:
+            files.append(path)
+    return files
+
+
+def load_records(paths: List[str], tenant: Optional[str] = None) -> List[Dict[str, Any]]:
+    records = []
+    for file_path in _log_files(paths):
+        with open(file_path, "r", encoding="utf-8") as handle:
+            for line in handle:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if tenant and record.get("tenant") != tenant:
+                    continue
+                records.append(record)
+    # Stable sort keeps file order for identical timestamps, so replays are repeatable
+    records.sort(key=lambda record: record.get("ts", 0.0))
+    return records
+
+
+class _InProcessTarget:
+    """One SemanticIntelligentRAG per store path, Mongo disabled so replays never write leads"""
+
+    def __init__(self, args: argparse.Namespace):
+        import lead_store
+        lead_store.MongoClient = None
+        import app_20
+        self._app = app_20
+        self._llm = None
+        if args.llm == "stub":
+            from llm_providers import StubLLMProvider
+            self._llm = StubLLMProvider(latency_ms=args.llm_latency_ms, seed=args.seed)
+        self._bots: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _bot(self, record: Dict[str, Any], store_path: str):
+        with self._lock:
+            bot = self._bots.get(store_path)
+            if bot is None:
+                bot = self._bots[store_path] = self._app.SemanticIntelligentRAG(
+                    chroma_db_path=store_path,
+                    resource_id=record.get("tenant"),
+                    llm_provider=self._llm
+                )
+            return bot
+
+    def send(self, record: Dict[str, Any], store_path: str, session_id: str) -> Dict[str, Any]:
+        bot = self._bot(record, store_path)
+        trace: Dict[str, Any] = {}
+        started = time.perf_counter()
+        try:
+            bot.chat(record["query"], session_id, trace_out=trace)
+            status = 200
+        except Exception as exc:
+            status = getattr(exc, "status_code", 500)
+        latency_ms = (time.perf_counter() - started) * 1000
+        return {"status": status, "latency_ms": latency_ms, "trace": trace}
+
+
+class _HttpTarget:
+    """Keep-alive POST /chat, one connection per worker thread"""
+
+    def __init__(self, args: argparse.Namespace):
+        parsed = urlparse(args.url)
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or (443 if parsed.scheme == "https" else 80)
+        self.https = parsed.scheme == "https"
+        self.database_uri = args.database_uri
+        self._local = threading.local()
+        self.headers = {"Content-Type": "application/json"}
+        secret = os.getenv("FASTAPI_SHARED_SECRET")
+        if secret:
+            self.headers["X-Service-Secret"] = secret
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            factory = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+            conn = self._local.conn = factory(self.host, self.port, timeout=300)
+        return conn
+
+    def send(self, record: Dict[str, Any], store_path: str, session_id: str) -> Dict[str, Any]:
+        payload = {
+            "query": record["query"],
+            "session_id": session_id,
+            "resource_id": record.get("tenant"),
+            "vector_store_path": store_path,
+            "database_uri": self.database_uri,
+        }
+        conn = self._connection()
+        started = time.perf_counter()
+        try:
+            conn.request("POST", "/chat", body=json.dumps(payload), headers=self.headers)
+            response = conn.getresponse()
+            data = response.read()
+        except (http.client.HTTPException, OSError):
+            conn.close()
+            self._local.conn = None
+            return {"status": 0, "latency_ms": (time.perf_counter() - started) * 1000, "trace": {}}
+        latency_ms = (time.perf_counter() - started) * 1000
+        try:
+            body = json.loads(data or b"{}")
+        except ValueError:
+            body = {}
+        return {"status": response.status, "latency_ms": latency_ms, "trace": body.get("metadata") or {}}
+
+
+def replay(
+    records: List[Dict[str, Any]],
+    send: Callable[[Dict[str, Any], str, str], Dict[str, Any]],
+    speed: float,
+    concurrency: int,
+    store_override: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """Dispatch records on their (scaled) original schedule and collect outcomes in record order"""
+    if not records:
+        return []
+    origin = records[0].get("ts", 0.0)
+    started = time.monotonic()
+
+    def run(record: Dict[str, Any], due: float) -> Dict[str, Any]:
+        lag_ms = max(0.0, time.monotonic() - due) * 1000
+        store_path = store_override or record.get("vector_store_path")
+        outcome = send(record, store_path, f"replay-{record.get('session', 'anonymous')}")
+        outcome["schedule_lag_ms"] = lag_ms
+        return outcome
+
+    futures = []
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        for record in records:
+            offset = (record.get("ts", origin) - origin) / speed if speed > 0 else 0.0
+            due = started + offset
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(pool.submit(run, record, due))
+        return [future.result() for future in futures]
+
+
+def _report(records: List[Dict[str, Any]], outcomes: List[Dict[str, Any]], skipped: int, wall_seconds: float, args) -> Dict[str, Any]:
+    ok = [(record, outcome) for record, outcome in zip(records, outcomes) if outcome["status"] == 200]
+    replay_by_route: Dict[str, List[float]] = {}
+    original_by_route: Dict[str, List[float]] = {}
+    stage_latencies: Dict[str, List[float]] = {}
+    route_matches = 0
+    for record, outcome in ok:
+        route = outcome["trace"].get("route", "unknown")
+        replay_by_route.setdefault(route, []).append(outcome["latency_ms"])
+        if record.get("total_ms") is not None:
+            original_by_route.setdefault(record.get("route", "unknown"), []).append(record["total_ms"])
+        route_matches += route == record.get("route")
+        for stage, value in (outcome["trace"].get("timings_ms") or {}).items():
+            stage_latencies.setdefault(stage, []).append(value)
+
+    status_counts: Dict[str, int] = {}
+    for outcome in outcomes:
+        status_counts[str(outcome["status"])] = status_counts.get(str(outcome["status"]), 0) + 1
+
+    return {
+        "benchmark": "query_replay",
+        "timestamp": datetime.utcnow().isoformat(),
+        "git_revision": _git_revision(),
+        "config": {k: v for k, v in vars(args).items() if k not in {"output", "database_uri"}},
+        "results": {
+            "turns": len(records),
+            "skipped_redacted": skipped,
+            "succeeded": len(ok),
+            "status_counts": status_counts,
+            "wall_seconds": round(wall_seconds, 3),
+            "throughput_rps": round(len(ok) / wall_seconds, 3) if wall_seconds else 0.0,
+            "route_match_rate": round(route_matches / len(ok), 4) if ok else None,
+            "latency_ms": _percentiles([outcome["latency_ms"] for _, outcome in ok]),
+            "original_latency_ms": _percentiles([r["total_ms"] for r, _ in ok if r.get("total_ms") is not None]),
+            "latency_ms_by_route": {route: _percentiles(values) for route, values in replay_by_route.items()},
+            "original_latency_ms_by_route": {route: _percentiles(values) for route, values in original_by_route.items()},
+            "stage_latency_ms": {stage: _percentiles(values) for stage, values in stage_latencies.items()},
+            "schedule_lag_ms": _percentiles([outcome["schedule_lag_ms"] for outcome in outcomes]),
+        },
+    }
+
+
+def main(argv: List[str]) -> int:
+    args = _parse_args(argv)
+    records = load_records(args.log, args.tenant)
+    replayable = [record for record in records if record.get("query") and record["query"] != "<redacted>"]
+    skipped = len(records) - len(replayable)
+    if args.limit > 0:
+        replayable = replayable[:args.limit]
+    if not replayable:
+        print(json.dumps({"status": "failed", "error": "No replayable records found"}))
+        return 2
+    if not args.vector_store_path and any(not record.get("vector_store_path") for record in replayable):
+        print(json.dumps({"status": "failed", "error": "Records lack vector_store_path; pass --vector-store-path"}))
+        return 2
+
+    target = _InProcessTarget(args) if args.target == "inprocess" else _HttpTarget(args)
+    print(f"▶️ Replaying {len(replayable)} turns (skipped {skipped} redacted) at speed {args.speed or 'unpaced'}")
+    started = time.perf_counter()
+    outcomes = replay(replayable, target.send, args.speed, args.concurrency, args.vector_store_path)
+    wall_seconds = time.perf_counter() - started
+
+    report = _report(replayable, outcomes, skipped, wall_seconds, args)
+    rendered = json.dumps(report, indent=2, default=str)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            handle.write(rendered)
+        print(f"📝 Results written to {args.output}")
+    print(json.dumps(report["results"], default=str))
+    return 0 if report["results"]["succeeded"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
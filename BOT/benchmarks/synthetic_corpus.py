@@ -0,0 +1,198 @@
+# BOT/benchmarks/synthetic_corpus.py - Deterministic synthetic tenant content for benchmarks
+
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+EMBEDDING_DIM = 384  # all-MiniLM-L6-v2 output size
+
+_COMPANY_PREFIXES = ["Acme", "Northwind", "Blue Harbor", "Summit", "Evergreen", "Vertex", "Orion", "Cobalt", "Maple", "Atlas"]
+_COMPANY_SUFFIXES = ["Solutions", "Labs", "Systems", "Consulting", "Logistics", "Analytics", "Health", "Foods", "Energy", "Studios"]
+_SERVICES = [
+    "cloud migration", "data analytics", "managed security", "custom software development",
+    "supply chain planning", "digital marketing", "mobile app design", "staff training",
+    "equipment maintenance", "renewable installation", "payroll outsourcing", "customer support"
+]
+_CITIES = ["Austin", "Toronto", "Manchester", "Pune", "Sydney", "Berlin", "Denver", "Dublin", "Singapore", "Lagos"]
+_FIRST_NAMES = ["Jane", "Ravi", "Maria", "Tom", "Aisha", "Kenji", "Lena", "Carlos", "Priya", "Owen"]
+_LAST_NAMES = ["Doe", "Sharma", "Garcia", "Nguyen", "Okafor", "Tanaka", "Fischer", "Silva", "Patel", "Brooks"]
+_PAGE_TYPES = ["about", "services", "team", "careers", "blog", "faq", "contact", "case-study"]
+_NAV_BOILERPLATE = "Home About Services Team Careers Blog Contact Privacy Policy Terms of Service"
+
+_QUESTION_TEMPLATES = [
+    "When was {company} founded?",
+    "Who is the CEO of {company}?",
+    "What services does {company} offer?",
+    "Tell me about your {service} service",
+    "Where is the {company} office located?",
+    "Do you have any openings for {service} roles?",
+    "How does {company} approach {service}?",
+    "What did the {city} case study achieve?",
+    "Who founded the company and when?",
+    "What industries do you work with?",
+]
+
+
+class SyntheticCorpus:
+    """Generate realistic-looking scraped pages and chunk them like the ingestion pipeline"""
+
+    def __init__(self, seed: int = 0):
+        self.seed = seed
+        rng = random.Random(seed)
+        self.company = f"{rng.choice(_COMPANY_PREFIXES)} {rng.choice(_COMPANY_SUFFIXES)}"
+        self.domain = re.sub(r"[^a-z]", "", self.company.lower()) + ".example.com"
+        self.founded = rng.randint(1985, 2020)
+        self.ceo = f"{rng.choice(_FIRST_NAMES)} {rng.choice(_LAST_NAMES)}"
+        self.city = rng.choice(_CITIES)
+        self.services = rng.sample(_SERVICES, 6)
+
+    def _paragraph(self, rng: random.Random, page_type: str, page_index: int) -> str:
+        service = rng.choice(self.services)
+        city = rng.choice(_CITIES)
+        person = f"{rng.choice(_FIRST_NAMES)} {rng.choice(_LAST_NAMES)}"
+        year = rng.randint(self.founded, 2025)
+        sentences = [
+            f"{self.company} was founded in {self.founded} by {self.ceo} in {self.city}.",
+            f"Our {service} practice helps clients in {city} reduce costs and ship faster.",
+            f"In {year} the team delivered a {service} programme for a regional partner.",
+            f"{person} leads the {service} group and has worked with us since {year}.",
+            f"Customers choose {self.company} for transparent reporting and responsive support.",
+            f"The {page_type} page number {page_index} describes how we plan, deliver and measure {service}.",
+            f"Contact our {city} office at info@{self.domain} or call +1 555 {rng.randint(100, 999)} {rng.randint(1000, 9999)}.",
+            f"We are hiring engineers and analysts who care about {service} and clear communication.",
+        ]
+        rng.shuffle(sentences)
+        return " ".join(sentences[:rng.randint(4, len(sentences))])
+
+    def pages(self) -> Iterator[Tuple[str, str, List[str]]]:
+        """Yield (url, page_type, element_texts) forever, deterministically"""
+        rng = random.Random(self.seed + 1)
+        page_index = 0
+        while True:
+            page_type = _PAGE_TYPES[page_index % len(_PAGE_TYPES)]
+            url = f"https://{self.domain}/{page_type}/{page_index}"
+            elements = [self._paragraph(rng, page_type, page_index) for _ in range(rng.randint(3, 8))]
+            yield url, page_type, elements
+            page_index += 1
+
+    def chunks(self, total: int) -> Iterator[Tuple[str, str, Dict]]:
+        """Yield (id, text, metadata) mirroring full_page_text plus per-element items"""
+        produced = 0
+        for url, page_type, elements in self.pages():
+            full_text = f"{_NAV_BOILERPLATE} " + " ".join(elements)
+            items = [("full_page_text", full_text[:3250])]
+            items.extend((f"element_{tag}", text) for tag, text in zip(["p", "div", "section", "article", "li"] * 2, elements))
+            for content_type, text in items:
+                if produced >= total:
+                    return
+                chunk_id = hashlib.md5(f"{self.seed}:{produced}:{url}".encode()).hexdigest()
+                yield chunk_id, text, {
+                    "url": url,
+                    "content_type": content_type,
+                    "domain": self.domain,
+                    "page_title": f"{self.company} - {page_type.title()}",
+                    "chunk_length": len(text),
+                    "word_count": len(text.split()),
+                }
+                produced += 1
+
+    def questions(self, count: int, seed: int = 0) -> List[str]:
+        rng = random.Random(self.seed * 7919 + seed)
+        return [
+            rng.choice(_QUESTION_TEMPLATES).format(
+                company=self.company,
+                service=rng.choice(self.services),
+                city=rng.choice(_CITIES)
+            )
+            for _ in range(count)
+        ]
+
+
+def hash_embeddings(texts: List[str], dim: int = EMBEDDING_DIM) -> np.ndarray:
+    """Fast deterministic bag-of-words embeddings (hashing trick), L2-normalised"""
+    matrix = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for token in re.findall(r"\w+", text.lower()):
+            digest = hashlib.md5(token.encode()).digest()
+            bucket = int.from_bytes(digest[:4], "little") % dim
+            matrix[row, bucket] += 1.0 if digest[4] & 1 else -1.0
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def build_tenant_store(
+    path: str,
+    n_chunks: int,
+    seed: int = 0,
+    collection_name: str = "scraped_content",
+    embedder: str = "hash",
+    batch_size: int = 2000
+) -> Dict:
+    """Create (or reuse) a synthetic tenant Chroma store with n_chunks documents"""
+    import chromadb
+    from Scraping2.vector_store import get_or_create_tenant_collection
+
+    marker_path = os.path.join(path, "synthetic.json")
+    if os.path.exists(marker_path):
+        with open(marker_path, "r", encoding="utf-8") as handle:
+            marker = json.load(handle)
+        if marker.get("n_chunks") == n_chunks and marker.get("seed") == seed and marker.get("embedder") == embedder:
+            return marker
+
+    os.makedirs(path, exist_ok=True)
+    client = chromadb.PersistentClient(path=path)
+    try:
+        client.delete_collection(collection_name)
+    except Exception:
+        pass
+    # Hash embeddings share the model's width but not its name, so only real-model stores record it
+    collection = get_or_create_tenant_collection(
+        client,
+        collection_name,
+        path,
+        embedding_model="all-MiniLM-L6-v2" if embedder == "model" else None
+    )
+
+    model = None
+    if embedder == "model":
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer("all-MiniLM-L6-v2")
+
+    corpus = SyntheticCorpus(seed)
+    batch_ids, batch_docs, batch_meta = [], [], []
+
+    def flush():
+        if not batch_ids:
+            return
+        if model is not None:
+            vectors = model.encode(batch_docs, batch_size=64, normalize_embeddings=True)
+        else:
+            vectors = hash_embeddings(batch_docs)
+        collection.add(ids=list(batch_ids), documents=list(batch_docs), metadatas=list(batch_meta), embeddings=vectors.tolist())
+        batch_ids.clear()
+        batch_docs.clear()
+        batch_meta.clear()
+
+    for chunk_id, text, metadata in corpus.chunks(n_chunks):
+        batch_ids.append(chunk_id)
+        batch_docs.append(text)
+        batch_meta.append(metadata)
+        if len(batch_ids) >= batch_size:
+            flush()
+    flush()
+
+    marker = {"n_chunks": n_chunks, "seed": seed, "embedder": embedder, "company": corpus.company}
+    with open(marker_path, "w", encoding="utf-8") as handle:
+        json.dump(marker, handle)
+    return marker
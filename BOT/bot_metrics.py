@@ -0,0 +1,159 @@
+# BOT/bot_metrics.py - In-process metrics registry for the RAG chatbot service
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+
+def _label_key(labels: Dict[str, Any]) -> Tuple[Tuple[str, str], ...]:
+    return tuple(sorted((str(k), str(v)) for k, v in labels.items() if v is not None))
+
+
+def _percentile(sorted_values, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * (len(sorted_values) - 1)))))
+    return float(sorted_values[index])
+
+
+class _Summary:
+    """Running summary of observed values with a bounded window for percentiles"""
+
+    def __init__(self, window: int):
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+        self.recent: Deque[float] = deque(maxlen=window)
+
+    def observe(self, value: float):
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        self.recent.append(value)
+
+    def to_dict(self) -> Dict[str, float]:
+        ordered = sorted(self.recent)
+        return {
+            "count": self.count,
+            "sum": round(self.total, 6),
+            "avg": round(self.total / self.count, 6) if self.count else 0.0,
+            "min": round(self.min or 0.0, 6),
+            "max": round(self.max or 0.0, 6),
+            "p50": round(_percentile(ordered, 0.50), 6),
+            "p95": round(_percentile(ordered, 0.95), 6),
+            "p99": round(_percentile(ordered, 0.99), 6),
+        }
+
+
+class MetricsRegistry:
+    """Thread-safe counters, gauges and summaries exposed through /metrics"""
+
+    def __init__(self, window: int = 1024):
+        self._window = window
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[Tuple, float]] = {}
+        self._gauges: Dict[str, Dict[Tuple, float]] = {}
+        self._summaries: Dict[str, Dict[Tuple, _Summary]] = {}
+        self.started_at = time.time()
+
+    def increment(self, name: str, value: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._gauges.setdefault(name, {})[key] = value
+
+    def observe(self, name: str, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._summaries.setdefault(name, {})
+            summary = series.get(key)
+            if summary is None:
+                summary = series[key] = _Summary(self._window)
+            summary.observe(float(value))
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return a JSON-serialisable view of every metric series"""
+
+        def render(series: Dict[Tuple, Any], convert) -> list:
+            return [{"labels": dict(key), "value": convert(value)} for key, value in series.items()]
+
+        with self._lock:
+            return {
+                "uptime_seconds": round(time.time() - self.started_at, 3),
+                "counters": {name: render(series, float) for name, series in self._counters.items()},
+                "gauges": {name: render(series, float) for name, series in self._gauges.items()},
+                "summaries": {name: render(series, lambda s: s.to_dict()) for name, series in self._summaries.items()},
+            }
+
+
+# Process-wide registry shared by the chatbot and its helpers
+metrics = MetricsRegistry()
+
+
+class ChatTrace:
+    """Route taken and per-stage wall-clock timings for a single chat turn"""
+
+    def __init__(self, emit_metrics: bool = True):
+        self.route = "unknown"
+        self.timings: Dict[str, float] = {}
+        # Chunk ids the answer was built from (empty for non-retrieval routes)
+        self.candidate_ids: List[str] = []
+        # Every chunk id retrieval produced, before the rerank limit
+        self.retrieved_ids: List[str] = []
+        # Quality tier the turn ran at (full / reduced / minimal) when it reached retrieval
+        self.tier: Optional[str] = None
+        # Name of the retrieval plan the turn ran
+        self.plan: Optional[str] = None
+        # Stages that were skipped or trimmed because the request deadline ran out
+        self.deadline_cuts: List[str] = []
+        # Off for work outside the request path (shadow runs), so it doesn't skew chat_* metrics
+        self.emit_metrics = emit_metrics
+        self._started = time.perf_counter()
+        self.total_seconds: Optional[float] = None
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.timings[name] = self.timings.get(name, 0.0) + elapsed
+            if self.emit_metrics:
+                metrics.observe("chat_stage_seconds", elapsed, stage=name)
+
+    def record(self, name: str, seconds: float):
+        """Add an externally measured stage duration"""
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+        if self.emit_metrics:
+            metrics.observe("chat_stage_seconds", seconds, stage=name)
+
+    def finish(self) -> "ChatTrace":
+        if self.total_seconds is None:
+            self.total_seconds = time.perf_counter() - self._started
+            metrics.increment("chat_requests_total", route=self.route)
+            metrics.observe("chat_latency_seconds", self.total_seconds, route=self.route)
+        return self
+
+    def to_dict(self) -> Dict[str, Any]:
+        summary = {
+            "route": self.route,
+            "timings_ms": {name: round(value * 1000, 3) for name, value in self.timings.items()},
+            "total_ms": round((self.total_seconds or 0.0) * 1000, 3),
+        }
+        if self.tier:
+            summary["tier"] = self.tier
+        if self.plan:
+            summary["plan"] = self.plan
+        if self.deadline_cuts:
+            summary["deadline_cuts"] = list(self.deadline_cuts)
+        return summary
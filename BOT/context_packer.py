@@ -0,0 +1,121 @@
+# BOT/context_packer.py - Token-budgeted context assembly for the LLM prompt
+
+import math
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Set
+
+
+@dataclass
+class PackedContext:
+    passages: List[str]
+    estimated_tokens: int
+    dropped: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.passages)
+
+
+class ContextPacker:
+    """Select the highest scoring, non-redundant passages that fit a token budget"""
+
+    def __init__(
+        self,
+        token_budget: int = 3000,
+        max_passages: int = 12,
+        chars_per_token: float = 4.0,
+        containment_threshold: float = 0.9,
+        near_duplicate_threshold: float = 0.8,
+        min_passage_tokens: int = 48,
+        shingle_size: int = 3
+    ):
+        self.token_budget = max(1, int(token_budget))
+        self.max_passages = max(1, int(max_passages))
+        self.chars_per_token = max(1.0, float(chars_per_token))
+        self.containment_threshold = containment_threshold
+        self.near_duplicate_threshold = near_duplicate_threshold
+        self.min_passage_tokens = min_passage_tokens
+        self.shingle_size = shingle_size
+
+    def estimate_tokens(self, text: str) -> int:
+        """Cheap token estimate; Gemini averages roughly four characters per token"""
+        return int(math.ceil(len(text) / self.chars_per_token)) if text else 0
+
+    def _shingles(self, text: str) -> Set[str]:
+        words = re.findall(r"\w+", text.lower())
+        if len(words) < self.shingle_size:
+            return {" ".join(words)} if words else set()
+        return {
+            " ".join(words[i:i + self.shingle_size])
+            for i in range(len(words) - self.shingle_size + 1)
+        }
+
+    def _truncate(self, text: str, max_tokens: int) -> str:
+        max_chars = int(max_tokens * self.chars_per_token)
+        if len(text) <= max_chars:
+            return text
+        cut = text[:max(0, max_chars - 3)]
+        sentence_end = max(cut.rfind(". "), cut.rfind("! "), cut.rfind("? "))
+        if sentence_end > max_chars // 2:
+            return cut[:sentence_end + 1]
+        word_end = cut.rfind(" ")
+        return (cut[:word_end] if word_end > 0 else cut).rstrip() + "..."
+
+    def pack(self, docs: Sequence[str], scores: Optional[Sequence[float]] = None) -> PackedContext:
+        """Pack passages in rerank-score order, dropping contained and near-duplicate text"""
+        dropped = {"empty": 0, "contained": 0, "near_duplicate": 0, "budget": 0, "max_passages": 0}
+
+        if scores is not None and len(scores) == len(docs):
+            ordered = [doc for doc, _ in sorted(zip(docs, scores), key=lambda pair: pair[1], reverse=True)]
+        else:
+            ordered = list(docs)
+
+        selected: List[str] = []
+        selected_shingles: List[Set[str]] = []
+        covered: Set[str] = set()
+        used_tokens = 0
+
+        for doc in ordered:
+            passage = (doc or "").strip()
+            if not passage:
+                dropped["empty"] += 1
+                continue
+
+            if len(selected) >= self.max_passages:
+                dropped["max_passages"] += 1
+                continue
+
+            shingles = self._shingles(passage)
+            if shingles and len(shingles & covered) / len(shingles) >= self.containment_threshold:
+                dropped["contained"] += 1
+                continue
+
+            if any(
+                len(shingles & other) / max(1, len(shingles | other)) >= self.near_duplicate_threshold
+                for other in selected_shingles
+            ):
+                dropped["near_duplicate"] += 1
+                continue
+
+            remaining = self.token_budget - used_tokens
+            tokens = self.estimate_tokens(passage)
+            if tokens > remaining:
+                if remaining < self.min_passage_tokens:
+                    dropped["budget"] += 1
+                    continue
+                passage = self._truncate(passage, remaining)
+                tokens = self.estimate_tokens(passage)
+                # Only text that reaches the prompt counts as covered for later passages
+                shingles = self._shingles(passage)
+
+            selected.append(passage)
+            selected_shingles.append(shingles)
+            covered |= shingles
+            used_tokens += tokens
+
+        return PackedContext(
+            passages=selected,
+            estimated_tokens=used_tokens,
+            dropped={reason: count for reason, count in dropped.items() if count}
+        )
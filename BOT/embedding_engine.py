@@ -0,0 +1,106 @@
+# BOT/embedding_engine.py - Process-wide query embedding model shared by every tenant
+
+import threading
+from typing import Dict, List, Sequence, Union
+
+import numpy as np
+
+from bot_metrics import metrics
+from inference_batcher import INFERENCE_BATCHING_ENABLED, INFERENCE_MAX_BATCH_EMBED, MicroBatcher
+
+DEFAULT_EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+
+def _chroma_accepts_ndarrays() -> bool:
+    """chromadb < 0.5 validates query_embeddings as plain lists; newer releases take arrays"""
+    try:
+        import chromadb
+        major, minor = (int(part) for part in chromadb.__version__.split(".")[:2])
+        return (major, minor) >= (0, 5)
+    except Exception:
+        return False
+
+
+class EmbeddingModelMismatchError(ValueError):
+    """Collection vectors were produced by a different model than the query encoder"""
+
+
+class EmbeddingEngine:
+    """Single SentenceTransformer used for all query embeddings.
+
+    Collections are queried with ``query_embeddings`` produced here; the engine
+    is never handed to Chroma as an embedding function.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_EMBEDDING_MODEL):
+        from sentence_transformers import SentenceTransformer
+
+        self.model_name = model_name
+        self.model = SentenceTransformer(model_name)
+        self.dimension = int(self.model.get_sentence_embedding_dimension())
+        self.ndarray_queries = _chroma_accepts_ndarrays()
+        # Concurrent requests' texts are embedded together in one forward pass
+        self._batcher = MicroBatcher(
+            "embedding", self._encode_batch, max_batch_size=INFERENCE_MAX_BATCH_EMBED
+        ) if INFERENCE_BATCHING_ENABLED else None
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        return self.model.encode(texts, batch_size=64, convert_to_numpy=True)
+
+    def encode(self, texts: Union[str, Sequence[str]]) -> np.ndarray:
+        """Embed one text (1-D result) or many (2-D float32 matrix)"""
+        single = isinstance(texts, str)
+        batch = [texts] if single else list(texts)
+        if not batch:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        vectors = self._batcher.submit(batch) if self._batcher else self._encode_batch(batch)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        metrics.increment("embedding_texts_total", len(batch))
+        return vectors[0] if single else vectors
+
+    def as_query_embeddings(self, vectors: np.ndarray):
+        """Hand a matrix to collection.query without per-row copies where Chroma allows it"""
+        matrix = np.atleast_2d(vectors)
+        return matrix if self.ndarray_queries else matrix.tolist()
+
+    def verify_collection(self, collection) -> None:
+        """Fail fast when a collection was embedded with another model"""
+        stored_model = (collection.metadata or {}).get("embedding_model")
+        if stored_model and stored_model != self.model_name:
+            raise EmbeddingModelMismatchError(
+                f"Collection '{collection.name}' was embedded with '{stored_model}' "
+                f"but queries use '{self.model_name}'"
+            )
+        if stored_model:
+            return
+
+        # Older collections carry no model name; the vector width still catches most mismatches
+        try:
+            sample = collection.peek(limit=1)
+            embeddings = sample.get("embeddings")
+            if embeddings is not None and len(embeddings) and len(embeddings[0]) != self.dimension:
+                raise EmbeddingModelMismatchError(
+                    f"Collection '{collection.name}' stores {len(embeddings[0])}-d vectors "
+                    f"but '{self.model_name}' produces {self.dimension}-d queries"
+                )
+        except EmbeddingModelMismatchError:
+            raise
+        except Exception as e:
+            print(f"⚠️ Could not verify embeddings of collection '{collection.name}': {e}")
+
+
+_engine_lock = threading.Lock()
+_engines: Dict[str, EmbeddingEngine] = {}
+
+
+def get_embedding_engine(model_name: str = DEFAULT_EMBEDDING_MODEL) -> EmbeddingEngine:
+    """Return the shared engine for model_name, loading it once per process"""
+    engine = _engines.get(model_name)
+    if engine is None:
+        with _engine_lock:
+            engine = _engines.get(model_name)
+            if engine is None:
+                print(f"🔄 Loading shared embedding model: {model_name}")
+                engine = _engines[model_name] = EmbeddingEngine(model_name)
+                print(f"✅ Shared embedding model loaded: {model_name} ({engine.dimension}-d)")
+    return engine
@@ -0,0 +1,227 @@
+# BOT/fair_scheduler.py - Weighted fair queuing of blocking chat work across tenants
+
+import asyncio
+import collections
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Deque, Dict, Optional
+
+from bot_metrics import metrics
+
+
+def parse_plan_weights(spec: str) -> Dict[str, float]:
+    """'free=1,pro=2,enterprise=4' -> {'free': 1.0, 'pro': 2.0, 'enterprise': 4.0}"""
+    weights: Dict[str, float] = {}
+    for item in (spec or "").split(","):
+        if "=" not in item:
+            continue
+        plan, _, value = item.partition("=")
+        try:
+            weight = float(value)
+        except ValueError:
+            continue
+        if plan.strip() and weight > 0:
+            weights[plan.strip().lower()] = weight
+    return weights
+
+
+def parse_tenant_plans(spec: str) -> Dict[str, str]:
+    """'acme=pro,globex=enterprise' -> {'acme': 'pro', 'globex': 'enterprise'}"""
+    plans: Dict[str, str] = {}
+    for item in (spec or "").split(","):
+        tenant, _, plan = item.partition("=")
+        if tenant.strip() and plan.strip():
+            plans[tenant.strip()] = plan.strip().lower()
+    return plans
+
+
+def load_tenant_plans() -> Dict[str, str]:
+    """Tenant -> plan from TENANT_PLANS_FILE (a JSON object) and TENANT_PLANS, which wins.
+
+    Keys are the tenant keys the scheduler sees (resource_id for provisioned
+    tenants). Plans are only ever resolved here, never taken from a request.
+    """
+    plans: Dict[str, str] = {}
+    path = os.getenv("TENANT_PLANS_FILE")
+    if path:
+        try:
+            with open(path, "r", encoding="utf-8") as handle:
+                data = json.load(handle)
+            if not isinstance(data, dict):
+                raise ValueError("expected a JSON object of tenant -> plan")
+            plans.update({str(tenant): str(plan).strip().lower() for tenant, plan in data.items() if plan})
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Could not load TENANT_PLANS_FILE {path}: {e}")
+    plans.update(parse_tenant_plans(os.getenv("TENANT_PLANS", "")))
+    return plans
+
+
+class _Task:
+    __slots__ = ("tenant", "start_tag", "fn", "args", "future", "enqueued")
+
+    def __init__(self, tenant: str, start_tag: float, fn: Callable, args: tuple):
+        self.tenant = tenant
+        self.start_tag = start_tag
+        self.fn = fn
+        self.args = args
+        self.future: Future = Future()
+        self.enqueued = time.perf_counter()
+
+
+class _TenantQueue:
+    __slots__ = ("tasks", "finish_tag", "running")
+
+    def __init__(self):
+        self.tasks: Deque[_Task] = collections.deque()
+        self.finish_tag = 0.0
+        self.running = 0
+
+
+class FairChatExecutor:
+    """Fixed worker pool that serves tenants by start-time fair queuing.
+
+    Each task gets a virtual start tag ``max(V, tenant's last finish tag)`` and
+    advances the tenant's finish tag by ``cost / weight``. Idle workers always
+    take the queued head with the smallest start tag, so a tenant with weight
+    2 gets twice the turns of a weight-1 tenant while both are backlogged. A
+    burst from one tenant only delays that tenant's own queue. No tenant may
+    occupy more than ``max_tenant_share`` of the workers at once, so some
+    capacity is always left for everyone else. A tenant's weight comes from its
+    plan in ``tenant_plans``; tenants without one get ``default_weight``.
+    """
+
+    def __init__(
+        self,
+        workers: int = 16,
+        plan_weights: Optional[Dict[str, float]] = None,
+        default_weight: float = 1.0,
+        max_tenant_share: float = 0.5,
+        tenant_plans: Optional[Dict[str, str]] = None
+    ):
+        self.workers = max(1, int(workers))
+        self.plan_weights = {plan.lower(): weight for plan, weight in (plan_weights or {}).items()}
+        self.tenant_plans = dict(tenant_plans or {})
+        self.default_weight = max(1e-6, float(default_weight))
+        self.tenant_cap = max(1, int(self.workers * min(1.0, max(0.0, max_tenant_share))))
+        self._condition = threading.Condition()
+        self._tenants: Dict[str, _TenantQueue] = {}
+        self._virtual_time = 0.0
+        self._queued = 0
+        self._running = 0
+        self._closed = False
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"chat-worker-{index}", daemon=True)
+            for index in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def plan_for(self, tenant: str) -> Optional[str]:
+        return self.tenant_plans.get(tenant)
+
+    def weight_for(self, plan: Optional[str]) -> float:
+        return self.plan_weights.get((plan or "").strip().lower(), self.default_weight)
+
+    def submit(self, tenant: str, fn: Callable, *args, cost: float = 1.0) -> Future:
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Chat executor is shut down")
+            queue = self._tenants.get(tenant)
+            if queue is None:
+                queue = self._tenants[tenant] = _TenantQueue()
+            start_tag = max(self._virtual_time, queue.finish_tag)
+            queue.finish_tag = start_tag + max(1.0, float(cost)) / self.weight_for(self.plan_for(tenant))
+            task = _Task(tenant, start_tag, fn, args)
+            queue.tasks.append(task)
+            self._queued += 1
+            metrics.set_gauge("chat_queue_depth", self._queued)
+            self._condition.notify()
+        return task.future
+
+    async def run(self, tenant: str, fn: Callable, *args, cost: float = 1.0) -> Any:
+        """Await fn(*args) on the fair pool from async code"""
+        return await asyncio.wrap_future(self.submit(tenant, fn, *args, cost=cost))
+
+    def _next_task(self) -> Optional[_Task]:
+        best: Optional[_TenantQueue] = None
+        for queue in self._tenants.values():
+            if queue.tasks and queue.running < self.tenant_cap:
+                if best is None or queue.tasks[0].start_tag < best.tasks[0].start_tag:
+                    best = queue
+        if best is None:
+            return None
+        task = best.tasks.popleft()
+        best.running += 1
+        self._virtual_time = max(self._virtual_time, task.start_tag)
+        return task
+
+    def _worker(self):
+        while True:
+            with self._condition:
+                task = self._next_task()
+                while task is None:
+                    if self._closed:
+                        return
+                    self._condition.wait()
+                    task = self._next_task()
+                self._queued -= 1
+                self._running += 1
+                metrics.set_gauge("chat_queue_depth", self._queued)
+                metrics.set_gauge("chat_executor_running", self._running)
+
+            metrics.observe("chat_queue_seconds", time.perf_counter() - task.enqueued, tenant=task.tenant)
+            if task.future.set_running_or_notify_cancel():
+                try:
+                    task.future.set_result(task.fn(*task.args))
+                except Exception as exc:
+                    task.future.set_exception(exc)
+
+            with self._condition:
+                self._running -= 1
+                queue = self._tenants[task.tenant]
+                queue.running -= 1
+                idle = not queue.tasks and queue.running == 0
+                if idle and (queue.finish_tag <= self._virtual_time or self._queued == 0):
+                    # Idle tenants start again from the current virtual time; drop their state
+                    del self._tenants[task.tenant]
+                metrics.set_gauge("chat_executor_running", self._running)
+                # A slot under this tenant's cap may have unblocked one of its queued tasks
+                self._condition.notify()
+
+    def queue_per_worker(self) -> float:
+        """Queued tasks per worker thread; a cheap load signal (read without the lock)"""
+        return self._queued / float(self.workers)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._condition:
+            return {
+                "workers": self.workers,
+                "tenant_cap": self.tenant_cap,
+                "queued": self._queued,
+                "running": self._running,
+                "tenants": {
+                    tenant: {"queued": len(queue.tasks), "running": queue.running, "plan": self.plan_for(tenant)}
+                    for tenant, queue in self._tenants.items()
+                },
+            }
+
+    def shutdown(self, timeout: float = 5.0):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+
+
+def create_chat_executor() -> FairChatExecutor:
+    """Build the executor from the CHAT_* scheduling environment variables"""
+    return FairChatExecutor(
+        workers=int(os.getenv("CHAT_WORKERS", "16")),
+        plan_weights=parse_plan_weights(os.getenv("CHAT_PLAN_WEIGHTS", "free=1,starter=2,pro=4,enterprise=8")),
+        default_weight=float(os.getenv("CHAT_DEFAULT_WEIGHT", "1")),
+        max_tenant_share=float(os.getenv("CHAT_MAX_TENANT_SHARE", "0.5")),
+        tenant_plans=load_tenant_plans()
+    )
@@ -0,0 +1,119 @@
+# BOT/inference_batcher.py - Cross-request micro-batching for model inference
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+from bot_metrics import metrics
+
+INFERENCE_BATCHING_ENABLED = os.getenv("INFERENCE_BATCHING_ENABLED", "true").strip().lower() in {"1", "true", "yes"}
+INFERENCE_BATCH_WINDOW_MS = float(os.getenv("INFERENCE_BATCH_WINDOW_MS", "2"))
+# Upper bounds in items: texts for the embedder, (query, passage) pairs for the reranker
+INFERENCE_MAX_BATCH_EMBED = int(os.getenv("INFERENCE_MAX_BATCH_EMBED", "256"))
+INFERENCE_MAX_BATCH_RERANK = int(os.getenv("INFERENCE_MAX_BATCH_RERANK", "512"))
+
+
+class MicroBatcher:
+    """Runs one model call for work submitted concurrently by many requests.
+
+    Callers block in ``submit`` while a single worker thread drains the queue.
+    Everything that arrived while the previous batch was running is taken at
+    once; if that is still below ``max_batch_size`` the worker waits up to
+    ``max_wait_ms`` for more. A caller's items are never split across batches,
+    so one oversized request simply runs as its own batch. ``fn`` receives the
+    concatenated items and must return one result per item in the same order.
+
+    The worker thread is started lazily and restarted after ``os.fork()``, so
+    models warmed up in a pre-fork parent are safe to use in workers.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[[List[Any]], Sequence[Any]],
+        max_batch_size: int = 64,
+        max_wait_ms: float = INFERENCE_BATCH_WINDOW_MS
+    ):
+        self.name = name
+        self.fn = fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._queue: "queue.Queue[Tuple[List[Any], Future, float]]" = queue.Queue()
+
+    def _ensure_worker(self):
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            # A fresh queue: anything inherited across fork belongs to the parent
+            self._queue = queue.Queue()
+            thread = threading.Thread(target=self._run, args=(self._queue,), name=f"batcher-{self.name}", daemon=True)
+            thread.start()
+            self._pid = pid
+
+    def submit(self, items: List[Any]) -> Sequence[Any]:
+        """Queue items for the next batch and wait for their results"""
+        if not items:
+            return self.fn([])
+        self._ensure_worker()
+        future: Future = Future()
+        self._queue.put((list(items), future, time.perf_counter()))
+        return future.result()
+
+    def _collect(self, work_queue: "queue.Queue", first: Tuple[List[Any], Future, float]):
+        """Build a batch starting with first; returns (batch, entry that didn't fit or None)"""
+        batch = [first]
+        size = len(first[0])
+        deadline = time.perf_counter() + self.max_wait
+        while size < self.max_batch_size:
+            try:
+                entry = work_queue.get_nowait()
+            except queue.Empty:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    entry = work_queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if size + len(entry[0]) > self.max_batch_size:
+                # Doesn't fit: it opens the next batch instead
+                return batch, entry
+            batch.append(entry)
+            size += len(entry[0])
+        return batch, None
+
+    def _run(self, work_queue: "queue.Queue"):
+        carry = None
+        while True:
+            first = carry if carry is not None else work_queue.get()
+            batch, carry = self._collect(work_queue, first)
+            self._execute(batch)
+
+    def _execute(self, batch: List[Tuple[List[Any], Future, float]]):
+        started = time.perf_counter()
+        flat: List[Any] = []
+        for items, _, enqueued in batch:
+            metrics.observe("inference_queue_wait_seconds", started - enqueued, model=self.name)
+            flat.extend(items)
+        metrics.observe("inference_batch_size", len(flat), model=self.name)
+        metrics.observe("inference_batch_requests", len(batch), model=self.name)
+        try:
+            results = self.fn(flat)
+        except Exception as exc:
+            for _, future, _ in batch:
+                future.set_exception(exc)
+            return
+        finally:
+            metrics.observe("inference_batch_seconds", time.perf_counter() - started, model=self.name)
+        offset = 0
+        for items, future, _ in batch:
+            future.set_result(results[offset:offset + len(items)])
+            offset += len(items)
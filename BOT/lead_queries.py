@@ -0,0 +1,114 @@
+# BOT/lead_queries.py - Keyset pagination, filters and projection for the leads collection
+
+import base64
+import datetime
+import json
+import re
+from typing import Any, Dict, Optional, Tuple
+
+# Leads are always ordered newest first; _id breaks ties between equal timestamps
+LEAD_SORT = [("created_at", -1), ("_id", -1)]
+
+_FIELD_NAME = re.compile(r"^[A-Za-z][A-Za-z0-9_]*$")
+
+
+def parse_lead_fields(fields: Optional[str]) -> Tuple[Optional[Dict[str, int]], bool]:
+    """Turn 'name,email' into a Mongo projection (None = every field).
+
+    Also returns whether created_at must be dropped from results because it
+    was only added to the projection to build the next cursor.
+    """
+    if not fields:
+        return None, False
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    invalid = [name for name in names if not _FIELD_NAME.match(name)]
+    if invalid:
+        raise ValueError(f"Invalid lead field name(s): {', '.join(invalid)}")
+    projection = {name: 1 for name in names}
+    drop_created_at = "created_at" not in projection
+    projection["created_at"] = 1
+    return projection, drop_created_at
+
+
+def parse_lead_timestamp(value: Optional[str], label: str) -> Optional[datetime.datetime]:
+    """Parse an ISO-8601 date or datetime into naive UTC (how leads are stored)"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except ValueError:
+        raise ValueError(f"{label} must be an ISO-8601 date or datetime")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def build_lead_filter(
+    status: Optional[str] = None,
+    created_after: Optional[datetime.datetime] = None,
+    created_before: Optional[datetime.datetime] = None
+) -> Dict[str, Any]:
+    query: Dict[str, Any] = {}
+    if status:
+        statuses = [item.strip() for item in status.split(",") if item.strip()]
+        query["status"] = statuses[0] if len(statuses) == 1 else {"$in": statuses}
+    created: Dict[str, Any] = {}
+    if created_after is not None:
+        created["$gte"] = created_after
+    if created_before is not None:
+        created["$lt"] = created_before
+    if created:
+        query["created_at"] = created
+    return query
+
+
+def encode_lead_cursor(lead: Dict[str, Any]) -> str:
+    """Opaque cursor pointing just past this lead in (created_at, _id) order"""
+    created_at = lead.get("created_at")
+    payload = {
+        "c": created_at.isoformat() if isinstance(created_at, datetime.datetime) else None,
+        "i": str(lead["_id"]),
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_lead_cursor(cursor: str) -> Tuple[Optional[datetime.datetime], Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        created_at = datetime.datetime.fromisoformat(payload["c"]) if payload.get("c") else None
+        from bson import ObjectId  # ships with pymongo
+        return created_at, ObjectId(payload["i"])
+    except Exception:
+        raise ValueError("Invalid or corrupted cursor")
+
+
+def apply_lead_cursor(query: Dict[str, Any], cursor: Optional[str]) -> Dict[str, Any]:
+    """AND the keyset condition 'strictly after the cursor' onto query"""
+    if not cursor:
+        return query
+    created_at, object_id = decode_lead_cursor(cursor)
+    if created_at is None:
+        # Legacy leads without created_at sort last; page through them by _id only
+        after = {"created_at": None, "_id": {"$lt": object_id}}
+    else:
+        after = {"$or": [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "_id": {"$lt": object_id}},
+            {"created_at": None},
+        ]}
+    return {"$and": [query, after]} if query else after
+
+
+def serialize_lead(lead: Dict[str, Any]) -> Dict[str, Any]:
+    """Make a lead document JSON-safe (ObjectId -> str, datetimes -> ISO strings)"""
+    output = {}
+    for key, value in lead.items():
+        if isinstance(value, datetime.datetime):
+            output[key] = value.isoformat()
+        elif key == "_id" or type(value).__name__ == "ObjectId":
+            output[key] = str(value)
+        else:
+            output[key] = value
+    return output
@@ -0,0 +1,298 @@
+# BOT/lead_store.py - Per-database MongoDB leads storage, connected lazily and shared across tenants
+
+import datetime
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from lead_queries import (
+    LEAD_SORT,
+    apply_lead_cursor,
+    build_lead_filter,
+    encode_lead_cursor,
+    parse_lead_fields,
+    parse_lead_timestamp,
+    serialize_lead,
+)
+
+# MongoDB imports are optional; gracefully degrade when unavailable.
+try:
+    from pymongo import MongoClient  # type: ignore
+    from pymongo.uri_parser import parse_uri  # type: ignore
+    from pymongo.errors import DuplicateKeyError, ServerSelectionTimeoutError  # type: ignore
+    PYMONGO_AVAILABLE = True
+except ImportError:
+    MongoClient = None  # type: ignore
+    parse_uri = None
+
+    class DuplicateKeyError(Exception):
+        """Fallback duplicate key error when pymongo is missing."""
+
+    class ServerSelectionTimeoutError(Exception):
+        """Fallback server timeout error when pymongo is missing."""
+
+    PYMONGO_AVAILABLE = False
+
+# After a failed connection, wait this long before trying again instead of stalling every request
+LEAD_STORE_RETRY_SECONDS = float(os.getenv("LEAD_STORE_RETRY_SECONDS", "30"))
+
+
+class TenantLeadStore:
+    """Leads collection for one MongoDB URI.
+
+    Construction does no I/O. The client is created, pinged and indexed on the
+    first access to ``collection``, so admin endpoints and chat sessions only
+    pay for Mongo when they actually read or write leads.
+    """
+
+    def __init__(self, mongo_uri: Optional[str] = None, label: Optional[str] = None):
+        self.label = label
+        self.enabled = PYMONGO_AVAILABLE and MongoClient is not None
+        self.mongo_client = None
+        self._collection = None
+        self._lock = threading.Lock()
+        self._retry_at = 0.0
+
+        if not self.enabled:
+            self.mongo_uri = None
+            self.database_name = None
+            print("ℹ️ pymongo not installed; lead storage features are disabled")
+            return
+
+        self.mongo_uri = mongo_uri or os.getenv("MONGODB_URI", "mongodb://localhost:27017")
+        self.database_name = None
+        try:
+            if parse_uri:
+                self.database_name = parse_uri(self.mongo_uri).get("database")
+        except Exception as uri_err:
+            print(f"⚠️ Unable to parse MongoDB URI for tenant {self.label}: {uri_err}")
+        if not self.database_name:
+            self.database_name = os.getenv("MONGODB_DATABASE", "rag_chatbot")
+
+    @property
+    def collection(self):
+        """The leads collection, connecting on first use; None when Mongo is unavailable"""
+        if not self.enabled:
+            return None
+        if self._collection is None and time.monotonic() >= self._retry_at:
+            with self._lock:
+                if self._collection is None and time.monotonic() >= self._retry_at:
+                    try:
+                        self._connect()
+                        print("✅ MongoDB leads database initialized successfully!")
+                    except Exception as e:
+                        print(f"❌ MongoDB initialization failed: {e}")
+                        self._retry_at = time.monotonic() + LEAD_STORE_RETRY_SECONDS
+        return self._collection
+
+    @property
+    def connected(self) -> bool:
+        return self._collection is not None
+
+    def _connect(self):
+        """Create the client, verify it and ensure the leads indexes exist"""
+        try:
+            print(f"🔄 Connecting to MongoDB at {self.mongo_uri} for tenant {self.label}...")
+            print(f"🎯 Target database: {self.database_name}")
+            client = MongoClient(
+                self.mongo_uri,
+                maxPoolSize=50,
+                minPoolSize=10,
+                maxIdleTimeMS=45000,
+                waitQueueTimeoutMS=5000,
+                serverSelectionTimeoutMS=5000,
+                connectTimeoutMS=10000,
+                socketTimeoutMS=20000,
+                retryWrites=True,
+                retryReads=True,
+                connect=False
+            )
+
+            # Test connection
+            client.admin.command('ping')
+            print("✅ MongoDB connection successful!")
+            print(f"📊 Pool config: maxPoolSize=50, minPoolSize=10")
+
+            leads_collection = client[self.database_name]['leads']
+
+            # Drop old problematic indexes if they exist
+            try:
+                leads_collection.drop_index("chatbot_session_email_idx")
+                print("✅ Dropped old session_email index")
+            except Exception as e:
+                print(f"ℹ️ No old index to drop: {e}")
+
+            # Drop the unique email index to allow duplicate emails
+            try:
+                leads_collection.drop_index("email_1")
+                print("✅ Dropped unique email_1 index - duplicate emails now allowed")
+            except Exception as e:
+                print(f"ℹ️ email_1 index not found or already dropped: {e}")
+
+            # Create indexes for better performance with unique names for chatbot
+            try:
+                leads_collection.create_index([("session_id", 1)], unique=True, name="chatbot_session_idx")
+                leads_collection.create_index("created_at", name="chatbot_created_at_idx")
+                # Keyset pagination / export order, optionally filtered by status
+                leads_collection.create_index(LEAD_SORT, name="chatbot_created_at_id_idx")
+                leads_collection.create_index([("status", 1)] + LEAD_SORT, name="chatbot_status_created_at_idx")
+            except Exception as index_error:
+                print(f"⚠️ Index creation warning: {index_error}")
+                # Continue anyway as indexes might already exist
+
+            self.mongo_client = client
+            self._collection = leads_collection
+            print(f"✅ MongoDB database '{self.database_name}' and 'leads' collection ready!")
+
+        except ServerSelectionTimeoutError:
+            print("❌ Could not connect to MongoDB server. Make sure MongoDB is running.")
+            raise
+        except Exception as e:
+            print(f"❌ MongoDB setup error: {e}")
+            print(f"🔍 MongoDB URI used: {self.mongo_uri}")
+            print(f"🔍 Database name used: {self.database_name}")
+            raise
+
+    def close(self):
+        """Properly close MongoDB connection pool"""
+        if self.mongo_client is not None:
+            try:
+                self.mongo_client.close()
+                print("✅ MongoDB connection pool closed successfully")
+            except Exception as e:
+                print(f"⚠️ Error closing MongoDB connection: {e}")
+            self.mongo_client = None
+            self._collection = None
+
+    def save_lead(self, leaddata: Dict):
+        """Save lead data to MongoDB"""
+        leads_collection = self.collection
+        if leads_collection is None:
+            print("ℹ️ Lead storage skipped because MongoDB is not available")
+            return
+
+        print(f"🔍 DATABASE DEBUG - About to save leaddata: {leaddata}")
+
+        try:
+            # Prepare document for MongoDB
+            lead_document = {
+                "name": leaddata["name"],
+                "phone": leaddata["phone"],
+                "email": leaddata["email"],
+                "original_question": leaddata["original_question"],
+                "session_id": leaddata.get("session_id"),
+                "created_at": datetime.datetime.utcnow(),
+                "source": "pricing_inquiry",
+                "status": "new",
+                "last_contact": datetime.datetime.utcnow()
+            }
+
+            # Insert the document
+            result = leads_collection.insert_one(lead_document)
+            print(f"✅ Lead saved to MongoDB with ID: {result.inserted_id}")
+
+        except DuplicateKeyError:
+            print(f"⚠️ Lead with email {leaddata['email']} already exists")
+            # Update existing lead instead
+            leads_collection.update_one(
+                {"email": leaddata["email"]},
+                {
+                    "$set": {
+                        "name": leaddata["name"],
+                        "phone": leaddata["phone"],
+                        "original_question": leaddata["original_question"],
+                        "session_id": leaddata.get("session_id"),
+                        "last_contact": datetime.datetime.utcnow(),
+                        "status": "updated"
+                    }
+                }
+            )
+            print(f"✅ Existing lead updated for email: {leaddata['email']}")
+        except Exception as e:
+            print(f"❌ Error saving lead to MongoDB: {e}")
+
+    def get_leads_page(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        fields: Optional[str] = None,
+        status: Optional[str] = None,
+        created_after: Optional[str] = None,
+        created_before: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """One page of leads, newest first, using keyset pagination on (created_at, _id).
+
+        Raises ValueError for malformed cursors, fields or dates.
+        """
+        projection, drop_created_at = parse_lead_fields(fields)
+        query = build_lead_filter(
+            status,
+            parse_lead_timestamp(created_after, "created_after"),
+            parse_lead_timestamp(created_before, "created_before")
+        )
+        query = apply_lead_cursor(query, cursor)
+        leads_collection = self.collection
+        if leads_collection is None:
+            return {"leads": [], "next_cursor": None}
+
+        # Fetch one extra document to learn whether another page exists
+        documents = list(leads_collection.find(query, projection).sort(LEAD_SORT).limit(limit + 1))
+        has_more = len(documents) > limit
+        documents = documents[:limit]
+        next_cursor = encode_lead_cursor(documents[-1]) if has_more else None
+
+        leads = []
+        for document in documents:
+            if drop_created_at:
+                document.pop("created_at", None)
+            leads.append(serialize_lead(document))
+        return {"leads": leads, "next_cursor": next_cursor}
+
+    def iter_leads(
+        self,
+        fields: Optional[str] = None,
+        status: Optional[str] = None,
+        created_after: Optional[str] = None,
+        created_before: Optional[str] = None,
+        batch_size: int = 500
+    ):
+        """Stream every matching lead through a server-side cursor, batch_size documents at a time.
+
+        Arguments are validated eagerly (ValueError) so callers can reject bad
+        input before a streaming response has started. The connection itself
+        is made on the first iteration.
+        """
+        projection, drop_created_at = parse_lead_fields(fields)
+        if projection is not None and drop_created_at:
+            projection.pop("created_at")
+        query = build_lead_filter(
+            status,
+            parse_lead_timestamp(created_after, "created_after"),
+            parse_lead_timestamp(created_before, "created_before")
+        )
+
+        def generate():
+            leads_collection = self.collection
+            if leads_collection is None:
+                return
+            cursor = leads_collection.find(query, projection).sort(LEAD_SORT).batch_size(batch_size)
+            try:
+                for document in cursor:
+                    yield serialize_lead(document)
+            finally:
+                cursor.close()
+
+        return generate()
+
+    def count(self) -> int:
+        """Get total count of leads in MongoDB"""
+        leads_collection = self.collection
+        if leads_collection is None:
+            return 0
+
+        try:
+            return leads_collection.count_documents({})
+        except Exception as e:
+            print(f"❌ Error getting leads count from MongoDB: {e}")
+            return 0
@@ -0,0 +1,240 @@
+# BOT/llm_gateway.py - Bounded, deadline-aware access to the LLM provider
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Dict, Optional
+
+from bot_metrics import metrics
+from llm_providers import LLMProvider
+
+
+class LLMOverloadedError(Exception):
+    """Raised when an LLM call is shed instead of queued or run to completion"""
+
+    def __init__(self, message: str, *, reason: str, status_code: int, retry_after: int):
+        super().__init__(message)
+        self.reason = reason
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class LLMGateway:
+    """Runs provider calls on a dedicated event loop with admission control.
+
+    Each call waits for a per-tenant slot and then a global slot. The number of
+    waiting calls is capped; beyond that, calls are rejected immediately (429).
+    Calls that can't get a slot before their deadline, or whose generation
+    outlives it, fail with 503. Both errors carry a Retry-After hint. A
+    tenant's semaphore is dropped once it has no waiting or running calls.
+
+    Only the provider call itself is asynchronous: the blocking ``generate()``
+    still parks its calling thread on the result for the whole call, so the
+    synchronous chat path holds a worker thread per generation and gets
+    admission control and deadlines from the gateway, not thread savings.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 8,
+        per_tenant_concurrency: int = 4,
+        max_queue: int = 64,
+        queue_timeout: float = 10.0,
+        generation_timeout: float = 30.0,
+        retry_after: int = 5
+    ):
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.per_tenant_concurrency = max(1, int(per_tenant_concurrency))
+        self.max_queue = max(0, int(max_queue))
+        self.queue_timeout = max(0.0, float(queue_timeout))
+        self.generation_timeout = max(0.1, float(generation_timeout))
+        self.retry_after = max(1, int(retry_after))
+
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+
+        # Owned by the gateway loop thread; created lazily so they bind to that loop
+        self._global: Optional[asyncio.Semaphore] = None
+        self._tenants: Dict[str, asyncio.Semaphore] = {}
+        # Waiting plus running calls per tenant, so idle tenants' semaphores can be pruned
+        self._tenant_calls: Dict[str, int] = {}
+        self._waiting = 0
+        self._inflight = 0
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+
+                def run():
+                    asyncio.set_event_loop(loop)
+                    loop.call_soon(ready.set)
+                    loop.run_forever()
+
+                thread = threading.Thread(target=run, name="llm-gateway", daemon=True)
+                thread.start()
+                ready.wait()
+                self._loop, self._thread = loop, thread
+            return self._loop
+
+    def close(self):
+        """Stop the gateway loop; in-flight calls are cancelled"""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None:
+            return
+        loop.call_soon_threadsafe(loop.stop)
+        if thread is not None:
+            thread.join(timeout=5)
+        loop.close()
+        self._global = None
+        self._tenants.clear()
+        self._tenant_calls.clear()
+        self._waiting = self._inflight = 0
+
+    def _shed(self, reason: str, status_code: int, message: str) -> LLMOverloadedError:
+        metrics.increment("llm_shed_total", reason=reason)
+        return LLMOverloadedError(message, reason=reason, status_code=status_code, retry_after=self.retry_after)
+
+    def _publish_gauges(self):
+        metrics.set_gauge("llm_queue_depth", self._waiting)
+        metrics.set_gauge("llm_inflight", self._inflight)
+
+    async def _acquire(self, tenant_slots: asyncio.Semaphore, deadline: float) -> bool:
+        """Take the tenant slot then the global slot; False if the deadline passes first"""
+        try:
+            await asyncio.wait_for(tenant_slots.acquire(), max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            return False
+        try:
+            await asyncio.wait_for(self._global.acquire(), max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            tenant_slots.release()
+            return False
+        except BaseException:
+            tenant_slots.release()
+            raise
+        return True
+
+    async def _run(self, provider: LLMProvider, prompt: str, tenant_id: str, deadline: float, options: Dict) -> str:
+        if self._global is None:
+            self._global = asyncio.Semaphore(self.max_concurrency)
+        tenant_slots = self._tenants.get(tenant_id)
+        if tenant_slots is None:
+            tenant_slots = self._tenants[tenant_id] = asyncio.Semaphore(self.per_tenant_concurrency)
+        self._tenant_calls[tenant_id] = self._tenant_calls.get(tenant_id, 0) + 1
+        try:
+            return await self._admit_and_generate(provider, prompt, tenant_slots, deadline, options)
+        finally:
+            remaining = self._tenant_calls[tenant_id] - 1
+            if remaining:
+                self._tenant_calls[tenant_id] = remaining
+            else:
+                del self._tenant_calls[tenant_id]
+                del self._tenants[tenant_id]
+
+    async def _admit_and_generate(
+        self,
+        provider: LLMProvider,
+        prompt: str,
+        tenant_slots: asyncio.Semaphore,
+        deadline: float,
+        options: Dict
+    ) -> str:
+        if self._waiting >= self.max_queue and (self._global.locked() or tenant_slots.locked()):
+            raise self._shed("queue_full", 429, "LLM request queue is full; retry shortly")
+
+        enqueued = time.monotonic()
+        queue_deadline = min(deadline, enqueued + self.queue_timeout)
+        self._waiting += 1
+        self._publish_gauges()
+        try:
+            acquired = await self._acquire(tenant_slots, queue_deadline)
+        finally:
+            self._waiting -= 1
+            self._publish_gauges()
+        metrics.observe("llm_queue_seconds", time.monotonic() - enqueued, provider=provider.name)
+        if not acquired:
+            raise self._shed("queue_timeout", 503, "Timed out waiting for LLM capacity")
+
+        self._inflight += 1
+        self._publish_gauges()
+        started = time.monotonic()
+        try:
+            budget = min(self.generation_timeout, deadline - started)
+            if budget <= 0:
+                raise self._shed("deadline_exceeded", 503, "Request deadline passed before generation started")
+            try:
+                return await asyncio.wait_for(provider.generate_async(prompt, **options), budget)
+            except asyncio.TimeoutError:
+                raise self._shed("generation_timeout", 503, "LLM provider did not respond in time") from None
+        finally:
+            metrics.observe("llm_generation_seconds", time.monotonic() - started, provider=provider.name)
+            self._inflight -= 1
+            self._global.release()
+            tenant_slots.release()
+            self._publish_gauges()
+
+    def generate(
+        self,
+        provider: LLMProvider,
+        prompt: str,
+        *,
+        tenant_id: Optional[str] = None,
+        deadline: Optional[float] = None,
+        **options
+    ) -> str:
+        """Blocking entry point for worker threads; deadline is a time.monotonic() value"""
+        if deadline is None:
+            deadline = time.monotonic() + self.queue_timeout + self.generation_timeout
+        loop = self._ensure_loop()
+        future = asyncio.run_coroutine_threadsafe(
+            self._run(provider, prompt, tenant_id or "default", deadline, options),
+            loop
+        )
+        try:
+            # Small grace period so the loop-side timeout (with its metrics) normally fires first
+            return future.result(timeout=max(0.0, deadline - time.monotonic()) + 1.0)
+        except FutureTimeoutError:
+            future.cancel()
+            raise self._shed("deadline_exceeded", 503, "LLM call exceeded the request deadline") from None
+
+
+_gateway_lock = threading.Lock()
+_shared_gateway: Optional[LLMGateway] = None
+
+
+def create_llm_gateway() -> LLMGateway:
+    """Build a gateway from the LLM_* admission-control environment variables"""
+    return LLMGateway(
+        max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "8")),
+        per_tenant_concurrency=int(os.getenv("LLM_TENANT_MAX_CONCURRENCY", "4")),
+        max_queue=int(os.getenv("LLM_MAX_QUEUE", "64")),
+        queue_timeout=float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", "10")),
+        generation_timeout=float(os.getenv("LLM_TIMEOUT_SECONDS", "30")),
+        retry_after=int(os.getenv("LLM_RETRY_AFTER_SECONDS", "5"))
+    )
+
+
+def get_llm_gateway() -> LLMGateway:
+    """Return the process-wide gateway, creating it on first use"""
+    global _shared_gateway
+    if _shared_gateway is None:
+        with _gateway_lock:
+            if _shared_gateway is None:
+                _shared_gateway = create_llm_gateway()
+    return _shared_gateway
+
+
+def shutdown_llm_gateway() -> None:
+    """Stop the process-wide gateway loop (called on application shutdown)"""
+    global _shared_gateway
+    with _gateway_lock:
+        gateway, _shared_gateway = _shared_gateway, None
+    if gateway is not None:
+        gateway.close()
@@ -0,0 +1,187 @@
+# BOT/llm_providers.py - Pluggable LLM backends for answer synthesis
+
+import abc
+import asyncio
+import hashlib
+import os
+import random
+import re
+import threading
+import time
+from typing import Optional
+
+# Gemini SDK is optional so the bot can run fully offline with the stub provider.
+try:
+    import google.generativeai as genai  # type: ignore
+    GENAI_AVAILABLE = True
+except ImportError:
+    genai = None  # type: ignore
+    GENAI_AVAILABLE = False
+
+
+class LLMProvider(abc.ABC):
+    """Interface every answer-generation backend implements"""
+
+    name = "base"
+
+    @abc.abstractmethod
+    def generate(self, prompt: str, *, temperature: float = 0.3, top_p: float = 0.8, top_k: int = 50) -> str:
+        """Blocking completion of prompt"""
+
+    async def generate_async(self, prompt: str, *, temperature: float = 0.3, top_p: float = 0.8, top_k: int = 50) -> str:
+        """Non-blocking variant; backends without a native async client fall back to a worker thread"""
+        return await asyncio.to_thread(self.generate, prompt, temperature=temperature, top_p=top_p, top_k=top_k)
+
+
+class GeminiProvider(LLMProvider):
+    """Google Gemini backend (requires google-generativeai and GOOGLE_API_KEY)"""
+
+    name = "gemini"
+
+    def __init__(self, model_name: str = "gemini-2.5-flash", api_key: Optional[str] = None):
+        if not GENAI_AVAILABLE:
+            raise RuntimeError("google-generativeai is not installed; set LLM_PROVIDER=stub to run offline")
+
+        api_key = api_key or os.getenv("GOOGLE_API_KEY")
+        if not api_key:
+            raise ValueError("GOOGLE_API_KEY not found in environment variables")
+
+        genai.configure(api_key=api_key)
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name)
+
+    @staticmethod
+    def _config(temperature: float, top_p: float, top_k: int):
+        return genai.types.GenerationConfig(
+            temperature=temperature,
+            top_p=top_p,
+            top_k=top_k
+        )
+
+    def generate(self, prompt: str, *, temperature: float = 0.3, top_p: float = 0.8, top_k: int = 50) -> str:
+        response = self.model.generate_content(prompt, generation_config=self._config(temperature, top_p, top_k))
+        return response.text.strip() if response and response.text else ""
+
+    async def generate_async(self, prompt: str, *, temperature: float = 0.3, top_p: float = 0.8, top_k: int = 50) -> str:
+        response = await self.model.generate_content_async(prompt, generation_config=self._config(temperature, top_p, top_k))
+        return response.text.strip() if response and response.text else ""
+
+
+class StubLLMProvider(LLMProvider):
+    """Deterministic local backend for offline load tests and profiling.
+
+    Latency and response text are derived from a hash of the prompt and seed, so
+    the same prompt always produces the same answer after the same delay.
+    """
+
+    name = "stub"
+
+    DISTRIBUTIONS = {"fixed", "uniform", "normal", "lognormal"}
+
+    def __init__(
+        self,
+        latency_distribution: str = "fixed",
+        latency_ms: float = 0.0,
+        latency_jitter_ms: float = 0.0,
+        response_chars: int = 320,
+        seed: int = 0
+    ):
+        distribution = (latency_distribution or "fixed").lower()
+        if distribution not in self.DISTRIBUTIONS:
+            raise ValueError(f"Unknown stub latency distribution '{latency_distribution}'")
+        self.latency_distribution = distribution
+        self.latency_ms = max(0.0, float(latency_ms))
+        self.latency_jitter_ms = max(0.0, float(latency_jitter_ms))
+        self.response_chars = max(1, int(response_chars))
+        self.seed = int(seed)
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _rng(self, prompt: str) -> random.Random:
+        digest = hashlib.sha256(f"{self.seed}:{prompt}".encode("utf-8")).hexdigest()
+        return random.Random(int(digest[:16], 16))
+
+    def sample_latency_seconds(self, rng: random.Random) -> float:
+        mean, jitter = self.latency_ms, self.latency_jitter_ms
+        if self.latency_distribution == "uniform":
+            value = rng.uniform(mean - jitter, mean + jitter)
+        elif self.latency_distribution == "normal":
+            value = rng.gauss(mean, jitter)
+        elif self.latency_distribution == "lognormal" and mean > 0:
+            # Parameterise so the median equals latency_ms and jitter widens the tail
+            sigma = jitter / mean if jitter else 0.0
+            value = mean * rng.lognormvariate(0.0, sigma)
+        else:
+            value = mean
+        return max(0.0, value) / 1000.0
+
+    def generate(self, prompt: str, *, temperature: float = 0.3, top_p: float = 0.8, top_k: int = 50) -> str:
+        rng = self._rng(prompt)
+        delay = self.sample_latency_seconds(rng)
+        if delay:
+            time.sleep(delay)
+        return self._compose(prompt, rng)
+
+    async def generate_async(self, prompt: str, *, temperature: float = 0.3, top_p: float = 0.8, top_k: int = 50) -> str:
+        rng = self._rng(prompt)
+        delay = self.sample_latency_seconds(rng)
+        if delay:
+            await asyncio.sleep(delay)
+        return self._compose(prompt, rng)
+
+    def _compose(self, prompt: str, rng: random.Random) -> str:
+        with self._lock:
+            self.calls += 1
+
+        # Build a plausible answer from the prompt's own vocabulary
+        words = re.findall(r"[A-Za-z][A-Za-z'-]{2,}", prompt) or ["stub"]
+        parts = []
+        length = 0
+        while length < self.response_chars:
+            word = words[rng.randrange(len(words))]
+            parts.append(word)
+            length += len(word) + 1
+        answer = " ".join(parts)
+        if len(answer) > self.response_chars:
+            answer = answer[:self.response_chars].rsplit(" ", 1)[0] or answer[:self.response_chars]
+        return answer[0].upper() + answer[1:] + "."
+
+
+_provider_lock = threading.Lock()
+_shared_provider: Optional[LLMProvider] = None
+
+
+def create_llm_provider(provider_name: Optional[str] = None) -> LLMProvider:
+    """Build the provider selected by LLM_PROVIDER (gemini by default)"""
+    provider_name = (provider_name or os.getenv("LLM_PROVIDER", "gemini")).strip().lower()
+
+    if provider_name == "gemini":
+        return GeminiProvider(model_name=os.getenv("GEMINI_MODEL", "gemini-2.5-flash"))
+
+    if provider_name == "stub":
+        return StubLLMProvider(
+            latency_distribution=os.getenv("LLM_STUB_LATENCY_DISTRIBUTION", "fixed"),
+            latency_ms=float(os.getenv("LLM_STUB_LATENCY_MS", "0")),
+            latency_jitter_ms=float(os.getenv("LLM_STUB_LATENCY_JITTER_MS", "0")),
+            response_chars=int(os.getenv("LLM_STUB_RESPONSE_CHARS", "320")),
+            seed=int(os.getenv("LLM_STUB_SEED", "0"))
+        )
+
+    raise ValueError(f"Unknown LLM_PROVIDER '{provider_name}' (expected 'gemini' or 'stub')")
+
+
+def get_llm_provider() -> LLMProvider:
+    """Return the process-wide provider, creating it on first use"""
+    global _shared_provider
+    if _shared_provider is None:
+        with _provider_lock:
+            if _shared_provider is None:
+                _shared_provider = create_llm_provider()
+    return _shared_provider
+
+
+def set_llm_provider(provider: Optional[LLMProvider]) -> None:
+    """Override the process-wide provider (used by benchmarks and tests)"""
+    global _shared_provider
+    with _provider_lock:
+        _shared_provider = provider
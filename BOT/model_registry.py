@@ -0,0 +1,66 @@
+# BOT/model_registry.py - Process-wide model instances shared by every tenant (and, pre-fork, every worker)
+
+import threading
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from embedding_engine import DEFAULT_EMBEDDING_MODEL, get_embedding_engine
+from inference_batcher import INFERENCE_BATCHING_ENABLED, INFERENCE_MAX_BATCH_RERANK, MicroBatcher
+
+DEFAULT_RERANKER_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+
+class BatchedCrossEncoder:
+    """CrossEncoder front whose predict() joins concurrent callers into shared batches"""
+
+    def __init__(self, model):
+        self.model = model
+        self._batcher = MicroBatcher("reranker", self._predict_batch, max_batch_size=INFERENCE_MAX_BATCH_RERANK)
+
+    def _predict_batch(self, pairs: List[Tuple[str, str]]) -> np.ndarray:
+        return np.asarray(self.model.predict(pairs, batch_size=64))
+
+    def predict(self, pairs: Sequence[Tuple[str, str]], batch_size: int = 64) -> np.ndarray:
+        # batch_size is kept for CrossEncoder compatibility; the batcher decides real batch sizes
+        if not pairs:
+            return np.zeros(0, dtype=np.float32)
+        return self._batcher.submit(list(pairs))
+
+
+_reranker_lock = threading.Lock()
+_rerankers: Dict[str, Any] = {}
+
+
+def get_reranker(model_name: str = DEFAULT_RERANKER_MODEL):
+    """Return the shared (micro-batched) CrossEncoder for model_name, loading it once per process"""
+    reranker = _rerankers.get(model_name)
+    if reranker is None:
+        with _reranker_lock:
+            reranker = _rerankers.get(model_name)
+            if reranker is None:
+                from sentence_transformers import CrossEncoder
+
+                print(f"🔄 Loading shared cross-encoder reranker: {model_name}")
+                model = CrossEncoder(model_name)
+                reranker = _rerankers[model_name] = BatchedCrossEncoder(model) if INFERENCE_BATCHING_ENABLED else model
+                print(f"✅ Shared reranker loaded: {model_name}")
+    return reranker
+
+
+def preload_models(
+    embedding_model: str = DEFAULT_EMBEDDING_MODEL,
+    reranker_model: str = DEFAULT_RERANKER_MODEL,
+    warmup: bool = True
+) -> Dict[str, Any]:
+    """Load (and optionally exercise) every shared model so later users find them resident.
+
+    The warm-up pass builds tokenizer caches and lazily-initialised buffers up
+    front, so that state is also created once instead of per worker.
+    """
+    engine = get_embedding_engine(embedding_model)
+    reranker = get_reranker(reranker_model)
+    if warmup:
+        engine.encode(["warm up the query encoder"])
+        reranker.predict([("warm up", "the cross-encoder reranker")], batch_size=1)
+    return {"embedding_engine": engine, "reranker": reranker}
@@ -0,0 +1,127 @@
+# BOT/quality_tiers.py - Load-aware retrieval quality tiers (full -> reduced -> minimal)
+
+import collections
+import os
+import threading
+import time
+from typing import Any, Callable, Deque, Dict, Optional
+
+from bot_metrics import metrics
+
+QUALITY_TIERS = ("full", "reduced", "minimal")
+
+# What each tier runs on top of the tenant's retrieval plan (see RetrievalPlan.for_tier).
+# rerank_limit caps how many retrieved candidates reach scoring.
+TIER_SETTINGS: Dict[str, Dict[str, Any]] = {
+    # The whole plan: every retrieval stage, cross-encoder over all candidates
+    "full": {"expansions": True, "text_passes": True, "rerank_limit": None, "cross_encoder": True},
+    # Skip expansion stages and score a shorter candidate list
+    "reduced": {"expansions": False, "text_passes": True, "rerank_limit": 60, "cross_encoder": True},
+    # Required dense searches only, ordered by vector distance, no cross-encoder
+    "minimal": {"expansions": False, "text_passes": False, "rerank_limit": 40, "cross_encoder": False},
+}
+
+
+class LoadMonitor:
+    """Picks a quality tier from chat queue depth and recent end-to-end latency.
+
+    A tier is raised as soon as either signal crosses its threshold. It is only
+    lowered after the lighter tier has been indicated for ``hold_seconds``,
+    so the system doesn't flap at the boundary.
+    """
+
+    def __init__(
+        self,
+        latency_slo_seconds: float = 3.0,
+        reduced_queue_per_worker: float = 1.0,
+        minimal_queue_per_worker: float = 4.0,
+        window: int = 50,
+        hold_seconds: float = 5.0,
+        enabled: bool = True
+    ):
+        self.latency_slo = float(latency_slo_seconds)
+        self.reduced_queue = float(reduced_queue_per_worker)
+        self.minimal_queue = float(minimal_queue_per_worker)
+        self.hold_seconds = float(hold_seconds)
+        self.enabled = enabled
+        self._latencies: Deque[float] = collections.deque(maxlen=max(1, window))
+        self._queue_source: Optional[Callable[[], float]] = None
+        self._lock = threading.Lock()
+        self._level = 0
+        self._lower_since: Optional[float] = None
+
+    def attach_queue(self, source: Optional[Callable[[], float]]):
+        """source() returns queued chat tasks per worker"""
+        self._queue_source = source
+
+    def observe_latency(self, seconds: float):
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def _recent_p90(self) -> float:
+        if not self._latencies:
+            return 0.0
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(0.9 * (len(ordered) - 1) + 0.5))]
+
+    def _indicated_level(self) -> int:
+        queue = self._queue_source() if self._queue_source else 0.0
+        p90 = self._recent_p90()
+        if queue >= self.minimal_queue or (self.latency_slo > 0 and p90 > 2 * self.latency_slo):
+            return 2
+        if queue >= self.reduced_queue or (self.latency_slo > 0 and p90 > self.latency_slo):
+            return 1
+        return 0
+
+    def current_tier(self) -> str:
+        if not self.enabled:
+            return "full"
+        now = time.monotonic()
+        with self._lock:
+            indicated = self._indicated_level()
+            if indicated >= self._level:
+                self._level = indicated
+                self._lower_since = None
+            elif self._lower_since is None:
+                self._lower_since = now
+            elif now - self._lower_since >= self.hold_seconds:
+                self._level -= 1
+                self._lower_since = now if indicated < self._level else None
+            level = self._level
+        metrics.set_gauge("quality_tier_level", level)
+        return QUALITY_TIERS[level]
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "tier": QUALITY_TIERS[self._level],
+                "recent_p90_seconds": round(self._recent_p90(), 4),
+                "queue_per_worker": round(self._queue_source(), 3) if self._queue_source else 0.0,
+            }
+
+
+_monitor_lock = threading.Lock()
+_shared_monitor: Optional[LoadMonitor] = None
+
+
+def create_load_monitor() -> LoadMonitor:
+    """Build a monitor from the QUALITY_* environment variables"""
+    return LoadMonitor(
+        latency_slo_seconds=float(os.getenv("QUALITY_LATENCY_SLO_SECONDS", "3")),
+        reduced_queue_per_worker=float(os.getenv("QUALITY_REDUCED_QUEUE_PER_WORKER", "1")),
+        minimal_queue_per_worker=float(os.getenv("QUALITY_MINIMAL_QUEUE_PER_WORKER", "4")),
+        window=int(os.getenv("QUALITY_LATENCY_WINDOW", "50")),
+        hold_seconds=float(os.getenv("QUALITY_TIER_HOLD_SECONDS", "5")),
+        enabled=os.getenv("QUALITY_TIERS_ENABLED", "true").strip().lower() in {"1", "true", "yes"}
+    )
+
+
+def get_load_monitor() -> LoadMonitor:
+    """Return the process-wide monitor, creating it on first use"""
+    global _shared_monitor
+    if _shared_monitor is None:
+        with _monitor_lock:
+            if _shared_monitor is None:
+                _shared_monitor = create_load_monitor()
+    return _shared_monitor
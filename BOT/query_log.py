@@ -0,0 +1,168 @@
+# BOT/query_log.py - Opt-in, anonymised per-tenant query capture written off the request path
+
+import hashlib
+import hmac
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from bot_metrics import metrics
+
+BOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_EMAIL = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
+_PHONE = re.compile(r"(?<!\w)\+?\d[\d\s().-]{6,}\d(?!\w)")
+_LONG_NUMBER = re.compile(r"\d{5,}")
+_UNSAFE_PATH = re.compile(r"[^A-Za-z0-9._-]+")
+
+# Turns whose text is the user's own details rather than a question
+_PERSONAL_ROUTES = {"name_collection", "lead_capture", "lead_collection"}
+
+
+def anonymize_query(text: str) -> str:
+    """Mask emails, phone numbers and long digit runs"""
+    text = _EMAIL.sub("<email>", text)
+    text = _PHONE.sub("<phone>", text)
+    return _LONG_NUMBER.sub("<number>", text)
+
+
+class QueryLog:
+    """Non-blocking query log: callers enqueue, one daemon thread writes JSON lines.
+
+    Each tenant gets its own size-rotated file under ``directory``, one per
+    process (``queries-<pid>.jsonl``): RotatingFileHandler is not safe with
+    several processes writing and rotating one file, as pre-fork workers
+    would. When the queue is full records are dropped (and counted) rather
+    than slowing chat.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int = 10 * 1024 * 1024,
+        backup_count: int = 5,
+        max_queue: int = 10000,
+        salt: str = ""
+    ):
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._salt = salt.encode("utf-8")
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=max(1, max_queue))
+        self._handlers: Dict[str, logging.handlers.RotatingFileHandler] = {}
+        self._thread = threading.Thread(target=self._run, name="query-log", daemon=True)
+        self._thread.start()
+
+    def _session_token(self, session_id: str) -> str:
+        return hmac.new(self._salt, session_id.encode("utf-8"), hashlib.sha256).hexdigest()[:16]
+
+    def record(
+        self,
+        *,
+        tenant: str,
+        session_id: str,
+        question: str,
+        trace: Dict[str, Any],
+        candidate_ids: Optional[List[str]] = None,
+        vector_store_path: Optional[str] = None
+    ):
+        route = trace.get("route", "unknown")
+        entry = {
+            "ts": round(time.time(), 6),
+            "tenant": tenant,
+            "vector_store_path": vector_store_path,
+            "session": self._session_token(session_id),
+            "query": "<redacted>" if route in _PERSONAL_ROUTES else anonymize_query(question),
+            "route": route,
+            "candidate_ids": list(candidate_ids or []),
+            "timings_ms": trace.get("timings_ms", {}),
+            "total_ms": trace.get("total_ms"),
+        }
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            metrics.increment("query_log_dropped_total")
+
+    def _handler(self, tenant: str) -> logging.handlers.RotatingFileHandler:
+        handler = self._handlers.get(tenant)
+        if handler is None:
+            tenant_dir = os.path.join(self.directory, _UNSAFE_PATH.sub("_", tenant) or "unknown")
+            os.makedirs(tenant_dir, exist_ok=True)
+            handler = logging.handlers.RotatingFileHandler(
+                os.path.join(tenant_dir, f"queries-{os.getpid()}.jsonl"),
+                maxBytes=self.max_bytes,
+                backupCount=self.backup_count,
+                encoding="utf-8"
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self._handlers[tenant] = handler
+        return handler
+
+    def _run(self):
+        while True:
+            entry = self._queue.get()
+            if entry is None:
+                break
+            try:
+                line = json.dumps(entry, separators=(",", ":"), default=str)
+                self._handler(entry["tenant"]).emit(logging.makeLogRecord({"msg": line}))
+                metrics.increment("query_log_written_total")
+            except Exception as e:
+                metrics.increment("query_log_errors_total")
+                print(f"⚠️ Query log write failed: {e}")
+
+    def close(self, timeout: float = 5.0):
+        """Flush queued records and close the files"""
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout=timeout)
+        for handler in self._handlers.values():
+            handler.close()
+        self._handlers.clear()
+
+
+_query_log_lock = threading.Lock()
+_shared_query_log: Optional[QueryLog] = None
+_query_log_resolved = False
+
+
+def create_query_log() -> Optional[QueryLog]:
+    """Build the log from QUERY_LOG_* environment variables; None unless enabled"""
+    if os.getenv("QUERY_LOG_ENABLED", "false").strip().lower() not in {"1", "true", "yes"}:
+        return None
+    return QueryLog(
+        directory=os.getenv("QUERY_LOG_DIR", os.path.join(BOT_DIR, "query_logs")),
+        max_bytes=int(os.getenv("QUERY_LOG_MAX_BYTES", str(10 * 1024 * 1024))),
+        backup_count=int(os.getenv("QUERY_LOG_BACKUP_COUNT", "5")),
+        max_queue=int(os.getenv("QUERY_LOG_QUEUE_SIZE", "10000")),
+        salt=os.getenv("QUERY_LOG_SALT", "")
+    )
+
+
+def get_query_log() -> Optional[QueryLog]:
+    """Return the process-wide query log, or None when capture is disabled"""
+    global _shared_query_log, _query_log_resolved
+    if not _query_log_resolved:
+        with _query_log_lock:
+            if not _query_log_resolved:
+                _shared_query_log = create_query_log()
+                _query_log_resolved = True
+    return _shared_query_log
+
+
+def shutdown_query_log() -> None:
+    """Flush and close the process-wide query log (called on application shutdown)"""
+    global _shared_query_log, _query_log_resolved
+    with _query_log_lock:
+        query_log, _shared_query_log = _shared_query_log, None
+        _query_log_resolved = False
+    if query_log is not None:
+        query_log.close()
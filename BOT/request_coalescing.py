@@ -0,0 +1,84 @@
+# BOT/request_coalescing.py - Single-flight de-duplication of identical in-flight work
+
+import re
+import threading
+from concurrent.futures import Future, wait
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from bot_metrics import metrics
+
+
+class WaitTimeout(TimeoutError):
+    """A follower's timeout expired before the leader finished"""
+
+
+# Set on the leader's future when its result must not be handed to followers
+_NOT_SHARED = object()
+
+
+def normalize_query_key(question: str) -> str:
+    """Case-, whitespace- and trailing-punctuation-insensitive key for a question"""
+    collapsed = re.sub(r"\s+", " ", (question or "").strip().lower())
+    return collapsed.rstrip("?.!,; ")
+
+
+class SingleFlight:
+    """Run fn once per key among concurrent callers; the others wait for its result.
+
+    The first caller (the leader) executes the work on its own thread. Callers
+    arriving while it runs block on the same future and receive the same result
+    or exception. The key is released as soon as the leader finishes, so later
+    calls always recompute.
+
+    Followers wait at most ``timeout`` seconds and then raise WaitTimeout. If
+    ``shareable`` rejects the leader's result (e.g. the leader's own deadline
+    cut work short), each follower runs fn itself instead of inheriting it.
+    """
+
+    def __init__(self, name: str = "default"):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+
+    def do(
+        self,
+        key: Hashable,
+        fn: Callable[[], Any],
+        timeout: Optional[float] = None,
+        shareable: Optional[Callable[[Any], bool]] = None
+    ) -> Tuple[Any, bool]:
+        """Return (result, shared) where shared is True for callers that did not run fn"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = Future()
+                self._calls[key] = call
+
+        if not leader:
+            if not wait([call], timeout=timeout).done:
+                metrics.increment("single_flight_wait_timeout_total", scope=self.name)
+                raise WaitTimeout(f"gave up waiting for in-flight call after {timeout:.2f}s")
+            result = call.result()
+            if result is _NOT_SHARED:
+                metrics.increment("single_flight_unshared_total", scope=self.name)
+                return fn(), False
+            metrics.increment("single_flight_coalesced_total", scope=self.name)
+            return result, True
+
+        metrics.increment("single_flight_leader_total", scope=self.name)
+        try:
+            result = fn()
+        except BaseException as exc:
+            call.set_exception(exc)
+            raise
+        else:
+            call.set_result(result if shareable is None or shareable(result) else _NOT_SHARED)
+            return result, False
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
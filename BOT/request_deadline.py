@@ -0,0 +1,87 @@
+# BOT/request_deadline.py - End-to-end time budgets for chat requests
+
+import os
+import threading
+import time
+from typing import List, Optional
+
+from bot_metrics import metrics
+
+# Budget for a chat turn when the caller doesn't send X-Request-Timeout-Ms, and the upper bound
+CHAT_REQUEST_TIMEOUT_SECONDS = float(os.getenv("CHAT_REQUEST_TIMEOUT_SECONDS", "25"))
+CHAT_REQUEST_MAX_TIMEOUT_SECONDS = float(os.getenv("CHAT_REQUEST_MAX_TIMEOUT_SECONDS", "120"))
+# Time kept back for the LLM when deciding how much rerank still fits
+DEADLINE_GENERATION_RESERVE_SECONDS = float(os.getenv("DEADLINE_GENERATION_RESERVE_SECONDS", "3"))
+# Below this much remaining budget the LLM call is skipped and a partial answer returned
+DEADLINE_MIN_GENERATION_SECONDS = float(os.getenv("DEADLINE_MIN_GENERATION_SECONDS", "1"))
+
+DEADLINE_HEADER = "x-request-timeout-ms"
+
+
+class RequestDeadline:
+    """A monotonic point in time by which a chat turn should have answered.
+
+    Stages ask ``expired()`` / ``remaining()`` before starting optional work
+    and call ``cut(stage, avoided)`` when they skip or trim it. ``avoided`` is
+    in the stage's own unit (sub-queries, rerank pairs, LLM calls) and feeds
+    ``deadline_avoided_total``; ``cuts`` lists the stages that were cut, in order.
+    """
+
+    def __init__(self, timeout_seconds: float):
+        self.budget = max(0.0, float(timeout_seconds))
+        self.at = time.monotonic() + self.budget
+        self.cuts: List[str] = []
+
+    @classmethod
+    def from_header(cls, value: Optional[str]) -> "RequestDeadline":
+        """Budget from an X-Request-Timeout-Ms value, else the default; capped at the max"""
+        timeout = CHAT_REQUEST_TIMEOUT_SECONDS
+        if value:
+            try:
+                requested = float(value) / 1000.0
+            except ValueError:
+                requested = None
+            if requested is not None and requested > 0:
+                timeout = requested
+        return cls(min(timeout, CHAT_REQUEST_MAX_TIMEOUT_SECONDS))
+
+    def remaining(self) -> float:
+        return self.at - time.monotonic()
+
+    def expired(self, reserve: float = 0.0) -> bool:
+        """True once less than ``reserve`` seconds are left"""
+        return self.remaining() <= reserve
+
+    def cut(self, stage: str, avoided: int = 1):
+        if avoided > 0:
+            metrics.increment("deadline_avoided_total", avoided, stage=stage)
+        if stage not in self.cuts:
+            self.cuts.append(stage)
+            metrics.increment("deadline_cut_total", stage=stage)
+
+
+class StageCostEstimator:
+    """Exponentially weighted seconds-per-item for a batched stage (e.g. rerank pairs)"""
+
+    def __init__(self, initial_seconds_per_item: float, alpha: float = 0.2):
+        self.alpha = alpha
+        self._per_item = float(initial_seconds_per_item)
+        self._lock = threading.Lock()
+
+    def observe(self, items: int, seconds: float):
+        if items <= 0:
+            return
+        with self._lock:
+            self._per_item += self.alpha * (seconds / items - self._per_item)
+
+    def affordable(self, seconds: float) -> int:
+        """How many items fit in ``seconds`` at the current estimate"""
+        if seconds <= 0:
+            return 0
+        with self._lock:
+            per_item = self._per_item
+        return int(seconds / per_item) if per_item > 0 else 1 << 30
+
+
+# Shared reranker, so one estimate for the whole process
+rerank_cost = StageCostEstimator(float(os.getenv("DEADLINE_RERANK_PAIR_MS", "2")) / 1000.0)
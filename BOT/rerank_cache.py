@@ -0,0 +1,110 @@
+# BOT/rerank_cache.py - Per-tenant LRU of cross-encoder scores keyed by (query hash, chunk id)
+
+import collections
+import hashlib
+import os
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+
+from bot_metrics import metrics
+from request_coalescing import normalize_query_key
+
+RERANK_CACHE_MAX_ENTRIES = int(os.getenv("RERANK_CACHE_MAX_ENTRIES", "20000"))
+
+# Process-wide hit/miss totals behind the rerank_cache_hit_ratio gauge
+_totals_lock = threading.Lock()
+_totals = {"hits": 0, "misses": 0}
+
+
+def query_hash(question: str) -> str:
+    """Stable short hash of the normalised question"""
+    return hashlib.blake2b(normalize_query_key(question).encode("utf-8"), digest_size=8).hexdigest()
+
+
+class RerankScoreCache:
+    """Bounded LRU of raw cross-encoder scores for one tenant.
+
+    Keys are (query hash, chunk id), so a repeated question reuses the scores
+    of every chunk it already saw. ``clear()`` is registered as a tenant cache
+    invalidator and runs when the collection version changes. Writes carry
+    the ``generation`` read before scoring started, so scores computed
+    against a superseded version are dropped instead of being cached.
+    ``max_entries <= 0`` disables the cache.
+    """
+
+    def __init__(self, max_entries: int = RERANK_CACHE_MAX_ENTRIES):
+        self.max_entries = int(max_entries)
+        self.generation = 0
+        self._entries: "collections.OrderedDict[Tuple[str, str], float]" = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def get_many(self, question: str, chunk_ids: Iterable[Optional[str]]) -> Dict[str, float]:
+        """Cached scores for the given chunk ids (ids that are None are ignored)"""
+        wanted = [chunk_id for chunk_id in chunk_ids if chunk_id]
+        if not self.enabled or not wanted:
+            return {}
+        qhash = query_hash(question)
+        found: Dict[str, float] = {}
+        with self._lock:
+            for chunk_id in wanted:
+                key = (qhash, chunk_id)
+                score = self._entries.get(key)
+                if score is not None:
+                    self._entries.move_to_end(key)
+                    found[chunk_id] = score
+            self.hits += len(found)
+            self.misses += len(wanted) - len(found)
+        _record_lookups(len(found), len(wanted) - len(found))
+        return found
+
+    def put_many(self, question: str, scores: Dict[str, float], generation: int):
+        if not self.enabled or not scores:
+            return
+        qhash = query_hash(question)
+        with self._lock:
+            if generation != self.generation:
+                return
+            for chunk_id, score in scores.items():
+                self._entries[(qhash, chunk_id)] = score
+                self._entries.move_to_end((qhash, chunk_id))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.generation += 1
+
+    def hit_ratio(self) -> Optional[float]:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else None
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            ratio = self.hit_ratio()
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(ratio, 4) if ratio is not None else None,
+            }
+
+
+def _record_lookups(hits: int, misses: int):
+    if hits:
+        metrics.increment("rerank_cache_hits_total", hits)
+    if misses:
+        metrics.increment("rerank_cache_misses_total", misses)
+    with _totals_lock:
+        _totals["hits"] += hits
+        _totals["misses"] += misses
+        lookups = _totals["hits"] + _totals["misses"]
+        ratio = _totals["hits"] / lookups if lookups else 0.0
+    metrics.set_gauge("rerank_cache_hit_ratio", round(ratio, 4))
@@ -0,0 +1,257 @@
+# BOT/retrieval_plan.py - Declarative per-tenant retrieval plans
+
+import copy
+import datetime
+import json
+import os
+from typing import Any, Callable, Dict, List, Optional
+
+# Per-tenant plan file, next to the tenant's manifest in its vector store directory
+RETRIEVAL_PLAN_FILENAME = "retrieval_plan.json"
+# "auto" picks a preset from the collection size; otherwise a preset name or a JSON file path
+RETRIEVAL_PLAN_DEFAULT = os.getenv("RETRIEVAL_PLAN", "auto")
+RETRIEVAL_PLAN_RICH_BELOW_CHUNKS = int(os.getenv("RETRIEVAL_PLAN_RICH_BELOW_CHUNKS", "5000"))
+RETRIEVAL_PLAN_LEAN_ABOVE_CHUNKS = int(os.getenv("RETRIEVAL_PLAN_LEAN_ABOVE_CHUNKS", "200000"))
+
+# Every stage kind and its settings. None means "no limit".
+#   dense:     one embedding search; query is the question, the question without trailing
+#              punctuation, or the detected entities
+#   lexical:   one sub-query per question word
+#   expansion: related terms (founding, years, roles, key concepts) and question variations
+#   fusion:    merge the lists produced since the previous fusion (concat or reciprocal rank)
+#   prefilter: cheap candidate trimming before rerank
+#   rerank:    cross-encoder scoring; always the last stage
+# Stages marked optional are dropped by the minimal quality tier along with lexical/expansion.
+STAGE_DEFAULTS: Dict[str, Dict[str, Any]] = {
+    "dense": {"query": "question", "n_results": 50, "max_terms": 5, "optional": False},
+    "lexical": {"n_results": 25, "min_word_length": 3, "max_terms": None, "score": -0.7},
+    "expansion": {"terms_n_results": 20, "variations_n_results": 40, "year_span": 20, "max_terms": None, "score": -0.8},
+    "fusion": {"method": "concat", "limit": None, "rrf_k": 60},
+    "prefilter": {"min_chars": 0, "dedupe_prefix_chars": 0, "limit": None},
+    "rerank": {"limit": None, "top_n": 40, "cross_encoder": True},
+}
+RETRIEVAL_KINDS = ("dense", "lexical", "expansion")
+DENSE_QUERIES = ("question", "normalized", "entities")
+FUSION_METHODS = ("concat", "rrf")
+
+PRESET_PLANS: Dict[str, List[Dict[str, Any]]] = {
+    # The long-standing pipeline: Pass 1 (Strategies 1-4, first 60), Pass 2, Pass 3, rerank everything
+    "standard": [
+        {"stage": "dense", "name": "dense", "n_results": 50},
+        {"stage": "lexical", "name": "words", "n_results": 25},
+        {"stage": "expansion", "name": "expansion"},
+        {"stage": "fusion", "name": "pass1", "limit": 60},
+        {"stage": "dense", "name": "direct", "query": "normalized", "n_results": 60, "optional": True},
+        {"stage": "dense", "name": "entities", "query": "entities", "n_results": 40, "optional": True},
+        {"stage": "rerank", "name": "rerank", "top_n": 40},
+    ],
+    # Small tenants: searching is cheap, so cast a wider net before the cross-encoder
+    "rich": [
+        {"stage": "dense", "name": "dense", "n_results": 80},
+        {"stage": "lexical", "name": "words", "n_results": 30},
+        {"stage": "expansion", "name": "expansion"},
+        {"stage": "fusion", "name": "pass1", "limit": 100},
+        {"stage": "dense", "name": "direct", "query": "normalized", "n_results": 60, "optional": True},
+        {"stage": "dense", "name": "entities", "query": "entities", "n_results": 40, "optional": True},
+        {"stage": "rerank", "name": "rerank", "top_n": 40},
+    ],
+    # Very large tenants: one dense search plus a few word queries, fused by rank, short rerank list
+    "lean": [
+        {"stage": "dense", "name": "dense", "n_results": 40},
+        {"stage": "lexical", "name": "words", "n_results": 10, "max_terms": 6},
+        {"stage": "fusion", "name": "fusion", "method": "rrf", "limit": 60},
+        {"stage": "prefilter", "name": "prefilter", "min_chars": 40, "dedupe_prefix_chars": 120, "limit": 40},
+        {"stage": "rerank", "name": "rerank", "top_n": 30},
+    ],
+}
+
+
+class RetrievalPlan:
+    """Validated, ordered list of retrieval stages ending in a rerank stage.
+
+    Stages are plain dicts: ``stage`` (the kind), a unique ``name`` used for
+    timing, and the kind's settings from ``STAGE_DEFAULTS``.
+    """
+
+    def __init__(self, name: str, stages: List[Dict[str, Any]]):
+        self.name = name
+        self.stages = [self._normalize(index, stage) for index, stage in enumerate(stages)]
+        names = [stage["name"] for stage in self.stages]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Plan '{name}': stage names must be unique")
+        kinds = [stage["stage"] for stage in self.stages]
+        if not kinds or kinds[-1] != "rerank" or kinds.count("rerank") != 1:
+            raise ValueError(f"Plan '{name}': exactly one rerank stage, and it must come last")
+        if not any(stage["stage"] == "dense" and not stage["optional"] for stage in self.stages):
+            raise ValueError(f"Plan '{name}': needs at least one non-optional dense stage")
+
+    @staticmethod
+    def _normalize(index: int, stage: Dict[str, Any]) -> Dict[str, Any]:
+        kind = stage.get("stage")
+        if kind not in STAGE_DEFAULTS:
+            raise ValueError(f"Stage {index}: unknown kind {kind!r} (expected one of {sorted(STAGE_DEFAULTS)})")
+        unknown = set(stage) - set(STAGE_DEFAULTS[kind]) - {"stage", "name"}
+        if unknown:
+            raise ValueError(f"Stage {index} ({kind}): unknown settings {sorted(unknown)}")
+        normalized = {"stage": kind, "name": str(stage.get("name") or kind), **STAGE_DEFAULTS[kind]}
+        normalized.update({key: value for key, value in stage.items() if key not in {"stage", "name"}})
+        if kind == "dense" and normalized["query"] not in DENSE_QUERIES:
+            raise ValueError(f"Stage {index}: dense query must be one of {DENSE_QUERIES}")
+        if kind == "fusion" and normalized["method"] not in FUSION_METHODS:
+            raise ValueError(f"Stage {index}: fusion method must be one of {FUSION_METHODS}")
+        return normalized
+
+    @classmethod
+    def from_config(cls, config: Any, name: str = "custom") -> "RetrievalPlan":
+        """Accept a preset name, a stage list or {"name": ..., "stages": [...]} / {"preset": ...}"""
+        if isinstance(config, RetrievalPlan):
+            return config
+        if isinstance(config, str):
+            if config not in PRESET_PLANS:
+                raise ValueError(f"Unknown retrieval plan preset '{config}'")
+            return cls(config, copy.deepcopy(PRESET_PLANS[config]))
+        if isinstance(config, list):
+            return cls(name, config)
+        if isinstance(config, dict):
+            if "preset" in config:
+                return cls.from_config(config["preset"])
+            return cls(str(config.get("name") or name), list(config.get("stages") or []))
+        raise ValueError("Retrieval plan must be a preset name, a list of stages or an object")
+
+    @property
+    def retrieval_stages(self) -> List[Dict[str, Any]]:
+        return self.stages[:-1]
+
+    @property
+    def rerank_stage(self) -> Dict[str, Any]:
+        return self.stages[-1]
+
+    def for_tier(self, settings: Dict[str, Any]) -> "RetrievalPlan":
+        """The plan trimmed by a quality tier's settings (see quality_tiers.TIER_SETTINGS)"""
+        stages = []
+        for stage in self.stages:
+            kind = stage["stage"]
+            if kind == "expansion" and not settings["expansions"]:
+                continue
+            if not settings["text_passes"] and (kind in ("lexical", "expansion") or stage.get("optional")):
+                continue
+            if kind == "rerank":
+                stage = dict(stage)
+                if settings["rerank_limit"]:
+                    stage["limit"] = min(stage["limit"] or settings["rerank_limit"], settings["rerank_limit"])
+                stage["cross_encoder"] = stage["cross_encoder"] and settings["cross_encoder"]
+            stages.append(stage)
+        return RetrievalPlan(self.name, stages)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"name": self.name, "stages": copy.deepcopy(self.stages)}
+
+
+def lexical_terms(question: str, min_word_length: int = 3, max_terms: Optional[int] = None) -> List[str]:
+    """Individual question words used as sub-queries"""
+    words = [word.lower().strip() for word in question.split() if len(word) >= min_word_length]
+    return words[:max_terms] if max_terms else words
+
+
+def expansion_terms(question_analysis: Dict, year_span: int = 20, max_terms: Optional[int] = None) -> List[str]:
+    """Related terms for the question's topic, plus its key concepts"""
+    original_question = question_analysis['original_question'].lower()
+    expanded_searches: List[str] = []
+
+    # Dynamically generate related terms based on question content
+    if any(word in original_question for word in ['founded', 'establish', 'start', 'began', 'create']):
+        expanded_searches.extend(['founded', 'established', 'started', 'began', 'created', 'inception', 'formation'])
+
+    if year_span and any(word in original_question for word in ['year', 'when', 'date', 'time']):
+        # Search for common years in business contexts
+        current_year = datetime.date.today().year
+        expanded_searches.extend(str(year) for year in range(current_year - year_span, current_year + 1))
+
+    if any(word in original_question for word in ['company', 'business', 'organization']):
+        expanded_searches.extend(['company', 'business', 'organization', 'corporation', 'firm'])
+
+    if any(word in original_question for word in ['head', 'ceo', 'leader', 'manager', 'director']):
+        expanded_searches.extend(['CEO', 'head', 'director', 'manager', 'leader', 'president', 'founder'])
+
+    # Add the question's key concepts
+    expanded_searches.extend(question_analysis.get('key_concepts', []))
+    terms = [str(term) for term in expanded_searches if len(str(term)) > 1]  # Skip very short terms
+    return terms[:max_terms] if max_terms else terms
+
+
+def question_variations(question: str, words: List[str]) -> List[str]:
+    """Fuzzy/partial matching: the question, without copulas, and just its key words"""
+    variations = [
+        question,
+        question.replace('was', '').replace('is', '').strip(),
+        ' '.join(words),
+    ]
+    return [variation for variation in variations if variation and len(variation) > 3]
+
+
+def fuse(ranked_lists: List[List[str]], method: str = "concat", rrf_k: int = 60) -> List[str]:
+    """Merge ranked lists: first occurrence in list order, or reciprocal rank fusion"""
+    if method == "rrf":
+        scores: Dict[str, float] = {}
+        for ranked in ranked_lists:
+            for rank, doc in enumerate(ranked):
+                scores[doc] = scores.get(doc, 0.0) + 1.0 / (rrf_k + rank + 1)
+        return sorted(scores, key=scores.get, reverse=True)
+    merged: List[str] = []
+    seen = set()
+    for ranked in ranked_lists:
+        for doc in ranked:
+            if doc not in seen:
+                merged.append(doc)
+                seen.add(doc)
+    return merged
+
+
+def prefilter(docs: List[str], min_chars: int = 0, dedupe_prefix_chars: int = 0, limit: Optional[int] = None) -> List[str]:
+    """Drop very short chunks and chunks that open like an earlier one, then cap the count"""
+    kept: List[str] = []
+    prefixes = set()
+    for doc in docs:
+        text = " ".join(doc.split())
+        if len(text) < min_chars:
+            continue
+        if dedupe_prefix_chars:
+            prefix = text[:dedupe_prefix_chars].lower()
+            if prefix in prefixes:
+                continue
+            prefixes.add(prefix)
+        kept.append(doc)
+        if limit and len(kept) >= limit:
+            break
+    return kept
+
+
+def load_tenant_plan(vector_store_path: str, chunk_count: Callable[[], int]) -> RetrievalPlan:
+    """The tenant's retrieval_plan.json, else RETRIEVAL_PLAN, else a preset picked by collection size"""
+    plan_path = os.path.join(vector_store_path, RETRIEVAL_PLAN_FILENAME)
+    if os.path.exists(plan_path):
+        try:
+            with open(plan_path, "r", encoding="utf-8") as handle:
+                return RetrievalPlan.from_config(json.load(handle), name="tenant")
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Ignoring invalid retrieval plan {plan_path}: {e}")
+
+    default = RETRIEVAL_PLAN_DEFAULT.strip()
+    if default and default != "auto":
+        try:
+            if default in PRESET_PLANS:
+                return RetrievalPlan.from_config(default)
+            with open(default, "r", encoding="utf-8") as handle:
+                return RetrievalPlan.from_config(json.load(handle), name=os.path.splitext(os.path.basename(default))[0])
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Ignoring RETRIEVAL_PLAN={default}: {e}")
+
+    try:
+        count = chunk_count()
+    except Exception:
+        return RetrievalPlan.from_config("standard")
+    if count < RETRIEVAL_PLAN_RICH_BELOW_CHUNKS:
+        return RetrievalPlan.from_config("rich")
+    if count > RETRIEVAL_PLAN_LEAN_ABOVE_CHUNKS:
+        return RetrievalPlan.from_config("lean")
+    return RetrievalPlan.from_config("standard")
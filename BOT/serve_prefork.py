@@ -0,0 +1,190 @@
+"""Pre-fork server: load models once in a parent process, then fork uvicorn workers.
+
+Workers inherit the parent's already-initialised embedding model and
+cross-encoder, so the weights' memory pages are shared copy-on-write instead of
+being loaded N times. ``gc.freeze()`` runs before forking so the garbage
+collector doesn't touch (and thereby copy) the inherited objects. After
+startup the parent prints each process's unique set size (USS, memory not
+shared with any other process) so worker density per box can be sized from
+real numbers.
+
+POSIX only (relies on os.fork). Example:
+    cd BOT && python serve_prefork.py --workers 4 --port 8000
+"""
+
+import argparse
+import gc
+import json
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Dict, List, Optional
+
+BOT_DIR = os.path.dirname(os.path.abspath(__file__))
+if BOT_DIR not in sys.path:
+    sys.path.insert(0, BOT_DIR)
+
+
+def _parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Serve the chatbot with models preloaded before forking workers")
+    parser.add_argument("--host", default=os.getenv("BOT_HOST", "0.0.0.0"), help="Bind address")
+    parser.add_argument("--port", type=int, default=int(os.getenv("BOT_PORT", "8000")), help="Bind port")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("BOT_WORKERS", "2")), help="Worker processes")
+    parser.add_argument("--torch-threads", type=int, default=0, help="Intra-op threads per worker (0 = cores / workers)")
+    parser.add_argument("--no-warmup", action="store_true", help="Skip the warm-up inference before forking")
+    parser.add_argument("--report-delay", type=float, default=5.0, help="Seconds after forking before the memory report")
+    parser.add_argument("--log-level", default="info", help="uvicorn log level")
+    return parser.parse_args(argv)
+
+
+def _smaps_rollup(pid: int) -> Optional[Dict[str, int]]:
+    """RSS / PSS / USS in bytes from /proc/<pid>/smaps_rollup (Linux 4.14+)"""
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", "r", encoding="utf-8") as handle:
+            fields = {}
+            for line in handle:
+                parts = line.split()
+                if len(parts) >= 3 and parts[1].isdigit():
+                    fields[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    except OSError:
+        return None
+    return {
+        "rss_bytes": fields.get("Rss", 0),
+        "pss_bytes": fields.get("Pss", 0),
+        "uss_bytes": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+        "shared_bytes": fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0),
+    }
+
+
+def _memory_report(parent_pid: int, workers: Dict[int, int], load_seconds: float) -> Dict:
+    processes = [{"role": "parent", "pid": parent_pid, **(_smaps_rollup(parent_pid) or {})}]
+    for pid, index in sorted(workers.items(), key=lambda item: item[1]):
+        processes.append({"role": f"worker-{index}", "pid": pid, **(_smaps_rollup(pid) or {})})
+    worker_uss = [entry["uss_bytes"] for entry in processes[1:] if "uss_bytes" in entry]
+    return {
+        "event": "prefork_memory",
+        "processes": processes,
+        "worker_uss_avg_bytes": int(sum(worker_uss) / len(worker_uss)) if worker_uss else None,
+        "total_pss_bytes": sum(entry.get("pss_bytes", 0) for entry in processes),
+        "model_load_seconds": round(load_seconds, 3),
+        "timestamp": time.time(),
+    }
+
+
+def _bind_socket(host: str, port: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(index: int, sock: socket.socket, args: argparse.Namespace, torch_threads: int) -> None:
+    """Child process body; never returns"""
+    import uvicorn
+
+    try:
+        import torch
+        torch.set_num_threads(torch_threads)
+    except ImportError:
+        pass
+
+    import app_20
+
+    config = uvicorn.Config(app_20.app, log_level=args.log_level, lifespan="on")
+    server = uvicorn.Server(config)
+    print(f"👷 Worker {index} (pid {os.getpid()}) serving on {args.host}:{args.port}")
+    try:
+        server.run(sockets=[sock])
+    finally:
+        os._exit(0)
+
+
+def main(argv: List[str]) -> int:
+    if not hasattr(os, "fork"):
+        print("serve_prefork.py requires os.fork (Linux/macOS); use uvicorn directly on this platform")
+        return 2
+
+    args = _parse_args(argv)
+    workers = max(1, args.workers)
+    torch_threads = args.torch_threads or max(1, (os.cpu_count() or 1) // workers)
+
+    # Fork safety: HF tokenizers and OpenMP thread pools must not be live in the parent
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+    try:
+        import torch
+        torch.set_num_threads(1)
+    except ImportError:
+        pass
+
+    started = time.perf_counter()
+    import app_20
+    from model_registry import preload_models
+
+    preload_models(app_20.EMBEDDING_MODEL, app_20.RERANKER_MODEL, warmup=not args.no_warmup)
+    load_seconds = time.perf_counter() - started
+    print(f"📦 Models preloaded in parent (pid {os.getpid()}) in {load_seconds:.2f}s")
+
+    sock = _bind_socket(args.host, args.port)
+
+    # Move everything allocated so far out of the collector's reach before forking
+    gc.collect()
+    gc.freeze()
+
+    children: Dict[int, int] = {}
+    stopping = False
+
+    def spawn(index: int):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            _run_worker(index, sock, args, torch_threads)
+        children[pid] = index
+
+    def stop(signum, _frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    fork_started = time.perf_counter()
+    for index in range(workers):
+        spawn(index)
+    print(f"🚀 Forked {workers} workers in {(time.perf_counter() - fork_started) * 1000:.0f} ms")
+
+    report_at = time.monotonic() + max(0.0, args.report_delay)
+    reported = False
+    while children:
+        if not reported and time.monotonic() >= report_at:
+            print(json.dumps(_memory_report(os.getpid(), children, load_seconds)), flush=True)
+            reported = True
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid == 0:
+            time.sleep(0.2)
+            continue
+        index = children.pop(pid, None)
+        if index is not None and not stopping:
+            print(f"⚠️ Worker {index} (pid {pid}) exited with status {status}; restarting")
+            spawn(index)
+
+    sock.close()
+    print("🛑 All workers stopped")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,231 @@
+# BOT/shadow_eval.py - Shadow runs of an alternate retrieval plan on sampled live traffic
+
+import json
+import os
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from bot_metrics import ChatTrace, metrics
+from quality_tiers import TIER_SETTINGS
+from retrieval_plan import PRESET_PLANS, RetrievalPlan
+
+
+def compare_rankings(
+    production_candidates: List[str],
+    production_top: List[str],
+    shadow_candidates: List[str],
+    shadow_top: List[str],
+    k: int
+) -> Dict[str, Any]:
+    """Agreement between two retrievals of the same question, by chunk id.
+
+    candidate_overlap is the Jaccard overlap of everything retrieved;
+    top_k_agreement the share of production's top k also in the shadow top k;
+    top_k_coverage the share of production's top k the shadow retrieved at all.
+    """
+    production_set, shadow_set = set(production_candidates), set(shadow_candidates)
+    union = production_set | shadow_set
+    production_k = production_top[:k]
+    shadow_k = set(shadow_top[:k])
+    return {
+        "candidate_overlap": len(production_set & shadow_set) / len(union) if union else 1.0,
+        "top_k_agreement": sum(1 for chunk_id in production_k if chunk_id in shadow_k) / len(production_k) if production_k else 1.0,
+        "top_k_coverage": sum(1 for chunk_id in production_k if chunk_id in shadow_set) / len(production_k) if production_k else 1.0,
+        "top_1_match": bool(production_top and shadow_top and production_top[0] == shadow_top[0]),
+    }
+
+
+def ranking_seconds(trace: ChatTrace, plan: RetrievalPlan) -> float:
+    """Retrieval plus rerank time of a retrieve_and_rank run, excluding the question embedding.
+
+    Production may embed the question before retrieval or inside it depending on
+    the caller, so the embedding is left out on both sides of the comparison.
+    """
+    return (
+        trace.timings.get("retrieval", 0.0)
+        - trace.timings.get("question_embedding", 0.0)
+        + trace.timings.get(f"plan.{plan.rerank_stage['name']}", 0.0)
+    )
+
+
+class ShadowEvaluator:
+    """Re-runs a sample of production retrievals under an alternate plan, off the request path.
+
+    Work runs on a small dedicated pool (``workers`` threads) with a bounded
+    backlog, so shadow traffic never queues behind or in front of chat work:
+    once ``max_queue`` runs are pending new samples are dropped. Sampling
+    only happens while the service is at the full quality tier. The shadow
+    reranks without the tenant's rerank score cache, so its latency is not
+    flattered by scores production just computed, and reuses production's
+    question embedding; both sides are timed by ``ranking_seconds``.
+    """
+
+    def __init__(
+        self,
+        plan: RetrievalPlan,
+        sample_rate: float = 0.05,
+        workers: int = 1,
+        max_queue: int = 32,
+        top_k: int = 10,
+        tier: str = "full"
+    ):
+        self.plan = plan.for_tier(TIER_SETTINGS[tier])
+        self.sample_rate = max(0.0, min(1.0, float(sample_rate)))
+        self.workers = max(1, int(workers))
+        self.max_queue = max(1, int(max_queue))
+        self.top_k = max(1, int(top_k))
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._pid: Optional[int] = None
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._totals: Dict[str, Dict[str, float]] = {}
+        self._closed = False
+
+    def _ensure_pool(self) -> ThreadPoolExecutor:
+        # Recreated after fork: the parent's worker threads don't exist in the child
+        pid = os.getpid()
+        if self._pid != pid or self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="shadow")
+            self._pid = pid
+            self._pending = 0
+        return self._pool
+
+    def maybe_submit(self, bot, question_analysis: Dict, trace: ChatTrace, tier: str, tenant: str) -> bool:
+        """Sample a finished production retrieval; True if a shadow run was queued"""
+        if self._closed or tier != "full" or random.random() >= self.sample_rate:
+            return False
+        if trace.deadline_cuts:
+            # Production retrieval was truncated; comparing against it would only measure the cut
+            metrics.increment("shadow_dropped_total", reason="deadline")
+            return False
+        production = {
+            "candidates": list(trace.retrieved_ids),
+            "top": list(trace.candidate_ids),
+            "seconds": ranking_seconds(trace, bot.retrieval_plan.for_tier(TIER_SETTINGS[tier])),
+        }
+        # Shallow copy: the shadow reuses production's question embedding instead of encoding again
+        analysis = dict(question_analysis)
+        with self._lock:
+            pool = self._ensure_pool()
+            if self._pending >= self.max_queue:
+                metrics.increment("shadow_dropped_total", reason="queue_full")
+                return False
+            self._pending += 1
+        pool.submit(self._run, bot, analysis, production, tenant)
+        return True
+
+    def _run(self, bot, question_analysis: Dict, production: Dict[str, Any], tenant: str):
+        try:
+            shadow_trace = ChatTrace(emit_metrics=False)
+            scored_docs, doc_ids = bot.retrieve_and_rank(
+                question_analysis, shadow_trace, self.plan, use_rerank_cache=False
+            )
+            shadow_seconds = ranking_seconds(shadow_trace, self.plan)
+            shadow_top = [doc_ids[doc] for doc, _ in scored_docs if doc in doc_ids]
+            result = compare_rankings(
+                production["candidates"], production["top"], shadow_trace.retrieved_ids, shadow_top, self.top_k
+            )
+            result["latency_delta_ms"] = (shadow_seconds - production["seconds"]) * 1000
+            self._record(tenant, result)
+        except Exception as e:
+            metrics.increment("shadow_errors_total")
+            print(f"⚠️ Shadow retrieval failed: {e}")
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _record(self, tenant: str, result: Dict[str, Any]):
+        plan = self.plan.name
+        metrics.increment("shadow_runs_total", plan=plan)
+        metrics.observe("shadow_candidate_overlap", result["candidate_overlap"], plan=plan)
+        metrics.observe("shadow_top_k_agreement", result["top_k_agreement"], plan=plan)
+        metrics.observe("shadow_top_k_coverage", result["top_k_coverage"], plan=plan)
+        metrics.observe("shadow_latency_delta_ms", result["latency_delta_ms"], plan=plan)
+        with self._lock:
+            totals = self._totals.setdefault(tenant, {
+                "runs": 0, "candidate_overlap": 0.0, "top_k_agreement": 0.0,
+                "top_k_coverage": 0.0, "top_1_match": 0.0, "latency_delta_ms": 0.0,
+            })
+            totals["runs"] += 1
+            for key in ("candidate_overlap", "top_k_agreement", "top_k_coverage", "latency_delta_ms"):
+                totals[key] += result[key]
+            totals["top_1_match"] += 1.0 if result["top_1_match"] else 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Per-tenant means of every comparison so far"""
+        with self._lock:
+            tenants = {
+                tenant: {
+                    "runs": int(totals["runs"]),
+                    **{key: round(value / totals["runs"], 4) for key, value in totals.items() if key != "runs"},
+                }
+                for tenant, totals in self._totals.items()
+            }
+            return {
+                "plan": self.plan.name,
+                "sample_rate": self.sample_rate,
+                "top_k": self.top_k,
+                "pending": self._pending,
+                "tenants": tenants,
+            }
+
+    def close(self):
+        self._closed = True
+        if self._pool is not None and self._pid == os.getpid():
+            self._pool.shutdown(wait=False)
+
+
+_shadow_lock = threading.Lock()
+_shared_shadow: Optional[ShadowEvaluator] = None
+_shadow_resolved = False
+
+
+def _load_shadow_plan(spec: str) -> RetrievalPlan:
+    if spec in PRESET_PLANS:
+        return RetrievalPlan.from_config(spec)
+    with open(spec, "r", encoding="utf-8") as handle:
+        return RetrievalPlan.from_config(json.load(handle), name=os.path.splitext(os.path.basename(spec))[0])
+
+
+def create_shadow_evaluator() -> Optional[ShadowEvaluator]:
+    """Build the evaluator from SHADOW_* environment variables; None unless SHADOW_PLAN is set"""
+    spec = os.getenv("SHADOW_PLAN", "").strip()
+    if not spec:
+        return None
+    try:
+        plan = _load_shadow_plan(spec)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Shadow evaluation disabled, invalid SHADOW_PLAN={spec}: {e}")
+        return None
+    print(f"👥 Shadow evaluation of plan '{plan.name}' enabled")
+    return ShadowEvaluator(
+        plan,
+        sample_rate=float(os.getenv("SHADOW_SAMPLE_RATE", "0.05")),
+        workers=int(os.getenv("SHADOW_WORKERS", "1")),
+        max_queue=int(os.getenv("SHADOW_QUEUE_SIZE", "32")),
+        top_k=int(os.getenv("SHADOW_TOP_K", "10")),
+        tier=os.getenv("SHADOW_TIER", "full")
+    )
+
+
+def get_shadow_evaluator() -> Optional[ShadowEvaluator]:
+    """Return the process-wide evaluator, or None when shadow evaluation is off"""
+    global _shared_shadow, _shadow_resolved
+    if not _shadow_resolved:
+        with _shadow_lock:
+            if not _shadow_resolved:
+                _shared_shadow = create_shadow_evaluator()
+                _shadow_resolved = True
+    return _shared_shadow
+
+
+def shutdown_shadow_evaluator() -> None:
+    """Stop accepting shadow runs (called on application shutdown)"""
+    global _shared_shadow, _shadow_resolved
+    with _shadow_lock:
+        shadow, _shared_shadow = _shared_shadow, None
+        _shadow_resolved = False
+    if shadow is not None:
+        shadow.close()
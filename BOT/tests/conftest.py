@@ -0,0 +1,10 @@
+# BOT/tests/conftest.py - Make BOT modules and the Scraping2 package importable from tests
+
+import os
+import sys
+
+BOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ROOT_DIR = os.path.dirname(BOT_DIR)
+for path in (BOT_DIR, ROOT_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
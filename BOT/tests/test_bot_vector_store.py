@@ -0,0 +1,90 @@
+# BOT/tests/test_bot_vector_store.py - The bot opens stores built by the scraper pipeline
+
+import time
+
+import pytest
+
+chromadb = pytest.importorskip("chromadb")
+pytest.importorskip("fastapi")
+
+import embedding_engine  # noqa: E402
+from Scraping2.vector_store import (  # noqa: E402
+    begin_version,
+    bump_collection_version,
+    get_or_create_tenant_collection,
+    publish_version,
+)
+
+MODEL = embedding_engine.DEFAULT_EMBEDDING_MODEL
+DIMENSION = 384
+
+
+def _pipeline_embedding_function():
+    """The embedding function ChromaPipeline persists, without loading its model"""
+    from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
+
+    function = SentenceTransformerEmbeddingFunction.__new__(SentenceTransformerEmbeddingFunction)
+    function.model_name, function.device, function.normalize_embeddings, function.kwargs = MODEL, "cpu", False, {}
+    return function
+
+
+def _build_like_pipeline(tenant_path: str):
+    # Mirrors ChromaPipeline.open_spider / close_spider
+    version, write_path = begin_version(tenant_path)
+    collection = get_or_create_tenant_collection(
+        chromadb.PersistentClient(path=write_path),
+        "scraped_content",
+        tenant_path,
+        embedding_function=_pipeline_embedding_function(),
+        embedding_model=MODEL
+    )
+    collection.add(ids=["chunk-1"], documents=["We build websites."], embeddings=[[0.1] * DIMENSION])
+    publish_version(tenant_path, version)
+    bump_collection_version(tenant_path, source="test")
+
+
+@pytest.fixture
+def shared_engine(monkeypatch):
+    """Preload the process-wide engine so the bot doesn't load the real model"""
+    engine = embedding_engine.EmbeddingEngine.__new__(embedding_engine.EmbeddingEngine)
+    engine.model_name, engine.dimension, engine.ndarray_queries, engine._batcher = MODEL, DIMENSION, True, None
+    monkeypatch.setitem(embedding_engine._engines, MODEL, engine)
+    return engine
+
+
+@pytest.mark.parametrize("pipeline_built", [True, False], ids=["pipeline_store", "empty_store"])
+def test_bot_opens_tenant_store(tmp_path, shared_engine, pipeline_built):
+    import app_20
+
+    tenant_path = str(tmp_path / "tenant")
+    if pipeline_built:
+        _build_like_pipeline(tenant_path)
+
+    bot = app_20.SemanticIntelligentRAG(tenant_path)
+
+    assert bot.collection.count() == (1 if pipeline_built else 0)
+    if pipeline_built:
+        assert bot.collection.metadata["embedding_model"] == MODEL
+        assert bot.vector_store_version is not None
+
+
+def test_superseded_version_client_is_released_on_a_later_turn(tmp_path, shared_engine, monkeypatch):
+    import app_20
+
+    tenant_path = str(tmp_path / "tenant")
+    _build_like_pipeline(tenant_path)
+    bot = app_20.SemanticIntelligentRAG(tenant_path)
+    first_client, first_version = bot.chroma_client, bot.vector_store_version
+
+    _build_like_pipeline(tenant_path)
+    bot._next_store_check = 0.0
+    bot.refresh_vector_store()
+    assert bot.vector_store_version != first_version
+    assert [client for client, _ in bot._retired_clients] == [first_client]
+
+    closed = []
+    monkeypatch.setattr(app_20.SemanticIntelligentRAG, "_close_client", staticmethod(closed.append))
+    # Past the grace period the next turn releases it, without another ingestion run
+    bot._retired_clients = [(first_client, time.monotonic() - 3600)]
+    bot.refresh_vector_store()
+    assert closed == [first_client] and bot._retired_clients == []
@@ -0,0 +1,87 @@
+# BOT/tests/test_chat_batch.py - Batch answers fail per item and stay under the tenant's worker cap
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("chromadb")
+
+import app_20  # noqa: E402
+from fair_scheduler import FairChatExecutor  # noqa: E402
+from llm_gateway import LLMOverloadedError  # noqa: E402
+
+
+class _Concurrency:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.current = self.peak = 0
+
+    def __enter__(self):
+        with self._lock:
+            self.current += 1
+            self.peak = max(self.peak, self.current)
+
+    def __exit__(self, *exc):
+        with self._lock:
+            self.current -= 1
+
+
+@pytest.fixture
+def batch_bot(monkeypatch):
+    bot = app_20.SemanticIntelligentRAG.__new__(app_20.SemanticIntelligentRAG)
+    running = _Concurrency()
+
+    def retrieve_batch(questions, trace):
+        return [
+            {"analysis": {"original_question": question}, "scored": [(f"passage for {question}.", 1.0)], "candidates": 1}
+            for question in questions
+        ]
+
+    def synthesize(analysis, docs, doc_scores=None):
+        with running:
+            time.sleep(0.05)
+            if analysis["original_question"] == "busy":
+                raise LLMOverloadedError("LLM queue full", reason="queue_full", status_code=429, retry_after=5)
+            return f"answer to {analysis['original_question']}"
+
+    bot.retrieve_batch = retrieve_batch
+    bot.synthesize_comprehensive_answer = synthesize
+
+    async def get_bot(**kwargs):
+        return bot
+
+    monkeypatch.setattr(app_20, "get_tenant_chatbot_or_error", get_bot)
+    monkeypatch.setattr(app_20, "admission_controller", None)
+    return running
+
+
+def _run_batch(queries):
+    request = app_20.BatchQuestionRequest(queries=queries, resource_id="tenant-a", max_concurrency=4)
+    return asyncio.run(app_20._handle_batch_chat_request(request))
+
+
+def test_one_shed_llm_call_does_not_fail_the_batch(batch_bot, monkeypatch):
+    monkeypatch.setattr(app_20, "chat_executor", None)
+    response = _run_batch(["first", "busy", "third"])
+
+    answers = {item.query: item for item in response.answers}
+    assert answers["first"].answer == "answer to first" and not answers["first"].partial
+    assert answers["third"].answer == "answer to third"
+    assert answers["busy"].partial and answers["busy"].error.startswith("queue_full")
+    assert "passage for busy" in answers["busy"].answer
+    assert response.metadata["failed"] == 1
+
+
+def test_batch_generation_respects_the_tenant_worker_cap(batch_bot, monkeypatch):
+    executor = FairChatExecutor(workers=4, max_tenant_share=0.5)
+    monkeypatch.setattr(app_20, "chat_executor", executor)
+    try:
+        response = _run_batch([f"question {index}" for index in range(8)])
+    finally:
+        executor.shutdown()
+
+    assert len(response.answers) == 8
+    assert batch_bot.peak <= executor.tenant_cap == 2
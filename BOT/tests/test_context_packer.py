@@ -0,0 +1,20 @@
+# BOT/tests/test_context_packer.py - Coverage tracking must follow what actually reaches the prompt
+
+from context_packer import ContextPacker
+
+
+def _words(start: int, stop: int) -> str:
+    return " ".join(f"w{index}" for index in range(start, stop))
+
+
+def test_truncated_tail_does_not_mark_later_passage_contained():
+    long_passage = _words(0, 200)
+    tail_passage = _words(150, 200)
+    # One character per token, so the budget cuts the long passage after roughly 50 words
+    packer = ContextPacker(token_budget=len(_words(0, 50)) + 4, chars_per_token=1.0, min_passage_tokens=20)
+
+    packed = packer.pack([long_passage, tail_passage], scores=[2.0, 1.0])
+
+    assert len(packed.passages) == 1 and "w150" not in packed.passages[0]
+    # The tail never reached the prompt, so it is only out of budget, not already covered
+    assert packed.dropped == {"budget": 1}
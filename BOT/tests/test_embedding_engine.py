@@ -0,0 +1,90 @@
+# BOT/tests/test_embedding_engine.py - Readers must not restamp a collection's embedding model
+
+import pytest
+
+chromadb = pytest.importorskip("chromadb")
+
+from embedding_engine import EmbeddingEngine, EmbeddingModelMismatchError  # noqa: E402
+from Scraping2.vector_store import get_or_create_tenant_collection  # noqa: E402
+
+
+def _engine(model_name: str, dimension: int) -> EmbeddingEngine:
+    """Engine with a name and width but no loaded model; verify_collection needs nothing else"""
+    engine = EmbeddingEngine.__new__(EmbeddingEngine)
+    engine.model_name = model_name
+    engine.dimension = dimension
+    engine.ndarray_queries = True
+    engine._batcher = None
+    return engine
+
+
+def _build_with_model_a(path: str):
+    client = chromadb.PersistentClient(path=path)
+    collection = get_or_create_tenant_collection(client, "tenant", path, embedding_model="model-a")
+    collection.add(ids=["chunk-1"], documents=["hello"], embeddings=[[0.1, 0.2, 0.3, 0.4]])
+
+
+def _open_as_reader(path: str, model_name: str):
+    # Even a caller that passes its own model name must not restamp an existing collection
+    return get_or_create_tenant_collection(
+        chromadb.PersistentClient(path=path), "tenant", path, embedding_model=model_name
+    )
+
+
+def test_reader_with_other_model_raises_mismatch(tmp_path):
+    path = str(tmp_path)
+    _build_with_model_a(path)
+
+    engine_b = _engine("model-b", 4)
+    collection = _open_as_reader(path, "model-b")
+    with pytest.raises(EmbeddingModelMismatchError):
+        engine_b.verify_collection(collection)
+
+
+def test_reader_open_keeps_stored_metadata(tmp_path):
+    path = str(tmp_path)
+    _build_with_model_a(path)
+
+    collection = _open_as_reader(path, "model-b")
+    assert collection.metadata["embedding_model"] == "model-a"
+    # A fresh client reads the metadata back from disk
+    pytest.importorskip("chromadb.api.client").SharedSystemClient.clear_system_cache()
+    reopened = chromadb.PersistentClient(path=path).get_collection("tenant")
+    assert reopened.metadata["embedding_model"] == "model-a"
+
+
+class _Chroma04Client:
+    """chromadb 0.4.x semantics: get_or_create_collection replaces an existing collection's metadata"""
+
+    class _Collection:
+        def __init__(self, name, metadata):
+            self.name, self.metadata = name, metadata
+
+        def peek(self, limit=1):
+            return {"embeddings": []}
+
+    def __init__(self):
+        self.collections = {}
+
+    def get_collection(self, name, embedding_function=None):
+        if name not in self.collections:
+            raise ValueError(f"Collection {name} does not exist.")
+        return self.collections[name]
+
+    def get_or_create_collection(self, name, metadata=None, embedding_function=None):
+        collection = self.collections.setdefault(name, self._Collection(name, metadata))
+        collection.metadata = metadata
+        return collection
+
+
+def test_reader_open_does_not_restamp_on_chroma_04(tmp_path):
+    client = _Chroma04Client()
+    get_or_create_tenant_collection(client, "tenant", str(tmp_path), embedding_model="model-a")
+
+    engine_b = _engine("model-b", 4)
+    collection = get_or_create_tenant_collection(
+        client, "tenant", str(tmp_path), embedding_function=engine_b, embedding_model="model-b"
+    )
+    assert client.collections["tenant"].metadata["embedding_model"] == "model-a"
+    with pytest.raises(EmbeddingModelMismatchError):
+        engine_b.verify_collection(collection)
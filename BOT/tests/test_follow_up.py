@@ -0,0 +1,34 @@
+# BOT/tests/test_follow_up.py - Only whole-message continuations reuse the previous turn's chunks
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("chromadb")
+
+from app_20 import SemanticIntelligentRAG  # noqa: E402
+
+
+@pytest.mark.parametrize("message", [
+    "tell me more",
+    "Tell me more!",
+    "Continue.",
+    "yes please, go on",
+    "Can you elaborate?",
+    "ok",
+])
+def test_continuation_messages_are_follow_ups(message):
+    assert SemanticIntelligentRAG.is_follow_up_question(message) is True
+
+
+@pytest.mark.parametrize("message", [
+    "How do I continue my subscription?",
+    "Tell me more about your pricing plans",
+    "Can you elaborate on the refund policy?",
+    "I want more details on shipping to Canada",
+])
+def test_new_questions_containing_continuation_words_are_not_follow_ups(message):
+    assert SemanticIntelligentRAG.is_follow_up_question(message) is False
+
+
+def test_plain_no_is_negative():
+    assert SemanticIntelligentRAG.is_follow_up_question("No thanks") == "negative"
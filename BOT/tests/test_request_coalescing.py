@@ -0,0 +1,51 @@
+# BOT/tests/test_request_coalescing.py - Followers give up at their timeout and skip unshareable results
+
+import threading
+
+import pytest
+
+from request_coalescing import SingleFlight, WaitTimeout
+
+
+def _start_leader(flight, key, release, result, shareable=None):
+    started = threading.Event()
+
+    def work():
+        started.set()
+        release.wait(5)
+        return result
+
+    outcome = {}
+    leader = threading.Thread(target=lambda: outcome.update(value=flight.do(key, work, shareable=shareable)))
+    leader.start()
+    assert started.wait(5)
+    return leader, outcome
+
+
+def test_follower_stops_waiting_at_its_timeout():
+    flight, release = SingleFlight(), threading.Event()
+    leader, outcome = _start_leader(flight, "q", release, "slow")
+    try:
+        with pytest.raises(WaitTimeout):
+            flight.do("q", lambda: "follower", timeout=0.05)
+    finally:
+        release.set()
+        leader.join(5)
+    assert outcome["value"] == ("slow", False)
+
+
+def test_follower_shares_a_complete_result():
+    flight, release = SingleFlight(), threading.Event()
+    leader, _ = _start_leader(flight, "q", release, "full", shareable=lambda result: True)
+    threading.Timer(0.05, release.set).start()
+    assert flight.do("q", lambda: "follower", timeout=5) == ("full", True)
+    leader.join(5)
+
+
+def test_follower_recomputes_when_the_leader_result_is_not_shareable():
+    flight, release = SingleFlight(), threading.Event()
+    leader, outcome = _start_leader(flight, "q", release, "cut short", shareable=lambda result: False)
+    threading.Timer(0.05, release.set).start()
+    assert flight.do("q", lambda: "follower", timeout=5) == ("follower", False)
+    leader.join(5)
+    assert outcome["value"] == ("cut short", False)
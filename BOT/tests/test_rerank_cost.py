@@ -0,0 +1,55 @@
+# BOT/tests/test_rerank_cost.py - The rerank cost estimate only learns from production cross-encoder misses
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("chromadb")
+
+import app_20  # noqa: E402
+from bot_metrics import ChatTrace  # noqa: E402
+from rerank_cache import RerankScoreCache  # noqa: E402
+
+
+class _Reranker:
+    def predict(self, pairs, batch_size=64):
+        return [1.0] * len(pairs)
+
+
+class _Observations:
+    def __init__(self):
+        self.items = []
+
+    def observe(self, items, seconds):
+        self.items.append(items)
+
+    def affordable(self, seconds):
+        return 1 << 30
+
+
+@pytest.fixture
+def scorer(monkeypatch):
+    bot = app_20.SemanticIntelligentRAG.__new__(app_20.SemanticIntelligentRAG)
+    bot.rerank_cache = RerankScoreCache(max_entries=100)
+    observations = _Observations()
+    monkeypatch.setattr(app_20, "rerank_cost", observations)
+    monkeypatch.setattr(app_20, "get_reranker", lambda model: _Reranker())
+    return bot, observations
+
+
+def test_only_cache_misses_are_observed(scorer):
+    bot, observations = scorer
+    docs = [f"passage {index}" for index in range(4)]
+    doc_ids = {doc: f"chunk-{index}" for index, doc in enumerate(docs)}
+
+    bot.rerank_within_deadline("question", docs[:3], ChatTrace(), doc_ids=doc_ids)
+    bot.rerank_within_deadline("question", docs, ChatTrace(), doc_ids=doc_ids)
+    bot.rerank_within_deadline("question", docs, ChatTrace(), doc_ids=doc_ids)
+
+    # 3 misses, then 1 new chunk, then everything cached (no cross-encoder call at all)
+    assert observations.items == [3, 1]
+
+
+def test_shadow_traces_are_not_observed(scorer):
+    bot, observations = scorer
+    bot.rerank_within_deadline("question", ["a", "b"], ChatTrace(emit_metrics=False))
+    assert observations.items == []
@@ -13,6 +13,16 @@ import nltk
 from nltk.tokenize import sent_tokenize
 from collections import Counter
 
+from Scraping2.vector_store import (
+    abort_version,
+    acquire_ingestion_lock,
+    begin_version,
+    bump_collection_version,
+    get_or_create_tenant_collection,
+    publish_version,
+    release_ingestion_lock,
+)
+
 logger = logging.getLogger(__name__)
 
 class ContentPipeline:
@@ -136,6 +146,9 @@ class ChromaDBPipeline:
         self.embedding_model_name = None
         self.tenant_resource_id = None
         self.tenant_user_id = None
+        self.ingest_lock = None
+        self.version = None
+        self.write_path = None
 
     def open_spider(self, spider):
         """Initialize ChromaDB when spider starts"""
@@ -175,36 +188,79 @@ class ChromaDBPipeline:
             self.tenant_resource_id = getattr(spider, 'resource_id', None)
             self.tenant_user_id = getattr(spider, 'tenant_user_id', None)
 
-            # Create persistent client scoped to tenant directory
-            self.client = chromadb.PersistentClient(path=self.db_path)
+            # Write into a fresh copy of the tenant data; live readers stay on the
+            # published version until close_spider flips the CURRENT pointer
+            self.ingest_lock = acquire_ingestion_lock(self.db_path)
+            self.version, self.write_path = begin_version(self.db_path)
+
+            # Create persistent client scoped to the new version directory
+            self.client = chromadb.PersistentClient(path=self.write_path)
             
             # Create embedding function
             embedding_function = embedding_functions.SentenceTransformerEmbeddingFunction(
                 model_name=self.embedding_model_name
             )
             
-            # Get or create collection
-            self.collection = self.client.get_or_create_collection(
-                name=self.collection_name,
-                embedding_function=embedding_function
+            # Get or create collection with the tenant's HNSW index settings
+            self.collection = get_or_create_tenant_collection(
+                self.client,
+                self.collection_name,
+                self.db_path,
+                embedding_function=embedding_function,
+                embedding_model=self.embedding_model_name
             )
             
             logger.info(
-                "ChromaDB initialized for resource %s at %s (collection=%s)",
+                "ChromaDB initialized for resource %s at %s (collection=%s, version=%s)",
                 self.tenant_resource_id,
                 self.db_path,
-                self.collection_name
+                self.collection_name,
+                self.version
             )
             
         except Exception as e:
             logger.error(f"Failed to initialize ChromaDB: {e}")
+            if self.version:
+                abort_version(self.db_path, self.version)
+                self.version = None
+            release_ingestion_lock(self.ingest_lock)
+            self.ingest_lock = None
             raise
 
     def close_spider(self, spider):
-        """Process any remaining items when spider closes"""
-        if self.batch_items:
-            self._process_batch()
-        logger.info(f"ChromaDBPipeline finished. Total chunks stored: {self.items_stored}")
+        """Process any remaining items, then publish the new version to readers.
+
+        A run that stored nothing discards its version instead of publishing a
+        copy of the old data (which would also flush every reader's caches).
+        """
+        published = False
+        try:
+            if self.batch_items:
+                self._process_batch()
+            if self.version and not self.items_stored:
+                logger.info("No chunks stored; discarding version %s", self.version)
+                abort_version(self.db_path, self.version)
+                self.version = None
+            elif self.version:
+                publish_version(self.db_path, self.version)
+                published = True
+                # Tell readers (the bot) the tenant's data changed
+                bump_collection_version(
+                    self.db_path,
+                    source=getattr(spider, 'name', 'spider'),
+                    job_id=getattr(spider, 'scrape_job_id', None),
+                    resource_id=self.tenant_resource_id,
+                    chunks_stored=self.items_stored
+                )
+        except Exception:
+            if self.version and not published:
+                abort_version(self.db_path, self.version)
+                self.version = None
+            raise
+        finally:
+            release_ingestion_lock(self.ingest_lock)
+            self.ingest_lock = None
+        logger.info(f"ChromaDBPipeline finished. Total chunks stored: {self.items_stored} (version {self.version})")
 
     def process_item(self, item, spider):
         """Process individual items and batch them for efficient storage"""
@@ -0,0 +1,293 @@
+"""Offline rebuild of a tenant collection with new HNSW index settings.
+
+Copies every record (ids, embeddings, documents, metadata) into a fresh
+collection created with the requested HNSW parameters. It then measures
+recall@k against exact brute-force search and query latency for both the
+current and the rebuilt index. The work happens in a new vector store version
+(see ``vector_store.begin_version``), so live readers are untouched. If recall
+meets ``--min-recall``, the rebuilt collection takes the original name inside
+that version, the version is published with an atomic pointer switch, and the
+tenant's ``index_config.json`` is updated so future re-creations use the same
+settings. The previous version stays on disk for rollback until pruned.
+
+Example:
+    python Scraping2/rebuild_index.py --vector-store-path ./tenant-vector-stores/acme-1234 \
+        --preset auto --sample-queries 200 --k 10
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from Scraping2.vector_store import (  # noqa: E402
+    HNSW_PRESETS,
+    abort_version,
+    begin_version,
+    bump_collection_version,
+    collection_metadata,
+    ingestion_lock,
+    missing_collection_errors,
+    preset_for_size,
+    publish_version,
+    read_index_config,
+    resolve_hnsw_settings,
+    write_index_config,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Rebuild a tenant Chroma collection with new HNSW settings")
+    parser.add_argument("--vector-store-path", required=True, help="Tenant-specific ChromaDB directory")
+    parser.add_argument("--collection-name", default="scraped_content", help="ChromaDB collection name")
+    parser.add_argument(
+        "--preset",
+        choices=sorted(HNSW_PRESETS) + ["auto", "config"],
+        default="config",
+        help="Settings preset: 'auto' picks by collection size, 'config' uses index_config.json/env"
+    )
+    parser.add_argument("--space", choices=["cosine", "l2", "ip"], help="Override distance space")
+    parser.add_argument("--m", type=int, help="Override hnsw:M (graph links per node)")
+    parser.add_argument("--construction-ef", type=int, help="Override hnsw:construction_ef")
+    parser.add_argument("--search-ef", type=int, help="Override hnsw:search_ef")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Records copied per batch")
+    parser.add_argument("--sample-queries", type=int, default=200, help="Queries used for the recall/latency report (0 skips it)")
+    parser.add_argument("--k", type=int, default=10, help="Neighbours compared for recall@k")
+    parser.add_argument("--min-recall", type=float, default=0.9, help="Refuse to swap if rebuilt recall@k is below this")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for query sampling")
+    parser.add_argument("--dry-run", action="store_true", help="Build and report but keep the current collection")
+    parser.add_argument("--log-level", default="INFO", help="Python logging level")
+    parser.add_argument("--output", help="Optional path to write the report as JSON")
+    return parser.parse_args(argv)
+
+
+def _configure_logging(level: str) -> None:
+    numeric_level = getattr(logging, level.upper(), logging.INFO)
+    logging.basicConfig(
+        level=numeric_level,
+        format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S"
+    )
+
+
+def _target_settings(args: argparse.Namespace, record_count: int) -> Dict[str, Any]:
+    overrides = {
+        "space": args.space,
+        "M": args.m,
+        "construction_ef": args.construction_ef,
+        "search_ef": args.search_ef,
+    }
+    if args.preset == "config":
+        return resolve_hnsw_settings(args.vector_store_path, overrides)
+
+    preset = preset_for_size(record_count) if args.preset == "auto" else args.preset
+    settings = dict(HNSW_PRESETS[preset])
+    settings.update({key: value for key, value in overrides.items() if value is not None})
+    settings["preset"] = preset
+    return settings
+
+
+def _copy_records(source, target, batch_size: int) -> tuple[List[str], np.ndarray]:
+    """Copy all records in batches and return their ids and embeddings for evaluation"""
+    total = source.count()
+    ids: List[str] = []
+    vectors: List[np.ndarray] = []
+    offset = 0
+    while offset < total:
+        batch = source.get(
+            include=["embeddings", "documents", "metadatas"],
+            limit=batch_size,
+            offset=offset
+        )
+        if not batch["ids"]:
+            break
+        target.add(
+            ids=batch["ids"],
+            embeddings=[list(map(float, vector)) for vector in batch["embeddings"]],
+            documents=batch["documents"],
+            metadatas=batch["metadatas"]
+        )
+        ids.extend(batch["ids"])
+        vectors.append(np.asarray(batch["embeddings"], dtype=np.float32))
+        offset += len(batch["ids"])
+        logger.info("Copied %d/%d records", offset, total)
+    matrix = np.vstack(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+    return ids, matrix
+
+
+def _exact_neighbours(matrix: np.ndarray, queries: np.ndarray, k: int, space: str, block: int = 32) -> np.ndarray:
+    """Brute-force top-k row indices for each query under the collection's distance"""
+    if space == "cosine":
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = matrix / np.where(norms == 0, 1.0, norms)
+        q_norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(q_norms == 0, 1.0, q_norms)
+    squared_norms = np.sum(matrix ** 2, axis=1)[None, :] if space == "l2" else None
+    k = min(k, matrix.shape[0])
+
+    # Score queries in blocks so large stores don't materialise a full distance matrix
+    neighbours = []
+    for start in range(0, len(queries), block):
+        chunk = queries[start:start + block]
+        if space == "l2":
+            distances = np.sum(chunk ** 2, axis=1, keepdims=True) - 2 * chunk @ matrix.T + squared_norms
+        else:
+            distances = -(chunk @ matrix.T)
+        neighbours.append(np.argpartition(distances, k - 1, axis=1)[:, :k])
+    return np.vstack(neighbours)
+
+
+def _evaluate(collection, ids: List[str], queries: np.ndarray, truth: np.ndarray, k: int) -> Dict[str, float]:
+    latencies = []
+    hits = 0
+    for query, expected in zip(queries, truth):
+        started = time.perf_counter()
+        result = collection.query(query_embeddings=[query.tolist()], n_results=k, include=["distances"])
+        latencies.append(time.perf_counter() - started)
+        found = set(result["ids"][0])
+        hits += sum(1 for index in expected if ids[index] in found)
+    ordered = sorted(latencies)
+
+    def pct(fraction: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))] * 1000, 3)
+
+    return {
+        f"recall_at_{k}": round(hits / float(truth.size or 1), 4),
+        "latency_ms_p50": pct(0.50),
+        "latency_ms_p95": pct(0.95),
+        "latency_ms_avg": round(sum(latencies) / len(latencies) * 1000, 3),
+    }
+
+
+def _hnsw_view(metadata: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    return {key: value for key, value in (metadata or {}).items() if key.startswith("hnsw:")}
+
+
+class CollectionNotFoundError(LookupError):
+    """The collection to rebuild does not exist in the tenant store"""
+
+
+def _rebuild(client, args: argparse.Namespace) -> Dict[str, Any]:
+    """Rebuild inside an unpublished version; report["status"] says whether to publish"""
+    try:
+        source = client.get_collection(name=args.collection_name)
+    except missing_collection_errors() as exc:
+        raise CollectionNotFoundError(str(exc)) from exc
+    record_count = source.count()
+    settings = _target_settings(args, record_count)
+    stamp = datetime.utcnow().strftime("%Y%m%d%H%M%S")
+    rebuild_name = f"{args.collection_name}__rebuild_{stamp}"
+
+    logger.info("Rebuilding %s (%d records) with %s", args.collection_name, record_count, settings)
+    target = client.create_collection(
+        name=rebuild_name,
+        metadata=collection_metadata(settings, base=source.metadata)
+    )
+
+    started = time.perf_counter()
+    ids, matrix = _copy_records(source, target, max(1, args.batch_size))
+    build_seconds = time.perf_counter() - started
+
+    report: Dict[str, Any] = {
+        "vector_store_path": args.vector_store_path,
+        "collection_name": args.collection_name,
+        "records": len(ids),
+        "build_seconds": round(build_seconds, 3),
+        "previous_settings": _hnsw_view(source.metadata),
+        "new_settings": _hnsw_view(target.metadata),
+        "settings": settings,
+    }
+
+    passed = True
+    if args.sample_queries > 0 and len(ids) > 0:
+        rng = np.random.default_rng(args.seed)
+        picks = rng.choice(len(ids), size=min(args.sample_queries, len(ids)), replace=False)
+        # Perturb stored vectors so queries don't trivially hit their own point
+        noise = rng.normal(0.0, 0.05, size=(len(picks), matrix.shape[1])).astype(np.float32)
+        queries = matrix[picks] + noise * np.linalg.norm(matrix[picks], axis=1, keepdims=True)
+        k = min(args.k, len(ids))
+        truth = _exact_neighbours(matrix, queries, k, str(settings.get("space", "l2")))
+        report["current"] = _evaluate(source, ids, queries, truth, k)
+        report["rebuilt"] = _evaluate(target, ids, queries, truth, k)
+        passed = report["rebuilt"][f"recall_at_{k}"] >= args.min_recall
+
+    if args.dry_run or not passed:
+        report["status"] = "dry_run" if args.dry_run else "rejected_low_recall"
+        return report
+
+    # Inside the unpublished version the old collection can simply be replaced
+    client.delete_collection(args.collection_name)
+    target.modify(name=args.collection_name)
+    report["status"] = "swapped"
+    return report
+
+
+def main(argv: list[str]) -> int:
+    args = _parse_args(argv)
+    _configure_logging(args.log_level)
+    args.vector_store_path = os.path.abspath(args.vector_store_path)
+
+    import chromadb
+
+    with ingestion_lock(args.vector_store_path):
+        version, version_path = begin_version(args.vector_store_path)
+        try:
+            client = chromadb.PersistentClient(path=version_path)
+            try:
+                report = _rebuild(client, args)
+            except CollectionNotFoundError as exc:
+                abort_version(args.vector_store_path, version)
+                print(json.dumps({"status": "failed", "error": f"Collection not found: {exc}"}))
+                return 2
+        except Exception:
+            abort_version(args.vector_store_path, version)
+            raise
+
+        if report["status"] != "swapped":
+            abort_version(args.vector_store_path, version)
+            _emit(report, args.output)
+            return 0 if args.dry_run else 3
+
+        publish_version(args.vector_store_path, version)
+        manifest = bump_collection_version(args.vector_store_path, source="rebuild_index", records=report["records"])
+        report["collection_version"] = manifest["collection_version"]
+        settings = report.pop("settings")
+        config = read_index_config(args.vector_store_path)
+        config.update({
+            "preset": settings["preset"],
+            "hnsw": {key: settings[key] for key in ("space", "M", "construction_ef", "search_ef") if key in settings},
+            "rebuilt_at": datetime.utcnow().isoformat() + "Z",
+            "record_count": report["records"],
+        })
+        write_index_config(args.vector_store_path, config)
+
+    report["version"] = version
+    _emit(report, args.output)
+    return 0
+
+
+def _emit(report: Dict[str, Any], output: Optional[str]) -> None:
+    report["timestamp"] = datetime.utcnow().isoformat()
+    if output:
+        try:
+            with open(output, "w", encoding="utf-8") as handle:
+                json.dump(report, handle, indent=2)
+        except OSError as exc:
+            logger.warning("Unable to write report %s: %s", output, exc)
+    print(json.dumps(report, default=str))
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
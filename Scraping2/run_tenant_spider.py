@@ -18,6 +18,7 @@ from scrapy.crawler import CrawlerProcess
 from scrapy.utils.project import get_project_settings
 
 from Scraping2.spiders.spider import FixedUniversalSpider
+from Scraping2.vector_store import read_manifest
 
 
 def _ensure_nltk_models() -> None:
@@ -161,6 +162,7 @@ def main(argv: list[str]) -> int:
         "start_url": args.start_url,
         "vector_store_path": args.vector_store_path,
         "collection_name": args.collection_name,
+        "collection_version": read_manifest(args.vector_store_path).get("collection_version"),
         "stats": stats,
         "timestamp": datetime.utcnow().isoformat()
     }
@@ -0,0 +1,368 @@
+# Scraping2/vector_store.py
+"""Shared helpers for tenant Chroma stores: per-tenant HNSW index settings.
+
+Each tenant directory may carry an ``index_config.json`` written at
+provisioning time (or by ``rebuild_index.py``)::
+
+    {"preset": "small", "hnsw": {"M": 8, "search_ef": 64}}
+
+Settings resolve as preset defaults, then ``HNSW_*`` environment variables,
+then explicit values from the file. Both the scraper pipeline and the chatbot
+create collections through :func:`get_or_create_tenant_collection`, so the
+chosen parameters apply regardless of which side touches the store first.
+HNSW build parameters are fixed when a collection is created; changing them for
+an existing collection requires an offline rebuild.
+
+Tenant data is versioned blue/green style so ingestion never writes into the
+directory that live queries read::
+
+    <tenant>/CURRENT                  -> "v20240101120000-ab12cd"
+    <tenant>/versions/v20240101.../   (Chroma persistent directory)
+
+Writers call :func:`begin_version` (a copy of the current data), write into the
+returned directory and then :func:`publish_version`, which flips ``CURRENT``
+with an atomic rename. Readers resolve the pointer with
+:func:`resolve_read_path`. Tenants without ``CURRENT`` keep reading the legacy
+layout where Chroma files live directly in the tenant directory.
+
+Every completed ingestion run also bumps ``collection_version`` in the tenant's
+``manifest.json`` (:func:`bump_collection_version`). Readers watch that file's
+mtime to know when to reload handles and drop tenant-scoped caches.
+"""
+
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl  # POSIX only; ingestion locking is skipped elsewhere
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+INDEX_CONFIG_FILENAME = "index_config.json"
+CURRENT_POINTER_FILENAME = "CURRENT"
+MANIFEST_FILENAME = "manifest.json"
+VERSIONS_DIRNAME = "versions"
+INGEST_LOCK_FILENAME = ".ingest.lock"
+
+# Tenant-level files that are not part of a Chroma data directory
+_TENANT_FILES = {
+    INDEX_CONFIG_FILENAME,
+    CURRENT_POINTER_FILENAME,
+    MANIFEST_FILENAME,
+    VERSIONS_DIRNAME,
+    INGEST_LOCK_FILENAME,
+    "synthetic.json",
+}
+
+# Tuned for corpus size: fewer links for small stores (memory), wider search for large ones (recall)
+HNSW_PRESETS: Dict[str, Dict[str, Any]] = {
+    "small": {"space": "cosine", "M": 8, "construction_ef": 100, "search_ef": 64},
+    "medium": {"space": "cosine", "M": 16, "construction_ef": 200, "search_ef": 100},
+    "large": {"space": "cosine", "M": 32, "construction_ef": 400, "search_ef": 200},
+}
+
+# Upper chunk-count bound for each preset when choosing automatically
+PRESET_SIZE_LIMITS = (("small", 20_000), ("medium", 250_000))
+
+HNSW_KEYS = ("space", "M", "construction_ef", "search_ef", "num_threads")
+_ENV_KEYS = {
+    "space": "HNSW_SPACE",
+    "M": "HNSW_M",
+    "construction_ef": "HNSW_CONSTRUCTION_EF",
+    "search_ef": "HNSW_SEARCH_EF",
+    "num_threads": "HNSW_NUM_THREADS",
+}
+
+
+def preset_for_size(chunk_count: int) -> str:
+    """Pick the preset whose size band contains chunk_count"""
+    for preset, limit in PRESET_SIZE_LIMITS:
+        if chunk_count <= limit:
+            return preset
+    return "large"
+
+
+def read_index_config(vector_store_path: str) -> Dict[str, Any]:
+    """Return the raw tenant index config, or {} when none has been written"""
+    config_path = os.path.join(vector_store_path, INDEX_CONFIG_FILENAME)
+    try:
+        with open(config_path, "r", encoding="utf-8") as handle:
+            config = json.load(handle)
+        return config if isinstance(config, dict) else {}
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as exc:
+        logger.warning("Ignoring unreadable index config %s: %s", config_path, exc)
+        return {}
+
+
+def _write_json_atomic(path: str, payload: Dict[str, Any]) -> str:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{uuid.uuid4().hex[:6]}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as handle:
+        json.dump(payload, handle, indent=2, default=str)
+    os.replace(tmp_path, path)
+    return path
+
+
+def write_index_config(vector_store_path: str, config: Dict[str, Any]) -> str:
+    """Atomically replace the tenant index config"""
+    payload = dict(config)
+    payload["updated_at"] = datetime.utcnow().isoformat() + "Z"
+    return _write_json_atomic(os.path.join(vector_store_path, INDEX_CONFIG_FILENAME), payload)
+
+
+def read_manifest(vector_store_path: str) -> Dict[str, Any]:
+    """Tenant change manifest ({"collection_version": 0} when never written)"""
+    manifest_path = os.path.join(vector_store_path, MANIFEST_FILENAME)
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as handle:
+            manifest = json.load(handle)
+        if isinstance(manifest, dict):
+            manifest.setdefault("collection_version", 0)
+            return manifest
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as exc:
+        logger.warning("Ignoring unreadable manifest %s: %s", manifest_path, exc)
+    return {"collection_version": 0}
+
+
+def bump_collection_version(vector_store_path: str, source: str, **details: Any) -> Dict[str, Any]:
+    """Record a completed ingestion run; readers reload when collection_version changes.
+
+    Callers should hold the tenant ingestion lock (or run after releasing it as
+    the last step of a run) so concurrent writers don't lose increments.
+    """
+    manifest = read_manifest(vector_store_path)
+    manifest.update({
+        "collection_version": int(manifest.get("collection_version", 0)) + 1,
+        "data_version": read_current_version(vector_store_path),
+        "source": source,
+        "updated_at": datetime.utcnow().isoformat() + "Z",
+        "details": {key: value for key, value in details.items() if value is not None},
+    })
+    _write_json_atomic(os.path.join(vector_store_path, MANIFEST_FILENAME), manifest)
+    logger.info("Tenant %s now at collection_version %s", vector_store_path, manifest["collection_version"])
+    return manifest
+
+
+def resolve_hnsw_settings(
+    vector_store_path: Optional[str] = None,
+    overrides: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """Merge preset, environment and tenant-file settings into one dict"""
+    config = read_index_config(vector_store_path) if vector_store_path else {}
+    preset = (config.get("preset") or os.getenv("HNSW_PRESET") or "medium").lower()
+    if preset not in HNSW_PRESETS:
+        logger.warning("Unknown HNSW preset '%s'; using 'medium'", preset)
+        preset = "medium"
+
+    settings = dict(HNSW_PRESETS[preset])
+    for key, env_name in _ENV_KEYS.items():
+        value = os.getenv(env_name)
+        if value:
+            settings[key] = value if key == "space" else int(value)
+    for source in (config.get("hnsw") or {}, overrides or {}):
+        settings.update({key: value for key, value in source.items() if key in HNSW_KEYS and value is not None})
+    settings["preset"] = preset
+    return settings
+
+
+def collection_metadata(settings: Dict[str, Any], base: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Chroma collection metadata carrying the hnsw:* parameters"""
+    metadata = {key: value for key, value in (base or {}).items() if not key.startswith("hnsw:")}
+    for key in HNSW_KEYS:
+        if settings.get(key) is not None:
+            metadata[f"hnsw:{key}"] = settings[key]
+    return metadata
+
+
+def missing_collection_errors() -> Tuple[type, ...]:
+    """What ``client.get_collection`` raises for an unknown name (ValueError before chromadb 0.5)"""
+    errors: List[type] = [ValueError]
+    try:
+        from chromadb import errors as chroma_errors
+    except ImportError:
+        return tuple(errors)
+    for name in ("NotFoundError", "InvalidCollectionException"):
+        if hasattr(chroma_errors, name):
+            errors.append(getattr(chroma_errors, name))
+    return tuple(errors)
+
+
+def get_or_create_tenant_collection(
+    client,
+    collection_name: str,
+    vector_store_path: str,
+    embedding_function=None,
+    embedding_model: Optional[str] = None
+):
+    """Open the tenant collection, creating it with the tenant's HNSW settings if missing.
+
+    An existing collection is opened with ``get_collection`` and its metadata
+    is left untouched: ``get_or_create_collection`` would overwrite the stored
+    metadata with the caller's. ``embedding_model`` is recorded only when the
+    collection is created, and only writers should pass it, so readers can
+    verify their query encoder against what the writer actually used.
+    """
+    settings = resolve_hnsw_settings(vector_store_path)
+    kwargs = {"name": collection_name}
+    if embedding_function is not None:
+        kwargs["embedding_function"] = embedding_function
+    try:
+        collection = client.get_collection(**kwargs)
+    except missing_collection_errors():
+        metadata = collection_metadata(settings)
+        if embedding_model:
+            metadata["embedding_model"] = embedding_model
+        return client.get_or_create_collection(metadata=metadata, **kwargs)
+
+    existing = collection.metadata or {}
+    if any(existing.get(f"hnsw:{key}") not in (None, settings[key]) for key in ("space", "M", "construction_ef")):
+        logger.info(
+            "Collection %s keeps its build-time HNSW settings %s; run rebuild_index.py to apply %s",
+            collection_name,
+            {key: value for key, value in existing.items() if key.startswith("hnsw:")},
+            {key: settings[key] for key in ("space", "M", "construction_ef")}
+        )
+    stored_model = existing.get("embedding_model")
+    if embedding_model and stored_model and stored_model != embedding_model:
+        logger.warning(
+            "Collection %s was embedded with '%s' but is being written with '%s'",
+            collection_name, stored_model, embedding_model
+        )
+    return collection
+
+
+def read_current_version(vector_store_path: str) -> Optional[str]:
+    """Name of the published version, or None for legacy (unversioned) tenants"""
+    try:
+        with open(os.path.join(vector_store_path, CURRENT_POINTER_FILENAME), "r", encoding="utf-8") as handle:
+            version = handle.read().strip()
+    except FileNotFoundError:
+        return None
+    if version and os.path.isdir(os.path.join(vector_store_path, VERSIONS_DIRNAME, version)):
+        return version
+    logger.warning("CURRENT pointer in %s names missing version '%s'; using legacy layout", vector_store_path, version)
+    return None
+
+
+def resolve_read_path(vector_store_path: str) -> Tuple[str, Optional[str]]:
+    """Directory readers should open for a tenant and the version it belongs to"""
+    version = read_current_version(vector_store_path)
+    if version is None:
+        return vector_store_path, None
+    return os.path.join(vector_store_path, VERSIONS_DIRNAME, version), version
+
+
+def acquire_ingestion_lock(vector_store_path: str):
+    """Block until this process is the tenant's only writer; returns a handle for release"""
+    os.makedirs(vector_store_path, exist_ok=True)
+    handle = open(os.path.join(vector_store_path, INGEST_LOCK_FILENAME), "a+")
+    if fcntl is not None:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+    return handle
+
+
+def release_ingestion_lock(handle) -> None:
+    if handle is None:
+        return
+    try:
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+    finally:
+        handle.close()
+
+
+@contextmanager
+def ingestion_lock(vector_store_path: str) -> Iterator[None]:
+    """Serialise writers (scraper, updater, rebuilds) on one tenant"""
+    handle = acquire_ingestion_lock(vector_store_path)
+    try:
+        yield
+    finally:
+        release_ingestion_lock(handle)
+
+
+def _copy_chroma_data(source_dir: str, target_dir: str, legacy: bool):
+    os.makedirs(target_dir, exist_ok=True)
+    for entry in os.listdir(source_dir):
+        if legacy and (entry in _TENANT_FILES or entry.endswith(".tmp")):
+            continue
+        source = os.path.join(source_dir, entry)
+        target = os.path.join(target_dir, entry)
+        if os.path.isdir(source):
+            shutil.copytree(source, target)
+        else:
+            shutil.copy2(source, target)
+
+
+def begin_version(vector_store_path: str) -> Tuple[str, str]:
+    """Create a new writable version seeded from the current data; returns (version, path)"""
+    current_path, current_version = resolve_read_path(vector_store_path)
+    version = f"v{datetime.utcnow().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:6]}"
+    version_path = os.path.join(vector_store_path, VERSIONS_DIRNAME, version)
+    try:
+        _copy_chroma_data(current_path, version_path, legacy=current_version is None)
+    except Exception:
+        shutil.rmtree(version_path, ignore_errors=True)
+        raise
+    logger.info("Started vector store version %s (from %s)", version, current_version or "legacy layout")
+    return version, version_path
+
+
+def publish_version(vector_store_path: str, version: str) -> None:
+    """Atomically point readers at version, then prune versions past retention"""
+    pointer_path = os.path.join(vector_store_path, CURRENT_POINTER_FILENAME)
+    tmp_path = f"{pointer_path}.{uuid.uuid4().hex[:6]}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as handle:
+        handle.write(version)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(tmp_path, pointer_path)
+    logger.info("Published vector store version %s for %s", version, vector_store_path)
+    prune_versions(vector_store_path)
+
+
+def abort_version(vector_store_path: str, version: str) -> None:
+    """Discard an unpublished version"""
+    shutil.rmtree(os.path.join(vector_store_path, VERSIONS_DIRNAME, version), ignore_errors=True)
+
+
+def prune_versions(
+    vector_store_path: str,
+    keep: Optional[int] = None,
+    min_age_seconds: Optional[float] = None
+) -> None:
+    """Delete old versions beyond the newest `keep`, once they are older than the grace period.
+
+    The grace period leaves time for bot instances still holding a previous
+    version to notice the switch and finish in-flight queries.
+    """
+    keep = int(os.getenv("VECTOR_STORE_KEEP_VERSIONS", "3")) if keep is None else keep
+    if min_age_seconds is None:
+        min_age_seconds = float(os.getenv("VECTOR_STORE_VERSION_GRACE_SECONDS", "3600"))
+    versions_dir = os.path.join(vector_store_path, VERSIONS_DIRNAME)
+    current = read_current_version(vector_store_path)
+    try:
+        versions = sorted(os.listdir(versions_dir), reverse=True)
+    except FileNotFoundError:
+        return
+
+    now = time.time()
+    for version in versions[max(1, keep):]:
+        path = os.path.join(versions_dir, version)
+        if version == current or now - os.path.getmtime(path) < min_age_seconds:
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        logger.info("Pruned vector store version %s", version)
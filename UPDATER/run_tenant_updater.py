@@ -23,6 +23,7 @@ if ROOT_DIR not in sys.path:
     sys.path.insert(0, ROOT_DIR)
 
 from UPDATER.updater import run_updater, build_url_tracking_collection  # noqa: E402
+from Scraping2.vector_store import read_manifest  # noqa: E402
 
 
 def _ensure_nltk_models() -> None:
@@ -151,6 +152,7 @@ def main(argv: list[str]) -> int:
         "domain": args.domain,
         "vector_store_path": args.vector_store_path,
         "collection_name": args.collection_name,
+        "collection_version": read_manifest(args.vector_store_path).get("collection_version"),
         "url_tracking_collection": build_url_tracking_collection(args.resource_id, args.user_id),
         "stats": stats or {},
         "timestamp": datetime.utcnow().isoformat()
@@ -47,6 +47,39 @@ const ensureDirectory = (dirPath) => {
   return dirPath;
 };
 
+const HNSW_PRESETS = new Set(['small', 'medium', 'large']);
+
+/**
+ * Seed the tenant's vector index settings (read by the scraper and the bot when
+ * the collection is first created). Existing configs are left untouched so
+ * tuned or rebuilt tenants keep their parameters.
+ */
+const ensureIndexConfig = (vectorStorePath) => {
+  if (!vectorStorePath) {
+    return;
+  }
+
+  const configPath = path.join(vectorStorePath, 'index_config.json');
+  if (fs.existsSync(configPath)) {
+    return;
+  }
+
+  const requestedPreset = (process.env.DEFAULT_HNSW_PRESET || 'small').toLowerCase();
+  const preset = HNSW_PRESETS.has(requestedPreset) ? requestedPreset : 'small';
+
+  try {
+    fs.writeFileSync(
+      configPath,
+      JSON.stringify({ preset, hnsw: {}, updated_at: new Date().toISOString() }, null, 2),
+      { flag: 'wx' }
+    );
+  } catch (err) {
+    if (err.code !== 'EEXIST') {
+      console.error(`❌ Failed to write index config ${configPath}:`, err.message);
+    }
+  }
+};
+
 /**
  * Build deterministic resource identifiers so that repeated provisioning
  * for the same user yields the same endpoints, enabling idempotency.
@@ -84,6 +117,7 @@ const provisionResourcesForUser = ({ userId, username, resourceId: existingResou
 
   const databaseName = `rag_${slug}_${resourceId.slice(-6)}`;
   const vectorStorePath = ensureDirectory(path.join(vectorBase, resourceId));
+  ensureIndexConfig(vectorStorePath);
 
   return {
     resourceId,